@@ -17,16 +17,21 @@ AutoML Assistant Agent - DataRobot AutoML/MLOps統合エージェント
 機械学習プロジェクトを推進するユーザーを支援するエージェント。
 テーマ定義からデプロイまでの全工程をサポートする。
 """
+from contextlib import AsyncExitStack
 from datetime import datetime
-from typing import Any
+from typing import Any, AsyncGenerator
 
+from checkpointer import CheckpointedStateGraph, open_checkpointer
 from config import Config
 from datarobot_genai.core.agents import make_system_prompt
+from datarobot_genai.core.agents.base import InvokeReturn
 from datarobot_genai.langgraph.agent import LangGraphAgent
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_litellm.chat_models import ChatLiteLLM
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import create_react_agent
+from openai.types.chat import CompletionCreateParams
 
 config = Config()
 
@@ -182,12 +187,53 @@ class AutoMLAssistantAgent(LangGraphAgent):
     7. デプロイ
     """
 
+    def __init__(self, *args: Any, thread_id: str | None = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.thread_id = thread_id
+        self._checkpointer: BaseCheckpointSaver[Any] | None = None
+
+    async def invoke(
+        self, completion_create_params: CompletionCreateParams
+    ) -> InvokeReturn:
+        """スレッドの状態をチェックポイントから再開してエージェントを実行"""
+        if not self.thread_id:
+            return await super().invoke(completion_create_params)
+
+        stack = AsyncExitStack()
+        try:
+            self._checkpointer = await stack.enter_async_context(
+                open_checkpointer(
+                    config.checkpoint_db_path, persist=config.checkpoint_persist
+                )
+            )
+            result = await super().invoke(completion_create_params)
+        except BaseException:
+            await stack.aclose()
+            raise
+
+        if not isinstance(result, AsyncGenerator):
+            await stack.aclose()
+            return result
+
+        # For streaming, keep the checkpoint database open until the stream is consumed.
+        async def close_after_stream() -> AsyncGenerator[Any, None]:
+            async with stack:
+                async for item in result:
+                    yield item
+
+        return close_after_stream()
+
+    @property
+    def langgraph_config(self) -> dict[str, Any]:
+        langgraph_config = super().langgraph_config
+        if self._checkpointer is not None:
+            langgraph_config["configurable"] = {"thread_id": self.thread_id}
+        return langgraph_config
+
     @property
     def workflow(self) -> StateGraph[MessagesState]:
         """シンプルなReActワークフロー"""
-        langgraph_workflow = StateGraph[
-            MessagesState, None, MessagesState, MessagesState
-        ](MessagesState)
+        langgraph_workflow = CheckpointedStateGraph(self._checkpointer)
         langgraph_workflow.add_node("agent", self.agent)
         langgraph_workflow.add_edge(START, "agent")
         langgraph_workflow.add_edge("agent", END)
@@ -0,0 +1,85 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Thread state checkpointing for the LangGraph workflow.
+
+The agent stores the `MessagesState` of every thread in a local SQLite database
+keyed by `thread_id`, so a follow-up turn resumes from the stored state instead of
+rebuilding it from the whole message history sent by the backend.
+"""
+
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
+
+import aiosqlite
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import MessagesState, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+logger = logging.getLogger(__name__)
+
+
+def _connect(db_path: str, persist: bool) -> aiosqlite.Connection:
+    """
+    Open the checkpoint database. When `persist` is set and the agent runs inside a
+    DataRobot custom application, the file is synced through `core.persistent_fs`.
+    """
+    if persist and os.environ.get("APPLICATION_ID"):
+        try:
+            from core.persistent_fs.sqlite_extension import connect_dr_fs
+        except ImportError:
+            logger.warning(
+                "Checkpoint persistence requested but `core` is not installed, "
+                "falling back to a local-only checkpoint database."
+            )
+        else:
+            return connect_dr_fs(db_path)
+    return aiosqlite.connect(db_path)
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    db_path: str, persist: bool = False
+) -> AsyncGenerator[AsyncSqliteSaver, None]:
+    """
+    Open a SQLite-backed checkpointer for the duration of a single agent invocation.
+
+    Args:
+        db_path (str): Path to the local SQLite checkpoint database.
+        persist (bool): Sync the database through DataRobot file storage when available.
+    """
+    if db_path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    conn = _connect(db_path, persist)
+    async with conn:
+        yield AsyncSqliteSaver(conn)
+
+
+class CheckpointedStateGraph(
+    StateGraph[MessagesState, None, MessagesState, MessagesState]
+):
+    """`StateGraph` that compiles with a checkpointer unless one is given explicitly."""
+
+    def __init__(self, checkpointer: BaseCheckpointSaver[Any] | None) -> None:
+        super().__init__(MessagesState)
+        self.checkpointer = checkpointer
+
+    def compile(  # type: ignore[override]
+        self, checkpointer: BaseCheckpointSaver[Any] | None = None, **kwargs: Any
+    ) -> CompiledStateGraph[MessagesState, None, MessagesState, MessagesState]:
+        return super().compile(checkpointer=checkpointer or self.checkpointer, **kwargs)
@@ -38,6 +38,14 @@ class Config(DataRobotAppFrameworkBaseSettings):
     mcp_deployment_id: str | None = None
     external_mcp_url: str | None = None
 
+    # Requests carrying a `thread_id` resume from the LangGraph state checkpointed for
+    # that thread and only bring the new messages. The backend sends it when
+    # `AGENT_SEND_MESSAGE_DELTA` is set. `checkpoint_persist` syncs the checkpoint
+    # database through DataRobot file storage when running inside a custom
+    # application, so threads keep their context across restarts.
+    checkpoint_db_path: str = ".data/checkpoints.sqlite"
+    checkpoint_persist: bool = True
+
     agent_endpoint: str = Field(
         default="http://localhost:8842", validation_alias="AGENT_ENDPOINT"
     )
@@ -0,0 +1,120 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START
+
+
+def _echo_graph(checkpointer):
+    from checkpointer import CheckpointedStateGraph
+
+    def echo(state):
+        return {"messages": [AIMessage(content=f"seen {len(state['messages'])}")]}
+
+    graph = CheckpointedStateGraph(checkpointer)
+    graph.add_node("echo", echo)
+    graph.add_edge(START, "echo")
+    graph.add_edge("echo", END)
+    return graph.compile()
+
+
+class TestCheckpointer:
+    async def test_thread_state_resumes_across_invocations(self, tmp_path):
+        from checkpointer import open_checkpointer
+
+        db_path = str(tmp_path / "nested" / "checkpoints.sqlite")
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async with open_checkpointer(db_path) as checkpointer:
+            result = await _echo_graph(checkpointer).ainvoke(
+                {"messages": [HumanMessage(content="first")]}, config
+            )
+        assert result["messages"][-1].content == "seen 1"
+
+        # Only the new message is sent, the rest of the thread comes from the checkpoint.
+        async with open_checkpointer(db_path) as checkpointer:
+            result = await _echo_graph(checkpointer).ainvoke(
+                {"messages": [HumanMessage(content="second")]}, config
+            )
+        assert [m.content for m in result["messages"]] == [
+            "first",
+            "seen 1",
+            "second",
+            "seen 3",
+        ]
+
+    async def test_threads_are_isolated(self, tmp_path):
+        from checkpointer import open_checkpointer
+
+        db_path = str(tmp_path / "checkpoints.sqlite")
+        async with open_checkpointer(db_path) as checkpointer:
+            graph = _echo_graph(checkpointer)
+            await graph.ainvoke(
+                {"messages": [HumanMessage(content="a")]},
+                {"configurable": {"thread_id": "t1"}},
+            )
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="b")]},
+                {"configurable": {"thread_id": "t2"}},
+            )
+        assert len(result["messages"]) == 2
+
+    async def test_persist_falls_back_to_local_without_application(self, tmp_path):
+        from checkpointer import open_checkpointer
+
+        db_path = str(tmp_path / "checkpoints.sqlite")
+        with patch.dict(os.environ, {}, clear=True):
+            async with open_checkpointer(db_path, persist=True) as checkpointer:
+                await _echo_graph(checkpointer).ainvoke(
+                    {"messages": [HumanMessage(content="a")]},
+                    {"configurable": {"thread_id": "t1"}},
+                )
+        assert os.path.exists(db_path)
+
+
+class TestAgentCheckpointing:
+    def test_langgraph_config_without_thread(self):
+        from agent import MyAgent
+
+        agent = MyAgent(api_key="test_key", api_base="test_base")
+        assert "configurable" not in agent.langgraph_config
+
+    async def test_invoke_binds_thread_checkpointer(self, tmp_path):
+        import agent as agent_module
+        from agent import MyAgent
+
+        seen = {}
+
+        async def fake_invoke(self, completion_create_params):
+            seen["config"] = self.langgraph_config
+            seen["checkpointer"] = self.workflow.checkpointer
+            return "result", None, {}
+
+        with (
+            patch.object(agent_module.config, "checkpoint_persist", False),
+            patch.object(
+                agent_module.config,
+                "checkpoint_db_path",
+                str(tmp_path / "checkpoints.sqlite"),
+            ),
+            patch("datarobot_genai.langgraph.agent.LangGraphAgent.invoke", fake_invoke),
+        ):
+            agent = MyAgent(api_key="test_key", api_base="test_base", thread_id="t1")
+            result = await agent.invoke({"messages": [], "model": "m"})
+
+        assert result == ("result", None, {})
+        assert seen["config"]["configurable"] == {"thread_id": "t1"}
+        assert seen["checkpointer"] is not None
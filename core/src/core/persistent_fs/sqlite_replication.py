@@ -0,0 +1,405 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Incremental replication of a SQLite database in WAL mode to a fsspec file system,
+usually DRFileSystem.
+
+The replica lives in `<database path>.replica/` as numbered objects:
+
+- `snapshot-<generation>`: the full database, compressed.
+- `segment-<generation>-<sequence>`: the pages changed since the previous segment
+  or snapshot of the generation, compressed.
+
+Each `sync` ships the pages of the transactions committed to the WAL since the
+previous one, then checkpoints the WAL, so the database file is not read. This
+needs the replicator to be the only one checkpointing: the connections writing to
+the database must turn automatic checkpoints off with `PRAGMA wal_autocheckpoint=0`.
+If the database file changes otherwise, such as when the last connection to it
+closes, what changed is unknown and a new generation starts with a full snapshot,
+as it does once the segments of a generation get as large as its snapshot, or too
+many. `restore` rebuilds the database from the latest snapshot and its segments.
+
+The replicator state, its position in the WAL and the replica objects, is kept in
+`<database path>.replication`, so the processes replicating the same database take
+turns, under `<database path>.replication.lock`, and carry on from each other.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+import zlib
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, BinaryIO, Callable, cast
+
+from fsspec import AbstractFileSystem
+
+from core.utils.rw_lock import FileReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+_SNAPSHOT = "snapshot-{generation:010d}"
+_SEGMENT = "segment-{generation:010d}-{sequence:010d}"
+_OBJECT_RE = re.compile(r"^(snapshot|segment)-(\d{10})(?:-(\d{10}))?$")
+# Page size and page count of the database, then (page number, page) records.
+_SEGMENT_HEADER = struct.Struct(">II")
+_PAGE_NUMBER = struct.Struct(">I")
+
+# See https://www.sqlite.org/fileformat.html#the_write_ahead_log. Magic number,
+# format version, page size, checkpoint sequence, salts and checksum.
+_WAL_HEADER = struct.Struct(">8I")
+# Page number, database size in pages for the last frame of a commit, salts and
+# checksum.
+_WAL_FRAME_HEADER = struct.Struct(">6I")
+# The low bit of the magic number tells whether checksums are big-endian.
+_WAL_MAGIC = (0x377F0682, 0x377F0683)
+
+
+@dataclass
+class _Generation:
+    number: int = 0
+    snapshot_size: int = 0
+    segments: list[str] = field(default_factory=list)
+    segments_size: int = 0
+
+
+@dataclass
+class _State:
+    generation: _Generation = field(default_factory=_Generation)
+    page_size: int = 0
+    # Salts of the WAL, and the offset past its last shipped commit.
+    wal_salt: list[int] | None = None
+    wal_offset: int = 0
+    # Size and modification time of the database file after the last sync, which
+    # only the checkpoints of the replicator change.
+    database_stat: list[int] | None = None
+
+
+@dataclass
+class _WalChanges:
+    page_size: int
+    # Database size in pages after the last commit, with the pages it changed.
+    page_count: int
+    pages: dict[int, bytes]
+    salt: list[int]
+    offset: int
+
+
+def _wal_checksum(
+    data: bytes, big_endian: bool, checksum: tuple[int, int]
+) -> tuple[int, int]:
+    words = struct.unpack(f"{'>' if big_endian else '<'}{len(data) // 4}I", data)
+    s0, s1 = checksum
+    for i in range(0, len(words), 2):
+        s0 = (s0 + words[i] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[i + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+class SQLiteReplicator:
+    def __init__(
+        self,
+        fs: AbstractFileSystem,
+        database_path: str,
+        remote_path: str | None = None,
+        max_segments: int = 100,
+    ):
+        self._fs = fs
+        self._database_path = database_path
+        self._remote_path = (remote_path or database_path).rstrip("/") + ".replica"
+        self._max_segments = max_segments
+        self._state_path = f"{database_path}.replication"
+        self._lock = FileReadWriteLock(f"{database_path}.replication.lock")
+
+    def _object_path(self, name: str) -> str:
+        return f"{self._remote_path}/{name}"
+
+    def _list_objects(self) -> list[tuple[str, int, int]]:
+        """The (name, generation, sequence) of the replica objects, in order."""
+        try:
+            paths = self._fs.ls(self._remote_path, detail=False)
+        except FileNotFoundError:
+            return []
+        objects = []
+        for path in paths:
+            name = os.path.basename(str(path).rstrip("/"))
+            if match := _OBJECT_RE.match(name):
+                # Snapshots sort before the segments of their generation.
+                sequence = int(match.group(3)) + 1 if match.group(3) else 0
+                objects.append((name, int(match.group(2)), sequence))
+        return sorted(objects, key=lambda o: (o[1], o[2]))
+
+    def _load_state(self) -> _State:
+        try:
+            with open(self._state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return _State()
+        return _State(**state | {"generation": _Generation(**state["generation"])})
+
+    def _save_state(self, state: _State) -> None:
+        with open(f"{self._state_path}.{os.getpid()}", "w") as f:
+            json.dump(asdict(state), f)
+        # Replaced at once, so a crash never leaves it half written.
+        os.replace(f"{self._state_path}.{os.getpid()}", self._state_path)
+
+    def _database_stat(self) -> list[int] | None:
+        try:
+            stat = os.stat(self._database_path)
+        except FileNotFoundError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _read_image(self) -> tuple[int, bytes]:
+        """A consistent image of the database, and its page size."""
+        source = sqlite3.connect(self._database_path)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image_path = os.path.join(tmp_dir, "image.sqlite")
+            image = sqlite3.connect(image_path)
+            try:
+                # One step copies every page within a single read transaction.
+                source.backup(image)
+                (page_size,) = image.execute("PRAGMA page_size").fetchone()
+            finally:
+                image.close()
+                source.close()
+            with open(image_path, "rb") as f:
+                return page_size, f.read()
+
+    def _read_wal(self, salt: list[int] | None, offset: int) -> _WalChanges | None:
+        """
+        The pages of the transactions committed to the WAL after `offset`, or from
+        its start if it was restarted since, as told by its salts. None without a
+        WAL.
+        """
+        try:
+            f = open(self._database_path + "-wal", "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            header = f.read(_WAL_HEADER.size)
+            if len(header) < _WAL_HEADER.size:
+                return None
+            magic, _, page_size, _, *wal_salt, c0, c1 = _WAL_HEADER.unpack(header)
+            big_endian = bool(magic & 1)
+            if magic not in _WAL_MAGIC or (c0, c1) != _wal_checksum(
+                header[:24], big_endian, (0, 0)
+            ):
+                return None
+
+            frame_size = _WAL_FRAME_HEADER.size + page_size
+            checksum = c0, c1
+            if wal_salt != salt or offset <= _WAL_HEADER.size:
+                offset = _WAL_HEADER.size
+            else:
+                # Frame checksums are cumulative, from the last shipped frame on.
+                f.seek(offset - frame_size)
+                previous = _WAL_FRAME_HEADER.unpack(f.read(_WAL_FRAME_HEADER.size))
+                checksum = previous[4], previous[5]
+            changes = _WalChanges(page_size, 0, {}, wal_salt, offset)
+
+            f.seek(offset)
+            pending: dict[int, bytes] = {}
+            while len(frame := f.read(frame_size)) == frame_size:
+                page_number, page_count, *frame_salt, k0, k1 = (
+                    _WAL_FRAME_HEADER.unpack_from(frame)
+                )
+                checksum = _wal_checksum(
+                    frame[:8] + frame[_WAL_FRAME_HEADER.size :], big_endian, checksum
+                )
+                # Frames left from before the WAL restarted, or never completed.
+                if frame_salt != wal_salt or checksum != (k0, k1):
+                    break
+                offset += frame_size
+                pending[page_number] = frame[_WAL_FRAME_HEADER.size :]
+                if page_count:
+                    changes.pages.update(pending)
+                    pending.clear()
+                    changes.page_count = page_count
+                    changes.offset = offset
+            return changes
+
+    def _checkpoint(self) -> bool:
+        """Checkpoint and truncate the WAL, unless readers hold on to it."""
+        # Without waiting, as the writers of the database are held up meanwhile.
+        conn = sqlite3.connect(self._database_path, timeout=0)
+        try:
+            (busy, _, _) = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            conn.close()
+        return not busy
+
+    def restore(self) -> bool:
+        """
+        Rebuild the local database from the replica. Returns False, leaving the
+        local database as is, when there is no replica yet.
+        """
+        objects = self._list_objects()
+        snapshots = [o for o in objects if o[2] == 0]
+        if not snapshots:
+            return False
+        _, generation, _ = snapshots[-1]
+
+        snapshot = self._fs.cat_file(self._object_path(snapshots[-1][0]))
+        for suffix in ("-wal", "-shm", "-journal"):
+            if os.path.exists(self._database_path + suffix):
+                os.remove(self._database_path + suffix)
+        segments = [o[0] for o in objects if o[1] == generation and o[2] > 0]
+        segments_size = 0
+        with open(self._database_path, "wb") as f:
+            f.write(zlib.decompress(snapshot))
+            for name in segments:
+                data = self._fs.cat_file(self._object_path(name))
+                segments_size += len(data)
+                page_size, page_count = self._apply_segment(f, zlib.decompress(data))
+                f.truncate(page_size * page_count)
+
+        conn = sqlite3.connect(self._database_path)
+        try:
+            (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+        finally:
+            conn.close()
+        with self._lock.write_lock():
+            self._save_state(
+                _State(
+                    _Generation(generation, len(snapshot), segments, segments_size),
+                    page_size,
+                    database_stat=self._database_stat(),
+                )
+            )
+        logger.info(
+            "Restored database from replica",
+            extra={"generation": generation, "segments": len(segments)},
+        )
+        return True
+
+    @staticmethod
+    def _apply_segment(f: BinaryIO, data: bytes) -> tuple[int, int]:
+        page_size, page_count = _SEGMENT_HEADER.unpack_from(data)
+        offset = _SEGMENT_HEADER.size
+        while offset < len(data):
+            (page_number,) = _PAGE_NUMBER.unpack_from(data, offset)
+            offset += _PAGE_NUMBER.size
+            f.seek((page_number - 1) * page_size)
+            f.write(data[offset : offset + page_size])
+            offset += page_size
+        return page_size, page_count
+
+    def enable_wal(self) -> None:
+        """Switch the database to WAL mode, so syncs do not block writers."""
+        with self._lock.write_lock():
+            state = self._load_state()
+            tracked = state.database_stat == self._database_stat()
+            conn = sqlite3.connect(self._database_path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+            if tracked:
+                # The switch alone does not need a new snapshot.
+                state.database_stat = self._database_stat()
+                self._save_state(state)
+
+    def sync(
+        self, lock: Callable[[], AbstractContextManager[Any]] = nullcontext
+    ) -> bool:
+        """
+        Ship the transactions committed since the last sync. Returns whether any
+        were. `lock` must keep the database from being written, and is held while
+        the changes are collected, but not while they are shipped.
+        """
+        with self._lock.write_lock():
+            state = self._load_state()
+            with lock():
+                changes = self._read_wal(state.wal_salt, state.wal_offset)
+                if (
+                    state.generation.number == 0
+                    or state.database_stat != self._database_stat()
+                    or (changes and changes.page_size != state.page_size)
+                    or (changes and changes.pages and self._should_compact(state))
+                ):
+                    page_size, image = self._read_image()
+                elif changes and changes.pages:
+                    page_size, image = changes.page_size, None
+                else:
+                    return False
+                state.wal_salt, state.wal_offset = (
+                    (changes.salt, changes.offset) if changes else (None, 0)
+                )
+                if self._checkpoint():
+                    state.wal_salt, state.wal_offset = None, 0
+                state.database_stat = self._database_stat()
+
+            # Should shipping fail, the state is not saved, and as the checkpoint
+            # changed the database file, the next sync ships a snapshot.
+            if image is not None:
+                self._snapshot(state, image)
+            else:
+                changes = cast(_WalChanges, changes)
+                self._segment(state, page_size, changes.page_count, changes.pages)
+            state.page_size = page_size
+            self._save_state(state)
+            return True
+
+    def _should_compact(self, state: _State) -> bool:
+        generation = state.generation
+        return (
+            len(generation.segments) >= self._max_segments
+            or generation.segments_size >= generation.snapshot_size
+        )
+
+    def _snapshot(self, state: _State, database: bytes) -> None:
+        previous = state.generation
+        number = max(previous.number, self._latest_generation()) + 1
+        self._fs.makedirs(self._remote_path, exist_ok=True)
+        data = zlib.compress(database)
+        self._fs.pipe_file(self._object_path(_SNAPSHOT.format(generation=number)), data)
+        state.generation = _Generation(number, len(data))
+        # The new snapshot is complete, the older generations can go.
+        for name, generation, _ in self._list_objects():
+            if generation < number:
+                self._fs.rm_file(self._object_path(name))
+        logger.info(
+            "Shipped database snapshot",
+            extra={"generation": number, "bytes": len(data)},
+        )
+
+    def _segment(
+        self, state: _State, page_size: int, page_count: int, pages: dict[int, bytes]
+    ) -> None:
+        generation = state.generation
+        body = [_SEGMENT_HEADER.pack(page_size, page_count)]
+        for page_number, page in sorted(pages.items()):
+            # Pages past the end were freed by the transaction that shrank it.
+            if page_number <= page_count:
+                body += [_PAGE_NUMBER.pack(page_number), page]
+        data = zlib.compress(b"".join(body))
+        name = _SEGMENT.format(
+            generation=generation.number, sequence=len(generation.segments) + 1
+        )
+        self._fs.pipe_file(self._object_path(name), data)
+        generation.segments.append(name)
+        generation.segments_size += len(data)
+        logger.debug(
+            "Shipped database segment",
+            extra={"segment": name, "pages": len(pages), "bytes": len(data)},
+        )
+
+    def _latest_generation(self) -> int:
+        objects = self._list_objects()
+        return objects[-1][1] if objects else 0
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import asyncio
+import fcntl
+import os
 import threading
 from contextlib import asynccontextmanager, contextmanager
 from typing import AsyncIterator, Iterator
@@ -115,6 +117,91 @@ class ThreadReadWriteLock(AbstractReadWriteLock):
             await asyncio.to_thread(self._release_write)
 
 
+class FileReadWriteLock(AbstractReadWriteLock):
+    """
+    RW Lock on a lock file with `flock`, shared by the processes and threads using the
+    same path, such as the workers of an app. Each acquisition opens the file, so
+    acquisitions within a process exclude each other too, and a process holding a
+    read lock must release it before taking the write lock.
+    """
+
+    POLL_INTERVAL = 0.001
+    MAX_POLL_INTERVAL = 0.05
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+
+    def _acquire(self, operation: int) -> int:
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    async def _acquire_async(self, operation: int) -> int:
+        # Polls rather than blocking a thread, so cancelling the waiting task is safe.
+        # Unlike ThreadReadWriteLock, waiting writers do not hold off new readers.
+        delay = self.POLL_INTERVAL
+        while True:
+            try:
+                return self._acquire(operation | fcntl.LOCK_NB)
+            except BlockingIOError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_POLL_INTERVAL)
+
+    @staticmethod
+    def _release(fd: int) -> None:
+        # Closing the file releases the lock.
+        os.close(fd)
+
+    @contextmanager
+    def read_lock(self) -> Iterator[None]:
+        fd = self._acquire(fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            self._release(fd)
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        fd = self._acquire(fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            self._release(fd)
+
+    @contextmanager
+    def try_write_lock(self) -> Iterator[bool]:
+        """Take the write lock only if free. Yields whether it was taken."""
+        try:
+            fd = self._acquire(fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._release(fd)
+
+    @asynccontextmanager
+    async def async_read_lock(self) -> AsyncIterator[None]:
+        fd = await self._acquire_async(fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            self._release(fd)
+
+    @asynccontextmanager
+    async def async_write_lock(self) -> AsyncIterator[None]:
+        fd = await self._acquire_async(fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            self._release(fd)
+
+
 class MockReadWriteLock(AbstractReadWriteLock):
     """
     Has the same interface as ThreadReadWriteLock but do no blocking.
@@ -11,10 +11,18 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import multiprocessing
 import threading
 import time
+from pathlib import Path
 
-from core.utils.rw_lock import AbstractReadWriteLock, MockReadWriteLock, ThreadReadWriteLock
+from core.utils.rw_lock import (
+    AbstractReadWriteLock,
+    FileReadWriteLock,
+    MockReadWriteLock,
+    ThreadReadWriteLock,
+)
 
 
 def thread_read_process(
@@ -102,3 +110,75 @@ def test_mock_read_write_lock() -> None:
     ]
 
     assert expected_result == result
+
+
+def process_increment(lock_path: str, counter_path: str, times: int) -> None:
+    lock = FileReadWriteLock(lock_path)
+    for _ in range(times):
+        with lock.write_lock():
+            counter = Path(counter_path)
+            value = int(counter.read_text())
+            # Another process would read the same value without the lock.
+            time.sleep(0.001)
+            counter.write_text(str(value + 1))
+
+
+def test_file_read_write_lock_across_processes(tmp_path: Path) -> None:
+    lock_path = str(tmp_path / "counter.lock")
+    counter = tmp_path / "counter"
+    counter.write_text("0")
+    processes = [
+        multiprocessing.get_context("spawn").Process(
+            target=process_increment, args=(lock_path, str(counter), 20)
+        )
+        for _ in range(4)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    assert counter.read_text() == "80"
+
+
+def test_file_read_write_lock_readers_share(tmp_path: Path) -> None:
+    result: list[str] = []
+    lock = FileReadWriteLock(str(tmp_path / "lock"))
+    writer = threading.Thread(
+        target=thread_write_process, args=(lock, result, 0, "write")
+    )
+    with lock.read_lock(), lock.read_lock():
+        writer.start()
+        time.sleep(0.1)
+        result.append("read")
+    writer.join()
+
+    # The writer waited for both readers.
+    assert result == ["read", "write"]
+
+
+def test_file_read_write_lock_try_write_lock(tmp_path: Path) -> None:
+    lock = FileReadWriteLock(str(tmp_path / "lock"))
+    with lock.read_lock():
+        with lock.try_write_lock() as acquired:
+            assert not acquired
+    with lock.try_write_lock() as acquired:
+        assert acquired
+
+
+async def acquire_both(lock: FileReadWriteLock, result: list[str]) -> None:
+    async def write() -> None:
+        async with lock.async_write_lock():
+            result.append("write")
+
+    async with lock.async_read_lock():
+        writer = asyncio.create_task(write())
+        await asyncio.sleep(0.05)
+        result.append("read")
+    await writer
+
+
+def test_file_read_write_lock_async(tmp_path: Path) -> None:
+    result: list[str] = []
+    asyncio.run(acquire_both(FileReadWriteLock(str(tmp_path / "lock")), result))
+    assert result == ["read", "write"]
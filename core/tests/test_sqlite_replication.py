@@ -0,0 +1,199 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# You may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import sqlite3
+from pathlib import Path
+
+import pytest
+from fsspec.implementations.dirfs import DirFileSystem
+from fsspec.implementations.local import LocalFileSystem
+
+from core.persistent_fs.sqlite_replication import SQLiteReplicator
+
+
+@pytest.fixture
+def remote(tmp_path: Path) -> DirFileSystem:
+    """A local directory standing in for the DataRobot file storage."""
+    (tmp_path / "remote").mkdir()
+    return DirFileSystem(path=str(tmp_path / "remote"), fs=LocalFileSystem())
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    """A connection of the app, which leaves checkpoints to the replicator."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    return conn
+
+
+def _execute(conn: sqlite3.Connection, *statements: str) -> None:
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _rows(path: Path) -> list[tuple[int, str]]:
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT id, body FROM t ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def _objects(remote: DirFileSystem) -> list[str]:
+    return sorted(p.rsplit("/", 1)[-1] for p in remote.ls("db.replica", detail=False))
+
+
+def test_ships_changed_pages_and_restores(
+    tmp_path: Path, remote: DirFileSystem
+) -> None:
+    db_path = tmp_path / "db.sqlite"
+    replicator = SQLiteReplicator(remote, str(db_path), remote_path="db")
+    assert not replicator.restore()
+    replicator.enable_wal()
+    conn = _connect(db_path)
+    _execute(conn, "CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)")
+    _execute(
+        conn,
+        *[f"INSERT INTO t VALUES ({i}, hex(randomblob(500)))" for i in range(200)],
+    )
+
+    assert replicator.sync()
+    assert not replicator.sync()
+    _execute(conn, "UPDATE t SET body = 'changed' WHERE id = 5")
+    assert replicator.sync()
+    # The WAL is checkpointed and truncated by each sync.
+    assert (tmp_path / "db.sqlite-wal").stat().st_size == 0
+    _execute(conn, "DELETE FROM t WHERE id >= 100", "VACUUM")
+    assert replicator.sync()
+
+    assert _objects(remote) == [
+        "segment-0000000001-0000000001",
+        "segment-0000000001-0000000002",
+        "snapshot-0000000001",
+    ]
+    # Only the changed pages were shipped.
+    assert remote.size("db.replica/segment-0000000001-0000000001") < (
+        remote.size("db.replica/snapshot-0000000001") / 10
+    )
+
+    restored_path = tmp_path / "restored.sqlite"
+    restored = SQLiteReplicator(remote, str(restored_path), remote_path="db")
+    assert restored.restore()
+    restored.enable_wal()
+    assert _rows(restored_path) == _rows(db_path)
+    assert sqlite3.connect(restored_path).execute(
+        "PRAGMA integrity_check"
+    ).fetchone() == ("ok",)
+
+    # Replication resumes from the restored state.
+    restored_conn = _connect(restored_path)
+    _execute(restored_conn, "INSERT INTO t VALUES (1000, 'new')")
+    assert restored.sync()
+    assert _objects(remote)[-2] == "segment-0000000001-0000000003"
+
+
+def test_ships_only_committed_transactions(
+    tmp_path: Path, remote: DirFileSystem
+) -> None:
+    db_path = tmp_path / "db.sqlite"
+    replicator = SQLiteReplicator(remote, str(db_path), remote_path="db")
+    replicator.enable_wal()
+    conn = _connect(db_path)
+    _execute(conn, "CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)")
+    replicator.sync()
+    reader = _connect(db_path)
+    _execute(conn, "INSERT INTO t VALUES (1, 'one')")
+    # A reader keeps the WAL from being truncated.
+    _execute(reader, "BEGIN", "SELECT * FROM t")
+    assert replicator.sync()
+    _execute(reader, "COMMIT")
+    # Carried on from the last shipped frame of the WAL.
+    _execute(conn, "INSERT INTO t VALUES (2, 'two')", "BEGIN")
+    _execute(conn, *[f"INSERT INTO t VALUES ({i}, 'x')" for i in range(3, 1000)])
+    assert replicator.sync()
+
+    restored_path = tmp_path / "restored.sqlite"
+    SQLiteReplicator(remote, str(restored_path), remote_path="db").restore()
+    assert _rows(restored_path) == [(1, "one"), (2, "two")]
+
+
+def test_processes_carry_on_from_each_other(
+    tmp_path: Path, remote: DirFileSystem
+) -> None:
+    db_path = tmp_path / "db.sqlite"
+    # The replicators of two worker processes.
+    replicators = [
+        SQLiteReplicator(remote, str(db_path), remote_path="db") for _ in range(2)
+    ]
+    replicators[0].enable_wal()
+    conn = _connect(db_path)
+    _execute(conn, "CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)")
+    for i in range(4):
+        _execute(conn, f"INSERT INTO t VALUES ({i}, 'row')")
+        assert replicators[i % 2].sync()
+
+    assert _objects(remote) == [
+        "segment-0000000001-0000000001",
+        "segment-0000000001-0000000002",
+        "segment-0000000001-0000000003",
+        "snapshot-0000000001",
+    ]
+    restored_path = tmp_path / "restored.sqlite"
+    SQLiteReplicator(remote, str(restored_path), remote_path="db").restore()
+    assert _rows(restored_path) == _rows(db_path)
+
+
+def test_untracked_changes_start_a_new_generation(
+    tmp_path: Path, remote: DirFileSystem
+) -> None:
+    db_path = tmp_path / "db.sqlite"
+    replicator = SQLiteReplicator(remote, str(db_path), remote_path="db")
+    replicator.enable_wal()
+    conn = _connect(db_path)
+    _execute(conn, "CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)")
+    replicator.sync()
+    _execute(conn, "INSERT INTO t VALUES (1, 'one')")
+    # The last connection closing checkpoints the WAL.
+    conn.close()
+
+    assert replicator.sync()
+
+    assert _objects(remote) == ["snapshot-0000000002"]
+    restored_path = tmp_path / "restored.sqlite"
+    SQLiteReplicator(remote, str(restored_path), remote_path="db").restore()
+    assert _rows(restored_path) == [(1, "one")]
+
+
+def test_compacts_into_a_new_snapshot(tmp_path: Path, remote: DirFileSystem) -> None:
+    db_path = tmp_path / "db.sqlite"
+    replicator = SQLiteReplicator(
+        remote, str(db_path), remote_path="db", max_segments=2
+    )
+    replicator.enable_wal()
+    conn = _connect(db_path)
+    _execute(
+        conn,
+        "CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)",
+        *[f"INSERT INTO t VALUES ({i}, hex(randomblob(500)))" for i in range(100)],
+    )
+    replicator.sync()
+    for i in range(4):
+        _execute(conn, f"UPDATE t SET body = 'row' WHERE id = {i}")
+        replicator.sync()
+
+    # Snapshot, 2 segments, then a new generation.
+    assert _objects(remote) == [
+        "segment-0000000002-0000000001",
+        "snapshot-0000000002",
+    ]
+    restored_path = tmp_path / "restored.sqlite"
+    SQLiteReplicator(remote, str(restored_path), remote_path="db").restore()
+    assert _rows(restored_path) == _rows(db_path)
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 import argparse
+import logging
 import os
+import time
 from types import TracebackType
 from typing import cast
 
@@ -28,15 +30,32 @@ from core.persistent_fs.kv_custom_app_implementattion import (
 
 MIGRATION_LOCK_NAME = "alembic_migration_lock"
 
+logger = logging.getLogger(__name__)
+
 
 class MigrationLock:
+    """
+    Lock of the migrations across the instances of the app, as a DataRobot key value.
+
+    With `wait_timeout`, a lock held by another instance is polled every
+    `poll_interval` seconds, and taken over once held for longer than the timeout,
+    as left behind by an instance that crashed while migrating. Otherwise a held
+    lock raises at once.
+    """
+
     def __init__(
-        self, ignore_lock: bool = False, client: dr.rest.RESTClientObject | None = None
+        self,
+        ignore_lock: bool = False,
+        client: dr.rest.RESTClientObject | None = None,
+        wait_timeout: float = 0.0,
+        poll_interval: float = 5.0,
     ):
         self.environment_is_set = all_env_variables_present()
         self.client = client
         self.lock: KeyValue | None = None
         self.ignore_lock = ignore_lock
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
 
         if self.environment_is_set and not self.client:
             self.client = dr.Client(
@@ -45,11 +64,20 @@ class MigrationLock:
             )
 
     def __enter__(self) -> None:
-        if self._get_lock_value() and not self.ignore_lock:
+        deadline = time.monotonic() + self.wait_timeout
+        while self._get_lock_value() and not self.ignore_lock:
             # migration is already in process
-            raise RuntimeError(
-                f"Migration for app #{os.environ['APPLICATION_ID']} is already in process"
-            )
+            if self.wait_timeout <= 0:
+                raise RuntimeError(
+                    f"Migration for app #{os.environ['APPLICATION_ID']} is already in process"
+                )
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    "Taking over the migration lock, held for longer than %ss",
+                    self.wait_timeout,
+                )
+                break
+            time.sleep(self.poll_interval)
         self._set_lock_value(True)
 
     def __exit__(
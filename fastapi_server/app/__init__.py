@@ -11,25 +11,27 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import json
 import logging
 import os
 import warnings
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Awaitable, Callable
 
 from core.telemetry import configure_uvicorn_logging, init_logging
 from datarobot_asgi_middleware import DataRobotASGIMiddleware
-from fastapi import APIRouter, FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, FastAPI, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.api import router as api_router
 from app.config import Config
-from app.deps import Deps, create_deps
+from app.db import track_queries
+from app.deps import Deps, MigrationError, create_deps
 
 base_router = APIRouter()
 
@@ -47,15 +49,31 @@ warnings.filterwarnings("ignore")
 
 
 @base_router.get("/health")
-async def health() -> dict[str, str]:
+async def health(request: Request, response: Response) -> dict[str, str]:
     """
-    Health check endpoint for Kubernetes probes.
+    Liveness check endpoint for Kubernetes probes, answered while the app starts up.
+    Fails only if the startup did, but not for a failed migration, which restarting
+    the app would only retry.
 
     If you don't want this, delete `use_health=True` in the middleware.
     """
+    error = getattr(request.app.state, "startup_error", None)
+    if error and not isinstance(error, MigrationError):
+        response.status_code = 503
+        return {"status": "failed"}
     return {"status": "healthy"}
 
 
+@base_router.get("/ready")
+async def ready(request: Request, response: Response) -> dict[str, str]:
+    """Readiness check endpoint, which succeeds once the dependencies are set up."""
+    if getattr(request.app.state, "deps", None) is None:
+        response.status_code = 503
+        failed = getattr(request.app.state, "startup_error", None)
+        return {"status": "failed" if failed else "starting"}
+    return {"status": "ready"}
+
+
 def register_log_filter() -> None:
     """
     Removes logs from healthiness/readiness endpoints so they don't spam
@@ -67,7 +85,7 @@ def register_log_filter() -> None:
             return (
                 record.args  # type: ignore[return-value]
                 and len(record.args) >= 3
-                and record.args[2] != "/health"  # type: ignore[index]
+                and record.args[2] not in ("/health", "/ready")  # type: ignore[index, operator]
             )
 
     logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
@@ -132,11 +150,31 @@ def create_app(
 
     logger.info("App is starting up.")
 
+    async def start_up(stack: AsyncExitStack) -> None:
+        try:
+            app.state.deps = await stack.enter_async_context(create_deps(config))
+        except Exception as e:
+            logger.exception("App failed to start up.")
+            app.state.startup_error = e
+
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-        async with create_deps(config, deps) as dependencies:
-            app.state.deps = dependencies
-            yield
+        if deps:
+            async with create_deps(config, deps) as dependencies:
+                app.state.deps = dependencies
+                yield
+            return
+
+        # The dependencies are set up in the background, so the server answers
+        # /health right away and /ready once they are.
+        async with AsyncExitStack() as stack:
+            startup = asyncio.create_task(start_up(stack))
+            try:
+                yield
+            finally:
+                startup.cancel()
+                with suppress(asyncio.CancelledError):
+                    await startup
 
     app = FastAPI(title=title, lifespan=lifespan)
 
@@ -165,6 +203,42 @@ def create_app(
         path=cookie_path,
     )
 
+    @app.middleware("http")
+    async def add_query_timing(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        """
+        Report the SQL statements of the request and their time in the
+        `Server-Timing` header and the logs. For streamed responses, only the
+        statements run before the stream starts are included.
+        """
+        with track_queries() as stats:
+            response = await call_next(request)
+        response.headers["Server-Timing"] = stats.server_timing()
+        logger.debug(
+            "Request database usage",
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                **stats.log_fields(),
+            },
+        )
+        return response
+
+    @app.middleware("http")
+    async def wait_for_startup(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        """Answer the API requests with 503 until the dependencies are set up."""
+        path = request.scope["path"].removeprefix(request.scope.get("root_path", ""))
+        if path.startswith("/api") and getattr(app.state, "deps", None) is None:
+            return JSONResponse(
+                {"detail": "The app is starting up."},
+                status_code=503,
+                headers={"Retry-After": "5"},
+            )
+        return await call_next(request)
+
     app.include_router(base_router)
 
     # This is the base path for the app, used to serve static files and templates
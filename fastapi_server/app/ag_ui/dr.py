@@ -15,13 +15,15 @@
 import asyncio
 import logging
 import uuid
-from typing import Any, AsyncGenerator, Dict
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Iterator
 
 from ag_ui.core import (
     BaseEvent,
     CustomEvent,
     Event,
     EventType,
+    Message,
     RunAgentInput,
     RunErrorEvent,
     RunFinishedEvent,
@@ -29,10 +31,13 @@ from ag_ui.core import (
     TextMessageContentEvent,
     TextMessageEndEvent,
     TextMessageStartEvent,
-    ToolCallChunkEvent,
+    ToolCallArgsEvent,
+    ToolCallEndEvent,
+    ToolCallStartEvent,
 )
 from openai import AsyncOpenAI, AsyncStream
 from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
 from pydantic import TypeAdapter
 
 from app.ag_ui.base import AGUIAgent
@@ -118,6 +123,116 @@ async def _heartbeat_generator(
         yield heartbeat_event
 
 
+@dataclass
+class _StreamingToolCall:
+    tool_call_id: str
+    pending_arguments: str = ""
+    # Set for the calls opened from OpenAI-style fragments, which we start and end.
+    parent_message_id: str | None = None
+    name: str = ""
+    # Whether we emitted the start event (and so are responsible for the end event).
+    started: bool = False
+
+
+class _ToolCallAggregator:
+    """
+    Turns streamed tool call fragments into `ToolCallStart/Args/End` events.
+
+    Argument fragments are coalesced until `flush_size` characters are buffered, or
+    until the tool call ends when `flush_size` is 0. OpenAI-style fragments are
+    tracked by index, so parallel tool calls are kept apart, and their start event
+    waits for the tool name, which may come after the first fragment.
+    """
+
+    def __init__(self, flush_size: int) -> None:
+        self._flush_size = flush_size
+        self._by_index: dict[int, _StreamingToolCall] = {}
+        self._by_id: dict[str, _StreamingToolCall] = {}
+
+    def add_chunk(
+        self, chunk: ChoiceDeltaToolCall, parent_message_id: str
+    ) -> Iterator[BaseEvent]:
+        """Handle an OpenAI-style tool call delta."""
+        tool_call = self._by_index.get(chunk.index)
+        if tool_call is None or (chunk.id and chunk.id != tool_call.tool_call_id):
+            # A new id at a known index means the previous call at that index is done.
+            if tool_call is not None:
+                yield from self.end(tool_call.tool_call_id)
+            tool_call = _StreamingToolCall(
+                tool_call_id=chunk.id or str(uuid.uuid4()),
+                parent_message_id=parent_message_id,
+            )
+            self._by_index[chunk.index] = tool_call
+            self._by_id[tool_call.tool_call_id] = tool_call
+        if chunk.function and chunk.function.name and not tool_call.name:
+            tool_call.name = chunk.function.name
+        if tool_call.name:
+            yield from self._start(tool_call)
+        if chunk.function and chunk.function.arguments:
+            yield from self.add_arguments(
+                tool_call.tool_call_id, chunk.function.arguments
+            )
+
+    def _start(self, tool_call: _StreamingToolCall) -> Iterator[BaseEvent]:
+        """Emit the start event of a call opened here, once."""
+        if tool_call.parent_message_id is not None and not tool_call.started:
+            tool_call.started = True
+            yield ToolCallStartEvent(
+                tool_call_id=tool_call.tool_call_id,
+                tool_call_name=tool_call.name,
+                parent_message_id=tool_call.parent_message_id,
+            )
+
+    def add_arguments(self, tool_call_id: str, delta: str) -> Iterator[BaseEvent]:
+        """Buffer an argument fragment, emitting it once enough has accumulated."""
+        tool_call = self._by_id.get(tool_call_id)
+        if tool_call is None:
+            tool_call = self._by_id[tool_call_id] = _StreamingToolCall(tool_call_id)
+        tool_call.pending_arguments += delta
+        # Arguments of a call still waiting for its name wait too.
+        waiting = tool_call.parent_message_id is not None and not tool_call.started
+        if (
+            self._flush_size
+            and not waiting
+            and len(tool_call.pending_arguments) >= self._flush_size
+        ):
+            yield from self.flush(tool_call_id)
+
+    def flush(self, tool_call_id: str) -> Iterator[BaseEvent]:
+        """Emit any buffered arguments of a tool call, starting it if need be."""
+        tool_call = self._by_id.get(tool_call_id)
+        if tool_call:
+            yield from self._start(tool_call)
+        if tool_call and tool_call.pending_arguments:
+            yield ToolCallArgsEvent(
+                tool_call_id=tool_call_id, delta=tool_call.pending_arguments
+            )
+            tool_call.pending_arguments = ""
+
+    def end(self, tool_call_id: str) -> Iterator[BaseEvent]:
+        """Flush and close a tool call, ending it if this aggregator started it."""
+        yield from self.flush(tool_call_id)
+        tool_call = self._by_id.pop(tool_call_id, None)
+        self._by_index = {
+            i: tc for i, tc in self._by_index.items() if tc is not tool_call
+        }
+        if tool_call and tool_call.started:
+            yield ToolCallEndEvent(tool_call_id=tool_call_id)
+
+    def end_all(self) -> Iterator[BaseEvent]:
+        """Flush every pending tool call, closing the ones started here."""
+        for tool_call_id in list(self._by_id):
+            yield from self.end(tool_call_id)
+
+
+def _messages_since_last_reply(messages: list[Message]) -> list[Message]:
+    """Return the messages that come after the last non-user message."""
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].role != "user":
+            return messages[i + 1 :]
+    return messages
+
+
 class DataRobotAGUIAgent(AGUIAgent):
     """AG-UI wrapper for a DataRobot Agent."""
 
@@ -143,6 +258,8 @@ class DataRobotAGUIAgent(AGUIAgent):
         )
         self.heartbeat_interval = heartbeat_interval
         self.check_interval = check_interval
+        self.send_message_delta = config.agent_send_message_delta
+        self.tool_call_args_flush_size = config.tool_call_args_flush_size
 
     async def run(self, input: RunAgentInput) -> AsyncGenerator[BaseEvent, None]:
         # Create shared flag for heartbeat to check if main stream finished
@@ -165,6 +282,7 @@ class DataRobotAGUIAgent(AGUIAgent):
         self, input: RunAgentInput
     ) -> AsyncGenerator[BaseEvent, None]:
         yield RunStartedEvent(thread_id=input.thread_id, run_id=input.run_id)
+        tool_calls = _ToolCallAggregator(self.tool_call_args_flush_size)
         try:
             message_id = str(uuid.uuid4())
 
@@ -186,8 +304,18 @@ class DataRobotAGUIAgent(AGUIAgent):
                     if event.type not in [
                         EventType.TEXT_MESSAGE_CONTENT,
                         EventType.THINKING_TEXT_MESSAGE_CONTENT,
+                        EventType.TOOL_CALL_ARGS,
                     ]:
                         logger.info(f"Received event: {chunk.event}")
+                    if isinstance(event, ToolCallArgsEvent):
+                        for e in tool_calls.add_arguments(
+                            event.tool_call_id, event.delta
+                        ):
+                            yield e
+                        continue
+                    if isinstance(event, ToolCallEndEvent):
+                        for e in tool_calls.flush(event.tool_call_id):
+                            yield e
                     yield event
                     continue
 
@@ -207,16 +335,11 @@ class DataRobotAGUIAgent(AGUIAgent):
                     )
                 if choice.delta.tool_calls:
                     for tool_call in choice.delta.tool_calls:
-                        yield ToolCallChunkEvent(
-                            tool_call_id=tool_call.id,
-                            tool_call_name=tool_call.function.name
-                            if tool_call.function
-                            else None,
-                            delta=tool_call.function.arguments
-                            if tool_call.function
-                            else None,
-                            parent_message_id=message_id,
-                        )
+                        for e in tool_calls.add_chunk(tool_call, message_id):
+                            yield e
+                if choice.finish_reason:
+                    for e in tool_calls.end_all():
+                        yield e
             if chunks == 0:
                 raise RuntimeError(
                     "No response received from the agent. Please check if agent supports streaming."
@@ -224,6 +347,9 @@ class DataRobotAGUIAgent(AGUIAgent):
 
             logger.debug("Processed all chat completions")
 
+            for e in tool_calls.end_all():
+                yield e
+
             if text_message_started:
                 yield TextMessageEndEvent(message_id=message_id)
 
@@ -231,11 +357,21 @@ class DataRobotAGUIAgent(AGUIAgent):
 
         except Exception as e:
             logger.exception("Error during agent run")
+            # Keep the arguments received so far.
+            for tool_call_event in tool_calls.end_all():
+                yield tool_call_event
             yield RunErrorEvent(message=str(e))
 
     def _prepare_chat_completions_input(self, input: RunAgentInput) -> Dict[str, Any]:
+        input_messages = input.messages
+        extra_body: Dict[str, Any] = {}
+        if self.send_message_delta:
+            input_messages = _messages_since_last_reply(input_messages)
+            # Lets the agent resume the thread from its own checkpointed state.
+            extra_body["thread_id"] = input.thread_id
+
         messages = []
-        for input_message in input.messages:
+        for input_message in input_messages:
             messages.append(
                 {
                     "role": input_message.role,
@@ -247,4 +383,5 @@ class DataRobotAGUIAgent(AGUIAgent):
             "messages": messages,
             "model": "custom-model",
             "stream": True,
+            "extra_body": extra_body,
         }
@@ -14,6 +14,7 @@
 
 import json
 import logging
+from contextlib import AbstractAsyncContextManager, nullcontext
 from dataclasses import dataclass
 from typing import AsyncGenerator, final
 from uuid import UUID, uuid4
@@ -45,6 +46,7 @@ from ag_ui.core import (
 from app.ag_ui.base import AGUIAgent
 from app.ag_ui.error_codes import ErrorCodes
 from app.chats import Chat, ChatCreate, ChatRepository
+from app.db import DBCtx, DBShards
 from app.messages import (
     Message,
     MessageCreate,
@@ -84,6 +86,7 @@ class AGUIAgentWithStorage(AGUIAgent):
         chat_repo: ChatRepository,
         message_repo: MessageRepository,
         minimal_chunk_to_persist: int = 0,
+        db: DBCtx | DBShards | None = None,
     ):
         """
         Initialize an agent.
@@ -95,6 +98,7 @@ class AGUIAgentWithStorage(AGUIAgent):
             chat_repo (ChatRepository): The repository of chats
             message_repo (MessageRepository): The repository of messages.
             minimal_chunk_to_persist (int): How many new characters we need before persisting (for agents that stream very small chunks)
+            db (DBCtx | DBShards | None): The database, to record the chat and user messages of a run in one unit of work.
         """
         super().__init__(name)
         if isinstance(inner, AGUIAgentWithStorage):
@@ -106,6 +110,7 @@ class AGUIAgentWithStorage(AGUIAgent):
         self._chat_repo = chat_repo
         self._message_repo = message_repo
         self._minimal_chunk_to_persist = minimal_chunk_to_persist
+        self._db = db
 
     async def run(self, input: RunAgentInput) -> AsyncGenerator[BaseEvent, None]:
         """
@@ -119,66 +124,82 @@ class AGUIAgentWithStorage(AGUIAgent):
         """
         existing_chat: Chat
 
-        logger.debug(
-            "Fetching initial chat",
-            extra={"thread_id": input.thread_id, "user": str(self._user_id)},
+        # The chat and the new user messages are recorded in one unit of work.
+        unit_of_work: AbstractAsyncContextManager[None] = (
+            self._db.unit_of_work() if self._db else nullcontext()
         )
-
-        if maybe_chat := await self._chat_repo.get_chat_by_thread_id(
-            self._user_id, input.thread_id
-        ):
-            existing_chat = maybe_chat
-        else:
+        async with unit_of_work:
             logger.debug(
-                "Creating initial chat",
+                "Fetching initial chat",
                 extra={"thread_id": input.thread_id, "user": str(self._user_id)},
             )
 
-            if (
-                input.messages
-                and isinstance(input.messages[0].content, str)
-                and len(input.messages[0].content.strip()) > 0
+            if maybe_chat := await self._chat_repo.get_chat_by_thread_id(
+                self._user_id, input.thread_id
             ):
-                chat_name = input.messages[0].content[:20].strip()
+                existing_chat = maybe_chat
             else:
-                chat_name = "New Chat"
+                logger.debug(
+                    "Creating initial chat",
+                    extra={"thread_id": input.thread_id, "user": str(self._user_id)},
+                )
 
-            existing_chat = await self._chat_repo.create_chat(
-                ChatCreate(
-                    user_uuid=self._user_id, name=chat_name, thread_id=input.thread_id
+                if (
+                    input.messages
+                    and isinstance(input.messages[0].content, str)
+                    and len(input.messages[0].content.strip()) > 0
+                ):
+                    chat_name = input.messages[0].content[:20].strip()
+                else:
+                    chat_name = "New Chat"
+
+                existing_chat = await self._chat_repo.create_chat(
+                    ChatCreate(
+                        user_uuid=self._user_id,
+                        name=chat_name,
+                        thread_id=input.thread_id,
+                    )
                 )
-            )
 
-        for message in input.messages:
-            existing_message = await self._message_repo.get_message_by_agui_id(
-                existing_chat.uuid, message.id
+            existing_agui_ids = await self._message_repo.get_existing_agui_ids(
+                existing_chat.uuid, [message.id for message in input.messages]
             )
-            if existing_message:
-                if existing_chat.uuid != existing_message.chat_id:
-                    yield RunErrorEvent(
-                        message="Messages do not all belong to the same chat",
-                        code=ErrorCodes.INVALID_INPUT.value,
-                    )
-                    return
-            else:
-                if message.role != "user":
-                    yield RunErrorEvent(
-                        message="The user cannot create new non-user messages.",
-                        code=ErrorCodes.INVALID_INPUT.value,
-                    )
-                    return
-
-                await self._message_repo.create_message(
-                    MessageCreate(
-                        chat_id=existing_chat.uuid,
-                        role=Role.USER.value,
-                        agui_id=message.id,
-                        name=message.name or "",
-                        content=message.content,
-                        error=None,
-                        in_progress=False,
+            for message in input.messages:
+                if message.id not in existing_agui_ids:
+                    if message.role != "user":
+                        yield RunErrorEvent(
+                            message="The user cannot create new non-user messages.",
+                            code=ErrorCodes.INVALID_INPUT.value,
+                        )
+                        return
+
+                    await self._message_repo.create_message(
+                        MessageCreate(
+                            chat_id=existing_chat.uuid,
+                            role=Role.USER.value,
+                            agui_id=message.id,
+                            name=message.name or "",
+                            content=message.content,
+                            error=None,
+                            in_progress=False,
+                        )
                     )
-                )
+                    existing_agui_ids.add(message.id)
+
+        # The client only has previews of the offloaded contents.
+        if contents := await self._message_repo.get_offloaded_contents(
+            existing_chat.uuid, [message.id for message in input.messages]
+        ):
+            input = input.model_copy(
+                update={
+                    "messages": [
+                        message.model_copy(update={"content": contents[message.id]})
+                        if message.id in contents
+                        else message
+                        for message in input.messages
+                    ]
+                }
+            )
 
         state = StorageStateMachineState()
 
@@ -262,23 +283,10 @@ class AGUIAgentWithStorage(AGUIAgent):
             await self._ensure_message_exists(state, existing_chat, None, None)
             assert state.active_message, "Message created"
             if not state.active_reasoning:
-                # We need to ensure that active message is loaded here so that `reasonings` is live.
-                assert state.active_message.chat_id and state.active_message.agui_id
-                state.active_message = await self._message_repo.get_message_by_agui_id(
-                    state.active_message.chat_id, state.active_message.agui_id
-                )
-                assert state.active_message
-                if latest_reasoning := next(
-                    iter(
-                        sorted(
-                            filter(
-                                lambda r: r.in_progress, state.active_message.reasonings
-                            ),
-                            key=lambda r: r.created_at,
-                            reverse=True,
-                        )
-                    ),
-                    None,
+                if latest_reasoning := (
+                    await self._message_repo.get_in_progress_reasoning(
+                        state.active_message.uuid
+                    )
                 ):
                     state.active_reasoning = latest_reasoning
                 else:
@@ -309,17 +317,10 @@ class AGUIAgentWithStorage(AGUIAgent):
             await self._ensure_message_exists(state, existing_chat, None, None)
             assert state.active_message, "Message created"
             if not state.active_reasoning:
-                if latest_reasoning := next(
-                    iter(
-                        sorted(
-                            filter(
-                                lambda r: r.in_progress, state.active_message.reasonings
-                            ),
-                            key=lambda r: r.created_at,
-                            reverse=True,
-                        )
-                    ),
-                    None,
+                if latest_reasoning := (
+                    await self._message_repo.get_in_progress_reasoning(
+                        state.active_message.uuid
+                    )
                 ):
                     state.active_reasoning = latest_reasoning
                 else:
@@ -510,7 +511,7 @@ class AGUIAgentWithStorage(AGUIAgent):
 
             if agui_id:
                 if retrieved_message := await self._message_repo.get_message_by_agui_id(
-                    existing_chat.uuid, agui_id
+                    existing_chat.uuid, agui_id, with_children=False
                 ):
                     active_message = retrieved_message
                 else:
@@ -528,7 +529,9 @@ class AGUIAgentWithStorage(AGUIAgent):
                     )
             else:
                 last_message = (
-                    await self._message_repo.get_last_messages([existing_chat.uuid])
+                    await self._message_repo.get_last_messages(
+                        [existing_chat.uuid], with_children=False
+                    )
                 )[existing_chat.uuid]
                 if last_message.role == (role or Role.ASSISTANT.value):
                     active_message = last_message
@@ -546,6 +549,13 @@ class AGUIAgentWithStorage(AGUIAgent):
                         )
                     )
 
+        if active_message.content_length is not None:
+            # Resuming a finished message, restore its offloaded content to append to.
+            active_message.content = (
+                await self._message_repo.get_body(active_message.uuid)
+                or active_message.content
+            )
+            active_message.content_length = None
         state.active_message = active_message
 
     async def _ensure_tool_call_exists(
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import asyncio
+import logging
 import queue
 from collections.abc import AsyncGenerator
 from functools import partial
@@ -26,8 +27,11 @@ from app.ag_ui.dr import DataRobotAGUIAgent
 from app.ag_ui.storage import AGUIAgentWithStorage
 from app.chats import ChatRepository
 from app.config import Config
+from app.db import DBCtx, DBShards, track_queries
 from app.messages import MessageRepository
 
+logger = logging.getLogger(__name__)
+
 P = ParamSpec("P")
 
 
@@ -53,9 +57,18 @@ class AGUIStreamManager(Generic[P]):
 
         async def populate_queue() -> None:
             agent = self._agent_factory(*args, **kwargs)
-            async for event in agent.run(input):
-                q.put(event)
+            with track_queries() as stats:
+                async for event in agent.run(input):
+                    q.put(event)
             q.put(NoMoreEvents())
+            logger.info(
+                "Agent run database usage",
+                extra={
+                    "thread_id": input.thread_id,
+                    "run_id": input.run_id,
+                    **stats.log_fields(),
+                },
+            )
 
         async def iterate_queue() -> AsyncGenerator[BaseEvent, None]:
             while True:
@@ -90,6 +103,7 @@ def create_storage_dr_agent(
     chat_repo: ChatRepository,
     message_repo: MessageRepository,
     config: Config,
+    db: DBCtx | DBShards | None,
     user_id: UUID,
     headers: Dict[str, str],
 ) -> AGUIAgent:
@@ -102,6 +116,7 @@ def create_storage_dr_agent(
         message_repo=message_repo,
         inner=dr_agui,
         minimal_chunk_to_persist=config.minimal_chunks_to_persist,
+        db=db,
     )
 
     return storage
@@ -112,6 +127,9 @@ def create_stream_manager(
     chat_repo: ChatRepository,
     message_repo: MessageRepository,
     config: Config,
+    db: DBCtx | DBShards | None = None,
 ) -> AGUIStreamManager[UUID, Dict[str, str]]:
-    factory = partial(create_storage_dr_agent, name, chat_repo, message_repo, config)
+    factory = partial(
+        create_storage_dr_agent, name, chat_repo, message_repo, config, db
+    )
     return AGUIStreamManager(factory)
@@ -12,9 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Iterable
+from datetime import datetime
+from typing import Iterable, Protocol, Sequence, TypeVar
 
-from ag_ui.core import AssistantMessage, BaseMessage, FunctionCall, ToolCall
+from ag_ui.core import BaseMessage, FunctionCall, ToolCall
 
 from app.messages import Message, Role
 
@@ -25,6 +26,27 @@ class ExtendedBaseMessage(BaseMessage):
     in_progress: bool
     error: str | None
     tool_calls: list[ToolCall] | None = None
+    # Full length of `content` when it is only a preview, see `GET
+    # /chat/{thread_id}/messages/{message_id}/content`.
+    content_length: int | None = None
+
+
+class _Timestamped(Protocol):
+    @property
+    def created_at(self) -> datetime: ...
+
+
+T = TypeVar("T", bound=_Timestamped)
+
+
+def _by_created_at(items: Sequence[T]) -> Sequence[T]:
+    """
+    Order items by creation time. Repositories usually return them in order already,
+    so a linear check avoids copying and sorting the list.
+    """
+    if all(a.created_at <= b.created_at for a, b in zip(items, items[1:])):
+        return items
+    return sorted(items, key=lambda i: i.created_at)
 
 
 def translate_messages(messages: Iterable[Message]) -> Iterable[ExtendedBaseMessage]:
@@ -32,56 +54,60 @@ def translate_messages(messages: Iterable[Message]) -> Iterable[ExtendedBaseMess
     Iterates through internal messages and transforms them to public messages.
     Order is message, then tool call results, then reasonings.
 
+    Output models are built once from trusted database rows, without validation.
+
     Args:
         messages (Iterable[Message]): Internal message.
 
     Returns:
         Iterable[BaseMessage]: AGUI Message
     """
-    sorted_messages = sorted(messages, key=lambda m: m.created_at)
-    for message in sorted_messages:
-        sorted_tool_calls = sorted(message.tool_calls, key=lambda tc: tc.created_at)
+    if not isinstance(messages, Sequence):
+        messages = list(messages)
+    for message in _by_created_at(messages):
+        sorted_tool_calls = _by_created_at(message.tool_calls)
 
-        out: BaseMessage
+        tool_calls: list[ToolCall] | None = None
         if message.role == Role.ASSISTANT.value:
-            out = AssistantMessage(
-                id=message.agui_id or str(message.uuid),
-                role=message.role,
-                content=message.content,
-                name=message.name,
-                tool_calls=[
-                    ToolCall(
-                        id=tc.agui_id or str(tc.uuid),
-                        function=FunctionCall(name=tc.name, arguments=tc.arguments),
-                    )
-                    for tc in sorted_tool_calls
-                ],
-            )
-        else:
-            out = BaseMessage(
-                id=message.agui_id or str(message.uuid),
-                role=message.role,
-                content=message.content,
-                name=message.name,
-            )
-        yield ExtendedBaseMessage(
-            **out.model_dump(), in_progress=message.in_progress, error=message.error
+            tool_calls = [
+                ToolCall.model_construct(
+                    id=tc.agui_id or str(tc.uuid),
+                    type="function",
+                    function=FunctionCall.model_construct(
+                        name=tc.name, arguments=tc.arguments
+                    ),
+                )
+                for tc in sorted_tool_calls
+            ]
+        yield ExtendedBaseMessage.model_construct(
+            id=message.agui_id or str(message.uuid),
+            role=message.role,
+            content=message.content,
+            name=message.name,
+            in_progress=message.in_progress,
+            error=message.error,
+            tool_calls=tool_calls,
+            content_length=message.content_length,
         )
         for tc in sorted_tool_calls:
-            yield ExtendedBaseMessage(
+            yield ExtendedBaseMessage.model_construct(
                 id=tc.tool_call_id or str(tc.uuid),
                 role=Role.TOOL.value,
                 name=tc.name,
                 content=tc.content,
                 in_progress=tc.in_progress,
                 error=tc.error,
+                tool_calls=None,
+                content_length=tc.content_length,
             )
-        for reasoning in sorted(message.reasonings, key=lambda r: r.created_at):
-            yield ExtendedBaseMessage(
+        for reasoning in _by_created_at(message.reasonings):
+            yield ExtendedBaseMessage.model_construct(
                 id=reasoning.agui_id or str(reasoning.uuid),
                 role=Role.REASONING.value,
                 name=reasoning.name,
                 content=reasoning.content,
                 in_progress=reasoning.in_progress,
                 error=reasoning.error,
+                tool_calls=None,
+                content_length=None,
             )
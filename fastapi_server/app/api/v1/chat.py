@@ -14,28 +14,55 @@
 import logging
 from dataclasses import dataclass
 from datetime import datetime
-from typing import AsyncIterator
+from typing import AsyncGenerator, AsyncIterator
 
 from ag_ui.core import RunAgentInput
 from ag_ui.encoder import EventEncoder
 from datarobot.auth.session import AuthCtx
 from datarobot.auth.typing import Metadata
 from datarobot.core import getenv
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter
 
 from app.ag_ui.translate import ExtendedBaseMessage, translate_messages
 from app.auth.ctx import get_agent_headers, must_get_auth_ctx
 from app.chats import Chat, ChatBase, ChatRepository
+from app.db import use_shard
 from app.deps import Deps
 from app.messages import (
+    Message,
     MessageRepository,
+    message_version,
 )
+from app.messages.archive import ChatArchiveError, ChatArchiver
+from app.messages.search import MIN_QUERY_LENGTH, MessageSearchHit
+from app.pagination import Cursor, decode_cursor, encode_cursor
 from app.users.user import User, UserRepository
 
 logger = logging.getLogger(__name__)
-chat_router = APIRouter(tags=["Chat"])
+
+
+async def _unit_of_work(
+    request: Request, auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx)
+) -> AsyncGenerator[None, None]:
+    """
+    Share the database sessions of the request, and commit its writes at the end.
+    Authentication comes first, so its writes do not depend on the request's. With
+    a database per user, the request and its agent run use the user's.
+    """
+    deps: Deps = request.app.state.deps
+    async with deps.db.unit_of_work():
+        if not deps.shards:
+            yield
+            return
+        user = await _get_current_user(deps.user_repo, int(auth_ctx.user.id))
+        with use_shard(user.uuid):
+            async with deps.shards.unit_of_work():
+                yield
+
+
+chat_router = APIRouter(tags=["Chat"], dependencies=[Depends(_unit_of_work)])
 
 agent_deployment_token = getenv("AGENT_DEPLOYMENT_TOKEN") or "dummy"
 AGENT_MODEL_NAME = "web-agents"
@@ -54,66 +81,174 @@ async def _get_current_user(user_repo: "UserRepository", user_id: int) -> "User"
 class ChatWithUpdateTime(ChatBase):
     created_at: datetime
     update_time: datetime
+    message_count: int = 0
+    last_message_preview: str | None = None
 
 
 class ChatWithUpdateTimeAndMessages(ChatBase):
     created_at: datetime
     update_time: datetime
     messages: list[ExtendedBaseMessage]
+    # Pass as `since` to `GET /chat/{thread_id}/changes` to fetch later updates.
+    version: int = 0
+
+
+class ChatChanges(BaseModel):
+    messages: list[ExtendedBaseMessage]
+    version: int
+
+
+_MESSAGES_ADAPTER = TypeAdapter(list[ExtendedBaseMessage])
+
+MESSAGES_PAGE_SIZE = 50
+MAX_MESSAGES_PAGE_SIZE = 500
+
+
+CHATS_PAGE_SIZE = 50
+MAX_CHATS_PAGE_SIZE = 500
+SEARCH_RESULTS_LIMIT = 20
+# Paged endpoints return the `cursor` of the next page in this header, if any.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _decode_cursor(cursor: str) -> Cursor:
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+async def _get_chat_or_404(request: Request, user_id: int, thread_id: str) -> Chat:
+    current_user = await _get_current_user(request.app.state.deps.user_repo, user_id)
+    chat_repo: ChatRepository = request.app.state.deps.chat_repo
+
+    chat = await chat_repo.get_chat_by_thread_id(current_user.uuid, thread_id)
+    if not chat:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="chat not found"
+        )
+    if chat.archived_at:
+        await _rehydrate(request.app.state.deps.chat_archiver, chat)
+    return chat
+
+
+async def _rehydrate(chat_archiver: ChatArchiver, chat: Chat) -> None:
+    try:
+        await chat_archiver.rehydrate(chat)
+    except ChatArchiveError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="chat archive is unavailable",
+        )
+
+
+async def _get_messages_page(
+    message_repo: MessageRepository,
+    response: Response,
+    chat: Chat,
+    limit: int,
+    cursor: str | None,
+) -> list[Message]:
+    """Return a page of messages, with the cursor of the page before it, if any."""
+    before = _decode_cursor(cursor) if cursor else None
+
+    # Fetch one extra message to know whether there is an older page.
+    messages = list(
+        await message_repo.get_chat_messages_page(chat.uuid, limit + 1, before)
+    )
+    if len(messages) <= limit:
+        return messages
+    messages = messages[1:]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+        (messages[0].created_at, messages[0].uuid)
+    )
+    return messages
 
 
 @chat_router.get("/chat")
 async def get_list_of_chats(
-    request: Request, auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx)
+    request: Request,
+    response: Response,
+    limit: int = Query(default=CHATS_PAGE_SIZE, ge=1, le=MAX_CHATS_PAGE_SIZE),
+    cursor: str | None = None,
+    auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
 ) -> list[ChatWithUpdateTime]:
-    """Return list of all chats"""
+    """
+    Return a page of chats, most recently active first.
+
+    If there are more, the `X-Next-Cursor` header holds the `cursor` to request the
+    next page with.
+    """
     current_user = await _get_current_user(
         request.app.state.deps.user_repo, int(auth_ctx.user.id)
     )
 
     chat_repo: ChatRepository = request.app.state.deps.chat_repo
-    message_repo: MessageRepository = request.app.state.deps.message_repo
 
-    chats = await chat_repo.get_all_chats(current_user)
-    chat_ids = [chat.uuid for chat in chats]
-    last_messages = await message_repo.get_last_messages(chat_ids)
-
-    chats_with_update_time = []
-    for chat in chats:
-        last_message = last_messages.get(chat.uuid)
-        chats_with_update_time.append(
-            ChatWithUpdateTime(
-                update_time=last_message.created_at
-                if last_message
-                else chat.created_at,
-                **chat.model_dump(),
-            )
+    before = _decode_cursor(cursor) if cursor else None
+    # Fetch one extra chat to know whether there is a next page.
+    chats = list(
+        await chat_repo.get_all_chats(current_user, limit=limit + 1, before=before)
+    )
+    if len(chats) > limit:
+        chats = chats[:limit]
+        last = chats[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            (last.last_message_at or last.created_at, last.uuid)
         )
 
-    return chats_with_update_time
+    return [
+        ChatWithUpdateTime(
+            update_time=chat.last_message_at or chat.created_at, **chat.model_dump()
+        )
+        for chat in chats
+    ]
 
 
-@chat_router.get("/chat/{thread_id}")
-async def get_chat(
+@chat_router.get("/chat/search")
+async def search_chats(
     request: Request,
-    thread_id: str,
+    q: str = Query(min_length=MIN_QUERY_LENGTH),
+    limit: int = Query(default=SEARCH_RESULTS_LIMIT, ge=1, le=MAX_CHATS_PAGE_SIZE),
     auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
-) -> ChatWithUpdateTimeAndMessages:
-    """Return a chat and its messages."""
+) -> list[MessageSearchHit]:
+    """Search the messages of all chats, best matches first, with highlighted snippets."""
     current_user = await _get_current_user(
         request.app.state.deps.user_repo, int(auth_ctx.user.id)
     )
-
-    chat_repo: ChatRepository = request.app.state.deps.chat_repo
     message_repo: MessageRepository = request.app.state.deps.message_repo
 
-    chat = await chat_repo.get_chat_by_thread_id(current_user.uuid, thread_id)
-    if not chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="chat not found"
-        )
+    return await message_repo.search_messages(current_user.uuid, q, limit)
+
 
-    messages = list(await message_repo.get_chat_messages(chat.uuid))
+@chat_router.get("/chat/{thread_id}", response_model=ChatWithUpdateTimeAndMessages)
+async def get_chat(
+    request: Request,
+    response: Response,
+    thread_id: str,
+    limit: int | None = Query(default=None, ge=1, le=MAX_MESSAGES_PAGE_SIZE),
+    auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
+) -> Response:
+    """
+    Return a chat and its messages.
+
+    With `limit`, only the most recent page of messages is returned and, if there are
+    older ones, the `X-Next-Cursor` header holds the `cursor` to load them from
+    `GET /chat/{thread_id}/messages`.
+
+    The response is serialized directly rather than through the response model, which
+    would dump and re-validate every message of long chats.
+    """
+    chat = await _get_chat_or_404(request, int(auth_ctx.user.id), thread_id)
+    message_repo: MessageRepository = request.app.state.deps.message_repo
+
+    if limit:
+        messages = await _get_messages_page(message_repo, response, chat, limit, None)
+        # Read along with the chat, so changes made since are fetched again.
+        version = chat.message_version
+    else:
+        messages = list(await message_repo.get_chat_messages(chat.uuid))
+        version = max(map(message_version, messages), default=0)
     if messages:
         update_time = max(m.created_at for m in messages)
     else:
@@ -121,8 +256,96 @@ async def get_chat(
 
     extended_messages = list(translate_messages(messages))
 
-    return ChatWithUpdateTimeAndMessages(
-        update_time=update_time, messages=extended_messages, **chat.model_dump()
+    return Response(
+        headers=response.headers,
+        content=ChatWithUpdateTimeAndMessages(
+            update_time=update_time,
+            messages=extended_messages,
+            version=version,
+            **chat.model_dump(),
+        ).model_dump_json(by_alias=True),
+        media_type="application/json",
+    )
+
+
+@chat_router.get("/chat/{thread_id}/messages", response_model=list[ExtendedBaseMessage])
+async def get_chat_messages(
+    request: Request,
+    response: Response,
+    thread_id: str,
+    limit: int = Query(default=MESSAGES_PAGE_SIZE, ge=1, le=MAX_MESSAGES_PAGE_SIZE),
+    cursor: str | None = None,
+    auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
+) -> Response:
+    """
+    Return a page of chat messages, newest page first, in chronological order.
+
+    If there are older ones, the `X-Next-Cursor` header holds the `cursor` to load
+    the preceding page with.
+    """
+    chat = await _get_chat_or_404(request, int(auth_ctx.user.id), thread_id)
+    messages = await _get_messages_page(
+        request.app.state.deps.message_repo, response, chat, limit, cursor
+    )
+
+    return Response(
+        headers=response.headers,
+        content=_MESSAGES_ADAPTER.dump_json(
+            list(translate_messages(messages)), by_alias=True
+        ),
+        media_type="application/json",
+    )
+
+
+class MessageContent(BaseModel):
+    id: str
+    content: str
+
+
+@chat_router.get("/chat/{thread_id}/messages/{message_id}/content")
+async def get_message_content(
+    request: Request,
+    thread_id: str,
+    message_id: str,
+    auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
+) -> MessageContent:
+    """
+    Return the full content of a message or tool result. History only includes a
+    preview of large contents, along with their full `contentLength`.
+    """
+    chat = await _get_chat_or_404(request, int(auth_ctx.user.id), thread_id)
+    message_repo: MessageRepository = request.app.state.deps.message_repo
+
+    content = await message_repo.get_full_content(chat.uuid, message_id)
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="message not found"
+        )
+    return MessageContent(id=message_id, content=content)
+
+
+@chat_router.get("/chat/{thread_id}/changes", response_model=ChatChanges)
+async def get_chat_changes(
+    request: Request,
+    thread_id: str,
+    since: int = Query(ge=0),
+    auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
+) -> Response:
+    """
+    Return the messages that changed after version `since`, with their tool calls
+    and reasonings, and the version to pass as `since` next time.
+    """
+    chat = await _get_chat_or_404(request, int(auth_ctx.user.id), thread_id)
+    message_repo: MessageRepository = request.app.state.deps.message_repo
+
+    messages = await message_repo.get_chat_changes(chat.uuid, since)
+
+    return Response(
+        content=ChatChanges(
+            messages=list(translate_messages(messages)),
+            version=max(map(message_version, messages), default=since),
+        ).model_dump_json(by_alias=True),
+        media_type="application/json",
     )
 
 
@@ -155,6 +378,33 @@ async def update_chat(
     return chat
 
 
+class DeleteChatsRequest(BaseModel):
+    thread_ids: list[str] = Field(min_length=1, max_length=MAX_CHATS_PAGE_SIZE)
+
+
+@chat_router.delete("/chat")
+async def delete_chats(
+    request: Request,
+    delete_request: DeleteChatsRequest,
+    auth_ctx: AuthCtx[Metadata] = Depends(must_get_auth_ctx),
+) -> list[Chat]:
+    """
+    Deletes many chats at once and returns them. Unknown thread ids are ignored.
+    """
+    current_user = await _get_current_user(
+        request.app.state.deps.user_repo, int(auth_ctx.user.id)
+    )
+    deps: Deps = request.app.state.deps
+
+    chats = await deps.chat_repo.delete_chats(
+        current_user.uuid, delete_request.thread_ids
+    )
+    if chats:
+        (deps.shards or deps.db).after_commit(deps.chat_purger.wake)
+
+    return list(chats)
+
+
 @chat_router.delete("/chat/{thread_id}")
 async def delete_chat(
     request: Request,
@@ -175,6 +425,9 @@ async def delete_chat(
         )
 
     await chat_repo.delete_chat(chat.uuid)
+    # Messages are removed in the background, once the deletion is committed.
+    deps: Deps = request.app.state.deps
+    (deps.shards or deps.db).after_commit(deps.chat_purger.wake)
 
     return chat
 
@@ -200,6 +453,13 @@ async def create_chat_messages(
     encoder = EventEncoder(accept=request.headers.get("accept") or "")
     agent_headers = get_agent_headers(request, auth_ctx, deps.config.session_secret_key)
 
+    # The agent continues an archived thread from its full history.
+    chat = await deps.chat_repo.get_chat_by_thread_id(
+        current_user.uuid, run_input.thread_id
+    )
+    if chat and chat.archived_at:
+        await _rehydrate(deps.chat_archiver, chat)
+
     stream = deps.stream_manager.run(run_input, current_user.uuid, agent_headers)
 
     async def run_agent_in_background() -> AsyncIterator[str]:
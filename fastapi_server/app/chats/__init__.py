@@ -17,10 +17,24 @@ import uuid as uuidpkg
 from datetime import datetime, timezone
 from typing import Any, Sequence, cast
 
-from sqlalchemy import Column, DateTime, ForeignKey, UniqueConstraint
-from sqlmodel import Field, Index, SQLModel, select
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    UniqueConstraint,
+    bindparam,
+    desc,
+    func,
+    tuple_,
+    update,
+)
+from sqlalchemy.sql.dml import Update
+from sqlmodel import Field, Index, SQLModel, col, select
 
-from app.db import DBCtx
+from app.db import DBCtx, DBShards
+from app.pagination import Cursor
 from app.users.user import User
 
 logger = logging.getLogger(__name__)
@@ -55,10 +69,62 @@ class Chat(ChatBase, table=True):
         sa_column=Column(DateTime(timezone=True), nullable=False),
     )
 
+    # Summary of the chat's messages, maintained by MessageRepository so listing
+    # chats does not have to query messages.
+    last_message_at: datetime | None = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    message_count: int = Field(
+        default=0, sa_column=Column(Integer, nullable=False, server_default="0")
+    )
+    last_message_preview: str | None = Field(default=None)
+    # Last version given to a message, tool call or reasoning of the chat.
+    message_version: int = Field(
+        default=0, sa_column=Column(BigInteger, nullable=False, server_default="0")
+    )
+
+    # Set when the chat is deleted. Deleted chats are hidden from every query, and
+    # removed along with their messages by the ChatPurger.
+    deleted_at: datetime | None = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True, index=True),
+    )
+
+    # Set while the messages of the chat are archived, see app.messages.archive.
+    archived_at: datetime | None = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+
     def dump_json_compatible(self) -> dict[str, Any]:
         return cast(dict[str, Any], json.loads(self.model_dump_json()))
 
 
+# When the chat was last active, used to sort and paginate the chat list.
+last_activity_at = func.coalesce(col(Chat.last_message_at), col(Chat.created_at))
+
+Index(
+    "ix_chat_user_last_activity",
+    Chat.__table__.c.user,  # type: ignore[attr-defined]
+    last_activity_at,
+    Chat.__table__.c.uuid,  # type: ignore[attr-defined]
+)
+
+
+# Condition for chats that have not been deleted.
+not_deleted = col(Chat.deleted_at).is_(None)
+
+# Built once, as it runs for most requests and agent runs.
+_CHAT_BY_THREAD_ID = (
+    select(Chat)
+    .where(
+        Chat.user_uuid == bindparam("user_uuid"),
+        Chat.thread_id == bindparam("thread_id"),
+        not_deleted,
+    )
+    .limit(1)
+)
+
+
 class ChatCreate(ChatBase):
     """
     Schema for creating a new chat.
@@ -70,7 +136,7 @@ class ChatRepository:
     Chat repository class to handle chat-related database operations.
     """
 
-    def __init__(self, db: DBCtx):
+    def __init__(self, db: DBCtx | DBShards):
         self._db = db
 
     async def create_chat(self, chat_data: ChatCreate) -> Chat:
@@ -84,32 +150,53 @@ class ChatRepository:
 
     async def get_chat(self, uuid: uuidpkg.UUID) -> Chat:
         async with self._db.session() as sess:
-            response = await sess.exec(select(Chat).where(Chat.uuid == uuid).limit(1))
+            response = await sess.exec(
+                select(Chat).where(Chat.uuid == uuid, not_deleted).limit(1)
+            )
             return response.one()
 
     async def get_chat_by_thread_id(
         self, user_uuid: uuidpkg.UUID, thread_id: str
     ) -> Chat | None:
         async with self._db.session() as sess:
-            query = (
-                select(Chat)
-                .where(Chat.user_uuid == user_uuid, Chat.thread_id == thread_id)
-                .limit(1)
+            response = await sess.exec(
+                _CHAT_BY_THREAD_ID,
+                params={"user_uuid": user_uuid, "thread_id": thread_id},
             )
-            response = await sess.exec(query)
             return response.one_or_none()
 
-    async def get_all_chats(self, user: User | None) -> Sequence[Chat]:
-        query = select(Chat)
+    async def get_all_chats(
+        self,
+        user: User | None,
+        limit: int | None = None,
+        before: Cursor | None = None,
+    ) -> Sequence[Chat]:
+        """
+        Retrieve chats, most recently active first.
+
+        Args:
+            user (User | None): Only return the chats of this user.
+            limit (int | None): Maximum number of chats to return.
+            before (Cursor | None): Only return chats after this (last activity, uuid)
+                position in the list.
+        """
+        query = select(Chat).where(not_deleted)
         if user:
             query = query.where(Chat.user_uuid == user.uuid)
+        if before:
+            query = query.where(tuple_(last_activity_at, col(Chat.uuid)) < before)
+        query = query.order_by(desc(last_activity_at), desc(col(Chat.uuid)))
+        if limit is not None:
+            query = query.limit(limit)
         async with self._db.session() as sess:
             response = await sess.exec(query)
             return response.all()
 
     async def update_chat_name(self, uuid: uuidpkg.UUID, name: str) -> Chat | None:
         async with self._db.session(writable=True) as sess:
-            response = await sess.exec(select(Chat).where(Chat.uuid == uuid).limit(1))
+            response = await sess.exec(
+                select(Chat).where(Chat.uuid == uuid, not_deleted).limit(1)
+            )
             chat = response.one_or_none()
             if not chat:
                 return None
@@ -122,15 +209,54 @@ class ChatRepository:
 
     async def delete_chat(self, uuid: uuidpkg.UUID) -> Chat | None:
         """
-        Delete a chat by UUID.
-        The associated messages will be automatically deleted via CASCADE foreign key constraint.
+        Soft-delete a chat by UUID. It is hidden right away, and its messages are
+        removed later by the ChatPurger.
         """
         async with self._db.session(writable=True) as sess:
-            response = await sess.exec(select(Chat).where(Chat.uuid == uuid).limit(1))
+            response = await sess.exec(
+                select(Chat).where(Chat.uuid == uuid, not_deleted).limit(1)
+            )
             chat = response.first()
             if not chat:
                 return None
 
-            await sess.delete(chat)
+            await sess.exec(_soft_delete([chat.uuid]))
             await sess.commit()
             return chat
+
+    async def delete_chats(
+        self, user_uuid: uuidpkg.UUID, thread_ids: Sequence[str]
+    ) -> Sequence[Chat]:
+        """
+        Soft-delete the chats of the user with the given thread ids, in a single
+        transaction. Unknown thread ids are ignored.
+        """
+        async with self._db.session(writable=True) as sess:
+            response = await sess.exec(
+                select(Chat).where(
+                    Chat.user_uuid == user_uuid,
+                    col(Chat.thread_id).in_(thread_ids),
+                    not_deleted,
+                )
+            )
+            chats = response.all()
+            if not chats:
+                return chats
+
+            await sess.exec(_soft_delete([chat.uuid for chat in chats]))
+            await sess.commit()
+            return chats
+
+
+def _soft_delete(uuids: Sequence[uuidpkg.UUID]) -> Update:
+    """
+    Mark chats deleted. Their thread id is released, so the thread can be started
+    again while the old chat waits to be purged.
+    """
+    return (
+        update(Chat)
+        .where(col(Chat.uuid).in_(uuids))
+        .values(deleted_at=datetime.now(timezone.utc), thread_id=None)
+        # Return the chats as they were before deletion.
+        .execution_options(synchronize_session=False)
+    )
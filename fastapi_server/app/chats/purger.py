@@ -0,0 +1,62 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+
+from app.db import DBShards, each_shard
+from app.jobs import PeriodicJob
+from app.messages import MessageRepository
+from app.messages.archive import ChatArchiver
+
+
+class ChatPurger(PeriodicJob):
+    """
+    Background task removing soft-deleted chats and their messages.
+
+    Each batch is its own short write transaction, so requests and agent runs can
+    write in between. Deletions wake the purger up. With `shards`, every shard is
+    purged.
+    """
+
+    name = "chat_purger"
+
+    def __init__(
+        self,
+        message_repo: MessageRepository,
+        batch_size: int,
+        interval: float,
+        archiver: ChatArchiver | None = None,
+        shards: DBShards | None = None,
+    ):
+        super().__init__(interval)
+        self._message_repo = message_repo
+        self._batch_size = batch_size
+        self._archiver = archiver
+        self._shards = shards
+
+    async def run_once(self) -> int:
+        removed = 0
+        async for _ in each_shard(self._shards):
+            removed += await self.purge()
+        return removed
+
+    async def purge(self) -> int:
+        """Purge all deleted chats, batch by batch. Returns the number of rows removed."""
+        if self._archiver:
+            await self._archiver.remove_deleted_archives()
+        removed = 0
+        while batch := await self._message_repo.purge_deleted_chats(self._batch_size):
+            removed += batch
+            # Let waiting requests run between batches.
+            await asyncio.sleep(0)
+        return removed
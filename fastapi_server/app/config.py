@@ -55,6 +55,77 @@ class Config(DataRobotAppFrameworkBaseSettings):
     test_user_email: str | None = None
 
     database_uri: str = "sqlite+aiosqlite:///.data/database.sqlite"
+    # With DataRobot persistent storage, reads use the local copy of the database
+    # without checking for a newer snapshot for up to this many seconds. Writes
+    # always check first.
+    database_snapshot_staleness: float = 5
+    # Committed writes are uploaded to DataRobot persistent storage at most once per
+    # this many seconds, which is how much may be lost if the app is killed. Pending
+    # writes are uploaded at shutdown. 0 uploads after every write.
+    database_snapshot_upload_interval: float = 10
+    # Ship only the changed pages of the database to DataRobot persistent storage,
+    # with a full snapshot from time to time, instead of the whole file. The replica
+    # is restored at startup. Requires a single app instance, with a single worker
+    # process, writing the database.
+    database_replication: bool = False
+    # Commit the message writes of concurrent streams together, from a single
+    # writer task, instead of one transaction each.
+    database_group_commit: bool = False
+    # Tune SQLite database files, see SQLITE_PRAGMAS in app.db, and serve reads
+    # from a pool of read-only connections and writes from a single one. Trades the
+    # durability of the latest commits on a power loss for write throughput.
+    database_sqlite_profile: bool = False
+    # Read replicas of `database_uri`, such as Postgres streaming replicas. Read
+    # sessions go to the healthy ones in turn, except after a write in the same
+    # request, checked every `database_replica_health_interval` seconds.
+    database_replica_uris: Sequence[str] = ()
+    database_replica_health_interval: float = 10
+    # Number of compiled SQL statements cached per engine, which the statements of
+    # the app fit in. 0 disables the cache, see `python -m benchmarks.orm_overhead`.
+    database_compiled_cache_size: int = 500
+    # Keep the chats and messages of each user in a SQLite database of their own in
+    # this directory, synced with DataRobot persistent storage on its own. Users and
+    # their identities stay in the main database, to find the user of a login.
+    # Background jobs visit every shard, opening the closed ones one at a time.
+    # Empty keeps a single database.
+    database_shard_directory: str = ""
+    # Shards open at once, beyond which the least recently used ones are closed.
+    database_max_open_shards: int = 64
+    # Migrate the database to the latest revision at startup, once per container and
+    # one app instance at a time, instead of with `alembic_migration.py` before the
+    # server starts. The migrations run on the database restored from persistent
+    # storage and are synced back like any write, see `migrations/env.py`. A failed
+    # migration keeps the app from getting ready, but not alive.
+    database_migrate_on_startup: bool = False
+    # Seconds to wait for another instance to migrate, after which its lock is
+    # assumed to be left behind by a crash and taken over.
+    database_migration_lock_timeout: float = 15 * 60
 
     # The number of characters to stream before persisting
     minimal_chunks_to_persist: int = 5000
+
+    # The number of tool call argument characters to buffer before streaming them on.
+    # 0 sends the arguments of each tool call as a single event when the call ends.
+    tool_call_args_flush_size: int = 0
+
+    # Finished message and tool result contents longer than this many characters are
+    # stored compressed outside of the history, which only keeps a preview of them.
+    message_body_offload_threshold: int = 16 * 1024
+    message_body_preview_length: int = 2000
+
+    # Deleted chats are hidden right away and purged in the background, this many
+    # messages per transaction, at least every `chat_purge_interval` seconds.
+    chat_purge_batch_size: int = 500
+    chat_purge_interval: float = 300
+
+    # Chats idle for this many days are moved to Parquet files under
+    # `chat_archive_path` and restored when opened. 0 disables archiving. Requires
+    # persistent storage, or the archives would be lost with the container.
+    chat_archive_after_days: int = 0
+    chat_archive_path: str = ".data/archive"
+    chat_archive_interval: float = 24 * 60 * 60
+
+    # Only send the messages added since the last agent reply, along with the
+    # `thread_id` the agent checkpoints its thread state by. Requires an agent that
+    # supports checkpointing, otherwise it loses the earlier turns.
+    agent_send_message_delta: bool = False
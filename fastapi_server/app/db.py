@@ -12,23 +12,245 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import json
 import logging
+import os
+import sqlite3
+import time
 from asyncio import Lock
-from contextlib import asynccontextmanager, nullcontext
-from typing import AsyncGenerator, cast
+from collections import OrderedDict
+from contextlib import (
+    AsyncExitStack,
+    asynccontextmanager,
+    contextmanager,
+    nullcontext,
+    suppress,
+)
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Generator,
+    Sequence,
+    TypeVar,
+    cast,
+)
+from uuid import UUID
 
 from core.persistent_fs.dr_file_system import (
     DRFileSystem,
     all_env_variables_present,
     calculate_checksum,
 )
-from sqlalchemy import event, text
-from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import UOWTransaction
+from core.persistent_fs.sqlite_replication import SQLiteReplicator
+from core.utils.rw_lock import FileReadWriteLock
+from sqlalchemy import Connection, event, make_url, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSessionTransaction,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, UOWTransaction
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.jobs import PeriodicJob
+
 logger = logging.getLogger()
 
+T = TypeVar("T")
+
+# Most write operations committed in one transaction with group commit.
+GROUP_COMMIT_MAX_BATCH_SIZE = 100
+
+# SQLite performance profile, applied to every connection. Measured with
+# `python -m benchmarks.sqlite_profile`, 50 clients running 20 operations each,
+# 20% of them message updates:
+#                                    read ms  write ms  ops/s
+#   default settings, shared pool      266.9    2096.3     67
+#   profile, readers + one writer       94.9     274.4    363
+SQLITE_PRAGMAS = {
+    # Wait up to 5 s for a locked database before failing.
+    "busy_timeout": "5000",
+    # 64 MiB page cache and 256 MiB of memory-mapped reads per connection.
+    "cache_size": "-65536",
+    "mmap_size": str(256 * 1024 * 1024),
+    "temp_store": "MEMORY",
+    # Without WAL, NORMAL could corrupt the database on a power loss.
+    "synchronous": "FULL",
+}
+# Readers no longer wait for the writer, nor the writer for readers. Not used when
+# the whole database file is shipped to persistent storage, since the file alone
+# would miss the commits still in the WAL.
+SQLITE_WAL_PRAGMAS = {
+    "journal_mode": "WAL",
+    # With WAL, only checkpoints fsync. A power loss may lose the latest commits
+    # but cannot corrupt the database.
+    "synchronous": "NORMAL",
+}
+# The replicator ships the WAL before checkpointing it, so it alone checkpoints.
+SQLITE_REPLICATION_PRAGMAS = {"wal_autocheckpoint": "0"}
+# Connections of the reader pool.
+SQLITE_READ_POOL_SIZE = 8
+
+# Whether the current request or run has written, see `DBCtx._route_read`.
+_wrote: ContextVar[bool] = ContextVar("wrote", default=False)
+
+
+@dataclass
+class QueryStats:
+    """The SQL statements executed for a request or an agent run, and their time."""
+
+    statements: int = 0
+    duration: float = 0.0
+
+    def server_timing(self) -> str:
+        """The statistics as a `Server-Timing` header value."""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.statements} queries"'
+
+    def log_fields(self) -> dict[str, Any]:
+        return {
+            "db_statements": self.statements,
+            "db_time_ms": round(self.duration * 1000, 1),
+        }
+
+
+# Statistics of the current request or run, see `track_queries`.
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Generator[QueryStats, None, None]:
+    """
+    Collect the statements executed in the current context and the tasks it starts.
+    Writes committed by the group commit writer are not included.
+    """
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+# The user whose database shard the current task uses, see `DBShards`.
+_shard_user: ContextVar[UUID | None] = ContextVar("shard_user", default=None)
+
+
+@contextmanager
+def use_shard(user_uuid: UUID) -> Generator[None, None, None]:
+    """Use the database shard of the user in the block and the tasks it starts."""
+    token = _shard_user.set(user_uuid)
+    try:
+        yield
+    finally:
+        _shard_user.reset(token)
+
+
+async def each_shard(db: "DBCtx | DBShards | None") -> AsyncGenerator[None, None]:
+    """
+    Loop over every shard of `db`, each the current one in its iteration, or once
+    when it is not sharded. For background jobs: the shards that were closed are
+    opened one at a time and closed again after their iteration.
+    """
+    if not isinstance(db, DBShards):
+        yield
+        return
+    for user_uuid in await asyncio.to_thread(db.users):
+        was_open = user_uuid in db.open_users()
+        with use_shard(user_uuid):
+            yield
+        if not was_open:
+            await db.close(user_uuid)
+
+
+def _instrument(engine: AsyncEngine) -> None:
+    """Add the statements of the engine to the statistics of the current context."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_execute(conn: Any, *args: Any) -> None:
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_execute(conn: Any, *args: Any) -> None:
+        if stats := _query_stats.get():
+            stats.statements += 1
+            stats.duration += time.perf_counter() - conn.info["query_start"]
+
+
+# A write operation submitted to group commit, and the future of its result.
+_PendingWrite = tuple[
+    Callable[[AsyncSession], Awaitable[object]], asyncio.Future[object]
+]
+
+
+class _UnitOfWorkSession(AsyncSession):
+    """
+    The write session of a unit of work. Each repository call runs in a savepoint:
+    its commit only flushes and its rollback only undoes its own changes. The unit
+    of work commits once at the end.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._savepoints: list[AsyncSessionTransaction] = []
+
+    @asynccontextmanager
+    async def savepoint(self) -> AsyncGenerator[None, None]:
+        self._savepoints.append(await self.begin_nested())
+        try:
+            yield
+            if self._savepoints[-1].is_active:
+                await self._savepoints[-1].commit()
+        except BaseException:
+            if self._savepoints[-1].is_active:
+                await self._savepoints[-1].rollback()
+            raise
+        finally:
+            self._savepoints.pop()
+
+    async def commit(self) -> None:
+        if self._savepoints:
+            await self.flush()
+        else:
+            await super().commit()
+
+    async def rollback(self) -> None:
+        if self._savepoints:
+            await self._savepoints[-1].rollback()
+            self._savepoints[-1] = await self.begin_nested()
+        else:
+            await super().rollback()
+
+
+@dataclass
+class _UnitOfWork:
+    db: "DBCtx"
+    task: "asyncio.Task[Any] | None"
+    stack: AsyncExitStack = field(default_factory=AsyncExitStack)
+    read_session: AsyncSession | None = None
+    write_session: _UnitOfWorkSession | None = None
+    after_commit: list[Callable[[], None]] = field(default_factory=list)
+
+
+# The unit of work of the current task, see `DBCtx.unit_of_work`.
+_unit_of_work: ContextVar[_UnitOfWork | None] = ContextVar("unit_of_work", default=None)
+
+
+def _set_pragmas(engine: AsyncEngine, pragmas: dict[str, str]) -> None:
+    """Set the pragmas on every new connection of the engine."""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
 
 def _prepare_persistence_storage(
     engine: AsyncEngine,
@@ -47,8 +269,20 @@ def _prepare_persistence_storage(
 
 
 class DBCtx:
-    def __init__(self, engine: AsyncEngine):
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        snapshot_staleness: float = 0.0,
+        snapshot_upload_interval: float = 0.0,
+        replication: bool = False,
+        group_commit: bool = False,
+        read_engine: AsyncEngine | None = None,
+        replica_engines: Sequence[AsyncEngine] = (),
+        replica_health_interval: float = 10.0,
+    ):
+        # With a separate read engine, `engine` only serves writable sessions.
         self.engine = engine
+        self.read_engine = read_engine or engine
 
         self._session = async_sessionmaker(
             autoflush=False,
@@ -56,14 +290,199 @@ class DBCtx:
             bind=engine,
             expire_on_commit=False,
         )
+        self._unit_session_maker = async_sessionmaker(
+            autoflush=False,
+            class_=_UnitOfWorkSession,
+            bind=engine,
+            expire_on_commit=False,
+        )
+        self._read_session_maker = async_sessionmaker(
+            autoflush=False,
+            class_=AsyncSession,
+            bind=self.read_engine,
+            expire_on_commit=False,
+        )
+
+        # Read sessions go to the healthy replicas in turn, unless the current
+        # request or run wrote, to read its own writes from the primary.
+        self._replicas = [_Replica(replica) for replica in replica_engines]
+        self._next_replica = 0
+        self._replica_checker: ReplicaHealthChecker | None = None
+        if self._replicas:
+            self._replica_checker = ReplicaHealthChecker(
+                self._replicas, replica_health_interval
+            )
+        for instrumented in {engine, self.read_engine, *replica_engines}:
+            _instrument(instrumented)
 
         self._persistence_fs: DRFileSystem | None
         self._db_path: str | None
         self._persistence_fs, self._db_path = _prepare_persistence_storage(engine)
 
+        # The worker processes of the app share the database file. Writes, snapshot
+        # downloads and uploads hold the lock of this process, then the lock file of
+        # all of them, and the snapshot state is shared in `<database path>.sync`.
         self._lock: Lock | nullcontext = nullcontext()  # type: ignore[type-arg]
+        self._file_lock: FileReadWriteLock | None = None
         if self._persistence_fs:
             self._lock = Lock()
+            self._file_lock = FileReadWriteLock(f"{self._db_path}.lock")
+
+        # Remote modification time of the database snapshot the local file matches,
+        # and when it was last checked, so unchanged snapshots are not downloaded
+        # again and reads check at most once per `snapshot_staleness` seconds.
+        self._snapshot_staleness = snapshot_staleness
+        self._snapshot_version: float | None = None
+        self._snapshot_checked_at = float("-inf")
+
+        # Committed writes not uploaded yet. Unless `snapshot_upload_interval` is 0,
+        # they are uploaded in the background at most once per interval.
+        self._snapshot_upload_interval = snapshot_upload_interval
+        self._snapshot_dirty = False
+        self._snapshot_checksum: bytes | None = None
+        self._snapshot_uploader: SnapshotUploader | None = None
+
+        # With replication, the local database is the primary one and only the
+        # pages changed since the last upload are shipped. The replica is only read
+        # at startup.
+        self._replicator: SQLiteReplicator | None = None
+        if self._persistence_fs and replication:
+            self._replicator = SQLiteReplicator(
+                self._persistence_fs, cast(str, self._db_path)
+            )
+        self._replication_lock = Lock()
+
+        self._group_writer: GroupCommitWriter | None = None
+        if group_commit:
+            self._group_writer = GroupCommitWriter(self, GROUP_COMMIT_MAX_BATCH_SIZE)
+
+    def _remote_snapshot_version(self) -> float | None:
+        fs = cast(DRFileSystem, self._persistence_fs)
+        try:
+            return fs.modified(cast(str, self._db_path))
+        except FileNotFoundError:
+            return None
+
+    def _load_sync_state(self) -> None:
+        """Pick up the snapshot state, as last saved by any worker process."""
+        try:
+            with open(f"{self._db_path}.sync") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        self._snapshot_version = state["version"]
+        checksum = state["checksum"]
+        self._snapshot_checksum = bytes.fromhex(checksum) if checksum else None
+        self._snapshot_dirty = state["dirty"]
+
+    def _save_sync_state(self) -> None:
+        path = f"{self._db_path}.sync"
+        checksum = self._snapshot_checksum
+        with open(f"{path}.{os.getpid()}", "w") as f:
+            json.dump(
+                {
+                    "version": self._snapshot_version,
+                    "checksum": checksum.hex() if checksum else None,
+                    "dirty": self._snapshot_dirty,
+                },
+                f,
+            )
+        # Replaced at once, so a crash never leaves it half written.
+        os.replace(f"{path}.{os.getpid()}", path)
+
+    def _snapshot_check_due(self) -> bool:
+        return (
+            not self._snapshot_dirty
+            and not self._replicator
+            and time.monotonic() - self._snapshot_checked_at >= self._snapshot_staleness
+        )
+
+    @asynccontextmanager
+    async def _exclusive(self) -> AsyncGenerator[None, None]:
+        """Exclude the writes and snapshot syncs of every worker process."""
+        async with self._lock:
+            if not self._file_lock:
+                yield
+                return
+            async with self._file_lock.async_write_lock():
+                yield
+
+    def _download_snapshot(self) -> None:
+        db_path = cast(str, self._db_path)
+        download_path = f"{db_path}.download"
+        cast(DRFileSystem, self._persistence_fs).get(db_path, download_path)
+        # Copied in with SQLite's locking, so the reads of every process see either
+        # the previous database or the downloaded one.
+        source, target = sqlite3.connect(download_path), sqlite3.connect(db_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+            os.remove(download_path)
+
+    def _sync_snapshot(self, force: bool = False) -> None:
+        """
+        Download the remote database snapshot if it changed since it was applied
+        locally. Unless forced, skipped within the staleness window of the last check.
+        Call this with the lock file held.
+        """
+        now = time.monotonic()
+        if self._replicator:
+            return
+        if not force and now - self._snapshot_checked_at < self._snapshot_staleness:
+            return
+        self._load_sync_state()
+        if not self._snapshot_dirty:
+            version = self._remote_snapshot_version()
+            if version is not None and version != self._snapshot_version:
+                self._download_snapshot()
+                self._snapshot_version = version
+                self._snapshot_checksum = calculate_checksum(cast(str, self._db_path))
+                self._save_sync_state()
+        # Otherwise the local copy is ahead of the remote one until it is uploaded.
+        self._snapshot_checked_at = now
+
+    def _upload_snapshot(self) -> bool:
+        """Upload the local database, unless unchanged since the last sync."""
+        self._snapshot_dirty = False
+        checksum = calculate_checksum(cast(str, self._db_path))
+        if checksum == self._snapshot_checksum:
+            return False
+        cast(DRFileSystem, self._persistence_fs).put(self._db_path, self._db_path)
+        self._snapshot_checksum = checksum
+        self._snapshot_version = self._remote_snapshot_version()
+        self._snapshot_checked_at = time.monotonic()
+        return True
+
+    async def flush_snapshot(self) -> bool:
+        """Upload the pending writes now. Returns whether anything was uploaded."""
+        if self._replicator:
+            # Writes are held up while the replicator collects the changes, but
+            # not while it ships them.
+            async with self._replication_lock:
+                if not self._snapshot_dirty:
+                    return False
+                self._snapshot_dirty = False
+                try:
+                    return await asyncio.to_thread(
+                        self._replicator.sync,
+                        cast(FileReadWriteLock, self._file_lock).write_lock,
+                    )
+                except Exception:
+                    self._snapshot_dirty = True
+                    raise
+
+        if not self._snapshot_dirty:
+            return False
+        async with self._exclusive():
+            self._load_sync_state()
+            if not self._snapshot_dirty:
+                # Uploaded by another process.
+                return False
+            uploaded = self._upload_snapshot()
+            self._save_sync_state()
+            return uploaded
 
     @asynccontextmanager
     async def _read_session(self) -> AsyncGenerator[AsyncSession, None]:
@@ -75,53 +494,539 @@ class DBCtx:
                     "This session is read-only and cannot perform writes."
                 )
 
-        if self._persistence_fs and self._persistence_fs.exists(self._db_path):
-            self._persistence_fs.get(self._db_path, self._db_path)
+        if self._file_lock and self._snapshot_check_due():
+            # Reads do not wait for the writes or syncs in progress, and can run
+            # within a write session.
+            with self._file_lock.try_write_lock() as acquired:
+                if acquired:
+                    self._sync_snapshot()
 
-        async with self._session() as session:
+        async with self._read_session_maker(bind=self._route_read()) as session:
             event.listen(session.sync_session, "before_flush", prevent_writes)
             yield session
 
+    def _route_read(self) -> AsyncEngine:
+        """The engine of the next read session."""
+        if not self._replicas or _wrote.get():
+            return self.read_engine
+        for _ in range(len(self._replicas)):
+            replica = self._replicas[self._next_replica]
+            self._next_replica = (self._next_replica + 1) % len(self._replicas)
+            if replica.healthy:
+                return replica.engine
+        return self.read_engine
+
     @asynccontextmanager
-    async def _write_session(self) -> AsyncGenerator[AsyncSession, None]:
-        async with self._lock:
-            checksum: bytes | None = None
-            if self._persistence_fs and self._persistence_fs.exists(self._db_path):
-                self._persistence_fs.get(self._db_path, self._db_path)
-                checksum = calculate_checksum(cast(str, self._db_path))
+    async def _write_session(
+        self, session_maker: async_sessionmaker[Any] | None = None
+    ) -> AsyncGenerator[AsyncSession, None]:
+        committed = False
 
-            async with self._session() as session:
-                yield session
+        def mark_dirty(session_: Session) -> None:
+            nonlocal committed
+            self._snapshot_dirty = committed = True
 
+        async with self._exclusive():
             if self._persistence_fs:
-                new_checksum = calculate_checksum(cast(str, self._db_path))
-                if new_checksum != checksum:
-                    self._persistence_fs.put(self._db_path, self._db_path)
+                # Writes always start from the latest snapshot.
+                self._sync_snapshot(force=True)
+
+            async with (session_maker or self._session)() as session:
+                event.listen(session.sync_session, "after_commit", mark_dirty)
+                yield session
+            if committed:
+                _wrote.set(True)
+                if self._persistence_fs:
+                    self._save_sync_state()
+
+        if self._persistence_fs and self._snapshot_upload_interval <= 0:
+            await self.flush_snapshot()
 
     @asynccontextmanager
     async def session(
         self, writable: bool = False
     ) -> AsyncGenerator[AsyncSession, None]:
+        if unit := self._current_unit():
+            async with self._unit_session(unit, writable) as session:
+                yield session
+            return
         session_context = self._write_session if writable else self._read_session
         async with session_context() as session:
             yield session
 
+    def _current_unit(self) -> _UnitOfWork | None:
+        unit = _unit_of_work.get()
+        # Tasks started within a unit of work inherit the context but not the unit.
+        if unit and unit.db is self and unit.task is asyncio.current_task():
+            return unit
+        return None
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncGenerator[None, None]:
+        """
+        Share the sessions of the repository calls in the block, within the current
+        task. Reads share a read session until the first write, then reads and
+        writes share a write session, committed at the end of the block and rolled
+        back if it raises. Writes are not group committed.
+        """
+        unit = _UnitOfWork(self, asyncio.current_task())
+        token = _unit_of_work.set(unit)
+        try:
+            async with unit.stack:
+                yield
+                if unit.write_session:
+                    await unit.write_session.commit()
+            for callback in unit.after_commit:
+                callback()
+        finally:
+            _unit_of_work.reset(token)
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        Call `callback` once the current unit of work is committed, and not if it
+        rolls back. Outside of a unit of work, it is called now.
+        """
+        if unit := self._current_unit():
+            unit.after_commit.append(callback)
+        else:
+            callback()
+
+    @asynccontextmanager
+    async def _unit_session(
+        self, unit: _UnitOfWork, writable: bool
+    ) -> AsyncGenerator[AsyncSession, None]:
+        if not writable and not unit.write_session:
+            if not unit.read_session:
+                unit.read_session = await unit.stack.enter_async_context(
+                    self._read_session()
+                )
+            yield unit.read_session
+            return
+
+        if not unit.write_session:
+            if unit.read_session:
+                # Reads now go through the write session, to see its writes.
+                await unit.read_session.close()
+            session = await unit.stack.enter_async_context(
+                self._write_session(self._unit_session_maker)
+            )
+            unit.write_session = cast(_UnitOfWorkSession, session)
+            if self.engine.dialect.name == "sqlite":
+                # pysqlite only begins a transaction before DML, so the release of
+                # the first savepoint would commit.
+                await session.execute(text("BEGIN IMMEDIATE"))
+        if not writable:
+            yield unit.write_session
+            return
+        async with unit.write_session.savepoint():
+            yield unit.write_session
+
+    async def write(self, operation: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """
+        Run a write operation, which must not commit, and commit it. With group
+        commit, concurrent operations are committed together by a single writer
+        task, and this returns once their transaction is committed.
+        """
+        if self._group_writer and not self._current_unit():
+            result = await self._group_writer.submit(operation)
+            # Committed by the writer task, in its own context.
+            _wrote.set(True)
+            return result
+        async with self.session(writable=True) as session:
+            result = await operation(session)
+            await session.commit()
+            return result
+
+    async def check_replicas(self) -> int:
+        """
+        Check the health of the read replicas now. Returns the number that changed.
+        """
+        return await self._replica_checker.run_once() if self._replica_checker else 0
+
+    def restore(self) -> None:
+        """
+        Restore the database from its replica and switch it to WAL mode, when
+        replicated. Without a replica yet, such as when replication is turned on for
+        an existing database, its first generation is seeded from the whole-file
+        snapshot. Call this before the first session.
+        """
+        if not self._replicator:
+            return
+        with cast(FileReadWriteLock, self._file_lock).write_lock():
+            if os.path.exists(f"{self._db_path}.sync"):
+                # Restored by another worker process, and written to since maybe.
+                # The replicator carries on from the state it saved.
+                return
+            if (
+                not self._replicator.restore()
+                and self._remote_snapshot_version() is not None
+            ):
+                self._download_snapshot()
+                self._replicator.sync()
+            self._replicator.enable_wal()
+            self._save_sync_state()
+
+    def start(self) -> None:
+        """
+        Start the group commit writer and uploading the database snapshot in the
+        background, when enabled.
+        """
+        if self._group_writer:
+            self._group_writer.start()
+        if self._replica_checker:
+            self._replica_checker.start()
+        if self._persistence_fs and self._snapshot_upload_interval > 0:
+            self._snapshot_uploader = SnapshotUploader(
+                self, self._snapshot_upload_interval
+            )
+            self._snapshot_uploader.start()
+
     async def shutdown(self) -> None:
         """
-        Dispose of the engine and close all pooled connections.
-        Call this on application shutdown.
+        Upload the pending writes, dispose of the engine and close all pooled
+        connections. Call this on application shutdown.
         """
+        if self._group_writer:
+            await self._group_writer.stop()
+        if self._replica_checker:
+            await self._replica_checker.stop()
+        if self._snapshot_uploader:
+            await self._snapshot_uploader.stop()
+        if self._persistence_fs:
+            await self.flush_snapshot()
         await self.engine.dispose()
+        if self.read_engine is not self.engine:
+            await self.read_engine.dispose()
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+
+class SnapshotUploader(PeriodicJob):
+    """Background task uploading the committed writes of a DBCtx."""
+
+    name = "snapshot_uploader"
+
+    def __init__(self, db: DBCtx, interval: float):
+        super().__init__(interval)
+        self._db = db
+
+    async def run_once(self) -> int:
+        return int(await self._db.flush_snapshot())
+
+
+@dataclass
+class _Replica:
+    engine: AsyncEngine
+    healthy: bool = True
+
+
+class ReplicaHealthChecker(PeriodicJob):
+    """Background task taking failing read replicas out of rotation."""
+
+    name = "replica_health_checker"
+
+    # Seconds a replica has to answer a health check.
+    TIMEOUT = 5.0
+
+    def __init__(self, replicas: list[_Replica], interval: float):
+        super().__init__(interval)
+        self._replicas = replicas
+
+    async def run_once(self) -> int:
+        """Check every replica. Returns the number that changed health."""
+        changed = 0
+        for replica in self._replicas:
+            try:
+                async with asyncio.timeout(self.TIMEOUT):
+                    async with replica.engine.connect() as conn:
+                        await conn.execute(text("select 1"))
+                healthy = True
+            except Exception:
+                healthy = False
+            if healthy != replica.healthy:
+                changed += 1
+                logger.warning(
+                    "Read replica health changed",
+                    extra={
+                        "replica": replica.engine.url.render_as_string(),
+                        "healthy": healthy,
+                    },
+                )
+            replica.healthy = healthy
+        return changed
 
 
-async def create_db_ctx(db_url: str, log_sql_stmts: bool = False) -> DBCtx:
-    async_engine = create_async_engine(
-        db_url,
-        echo=log_sql_stmts,
+class GroupCommitWriter:
+    """
+    Single task applying the write operations submitted concurrently, a batch per
+    transaction, so they share one commit instead of queueing for the write lock
+    and committing one by one.
+
+    If a batch fails, its operations are retried one per transaction, so only the
+    failing ones get the error.
+    """
+
+    def __init__(self, db: DBCtx, max_batch_size: int):
+        self._db = db
+        self._max_batch_size = max_batch_size
+        self._queue: asyncio.Queue[_PendingWrite] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+
+    async def submit(self, operation: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        future: asyncio.Future[object] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return cast(T, await future)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Apply the operations already submitted, then stop."""
+        if self._task:
+            await self._queue.join()
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._apply(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _apply(self, batch: list[_PendingWrite]) -> None:
+        try:
+            async with self._db.session(writable=True) as session:
+                results = []
+                for operation, _ in batch:
+                    results.append(await operation(session))
+                    # Later operations of the batch see the changes.
+                    await session.flush()
+                await session.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                for item in batch:
+                    await self._apply([item])
+            elif not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class DBShards:
+    """
+    SQLite databases of their own per user, each a DBCtx synced with persistent
+    storage independently, so snapshots and their syncs grow with the activity of
+    one user. Sessions, writes and units of work go to the shard of the current user,
+    see `use_shard`.
+
+    Shards are opened on first use, with `upgrade` run on a write connection to
+    bring their schema up to date, and the least recently used ones not in use are
+    closed beyond `max_open`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_open: int,
+        create_db: Callable[[str], Awaitable[DBCtx]],
+        upgrade: Callable[[Connection], None],
+    ):
+        self._directory = directory
+        self._max_open = max_open
+        self._create_db = create_db
+        self._upgrade = upgrade
+        # Most recently used last.
+        self._open: OrderedDict[UUID, DBCtx] = OrderedDict()
+        self._in_use: dict[UUID, int] = {}
+        self._opening = Lock()
+
+    def open_users(self) -> list[UUID]:
+        return list(self._open)
+
+    def users(self) -> list[UUID]:
+        """The users with a shard, open or not, locally or in persistent storage."""
+        names = (
+            set(os.listdir(self._directory))
+            if os.path.isdir(self._directory)
+            else set()
+        )
+        if all_env_variables_present():
+            with suppress(FileNotFoundError):
+                names.update(
+                    os.path.basename(str(path).rstrip("/"))
+                    for path in DRFileSystem().ls(self._directory, detail=False)
+                )
+        users = set()
+        for name in names:
+            # The database file, or the directory of its replica.
+            stem, _, extension = name.partition(".")
+            if extension in ("sqlite", "sqlite.replica"):
+                with suppress(ValueError):
+                    users.add(UUID(stem))
+        return sorted(users)
+
+    async def get(self, user_uuid: UUID) -> DBCtx:
+        """The shard of the user, opened if need be."""
+        if shard := self._open.get(user_uuid):
+            self._open.move_to_end(user_uuid)
+            return shard
+        async with self._opening:
+            if shard := self._open.get(user_uuid):
+                return shard
+            os.makedirs(self._directory, exist_ok=True)
+            path = os.path.join(self._directory, f"{user_uuid}.sqlite")
+            shard = await self._create_db(f"sqlite+aiosqlite:///{path}")
+            try:
+                async with shard.session(writable=True) as session:
+                    connection = await session.connection()
+                    await connection.run_sync(self._upgrade)
+                    await session.commit()
+            except BaseException:
+                await shard.shutdown()
+                raise
+            await self._close_least_recently_used()
+            self._open[user_uuid] = shard
+            return shard
+
+    async def close(self, user_uuid: UUID) -> None:
+        """Close the shard of the user, unless it is in use."""
+        if user_uuid in self._open and not self._in_use.get(user_uuid):
+            await self._open.pop(user_uuid).shutdown()
+            logger.debug("Closed database shard", extra={"user": str(user_uuid)})
+
+    async def _close_least_recently_used(self) -> None:
+        """Make room for one more shard."""
+        idle = [user for user in self._open if not self._in_use.get(user)]
+        for user_uuid in idle[: max(len(self._open) + 1 - self._max_open, 0)]:
+            shard = self._open.pop(user_uuid)
+            await shard.shutdown()
+            logger.debug("Closed database shard", extra={"user": str(user_uuid)})
+
+    @asynccontextmanager
+    async def _current(self) -> AsyncGenerator[DBCtx, None]:
+        """The shard of the current user, kept open in the block."""
+        user_uuid = _shard_user.get()
+        if user_uuid is None:
+            raise RuntimeError("No database shard is in use, see use_shard.")
+        shard = await self.get(user_uuid)
+        self._in_use[user_uuid] = self._in_use.get(user_uuid, 0) + 1
+        try:
+            yield shard
+        finally:
+            self._in_use[user_uuid] -= 1
+            if not self._in_use[user_uuid]:
+                del self._in_use[user_uuid]
+
+    @asynccontextmanager
+    async def session(
+        self, writable: bool = False
+    ) -> AsyncGenerator[AsyncSession, None]:
+        async with self._current() as shard, shard.session(writable) as session:
+            yield session
+
+    async def write(self, operation: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        async with self._current() as shard:
+            return await shard.write(operation)
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncGenerator[None, None]:
+        async with self._current() as shard, shard.unit_of_work():
+            yield
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        # A unit of work keeps its shard open.
+        user_uuid = _shard_user.get()
+        if user_uuid and (shard := self._open.get(user_uuid)):
+            shard.after_commit(callback)
+        else:
+            callback()
+
+    async def shutdown(self) -> None:
+        """Close every shard, uploading their pending writes."""
+        while self._open:
+            _, shard = self._open.popitem()
+            await shard.shutdown()
+
+
+async def create_db_ctx(
+    db_url: str,
+    log_sql_stmts: bool = False,
+    snapshot_staleness: float = 0.0,
+    snapshot_upload_interval: float = 0.0,
+    replication: bool = False,
+    group_commit: bool = False,
+    sqlite_profile: bool = False,
+    replica_uris: Sequence[str] = (),
+    replica_health_interval: float = 10.0,
+    compiled_cache_size: int = 500,
+) -> DBCtx:
+    """
+    Create the database context. With `sqlite_profile`, a SQLite database file gets
+    the pragmas above, a single writer connection and a pool of read-only ones.
+    """
+    url = make_url(db_url)
+    read_engine = None
+    in_memory = url.database in (None, "", ":memory:")
+    if sqlite_profile and "sqlite" in url.drivername and not in_memory:
+        # A single writer connection, so writes queue for it rather than retry on
+        # SQLite's file lock, and a pool of read-only connections.
+        async_engine = create_async_engine(
+            db_url,
+            echo=log_sql_stmts,
+            query_cache_size=compiled_cache_size,
+            pool_size=1,
+            max_overflow=0,
+        )
+        read_engine = create_async_engine(
+            db_url,
+            echo=log_sql_stmts,
+            query_cache_size=compiled_cache_size,
+            pool_size=SQLITE_READ_POOL_SIZE,
+            max_overflow=0,
+        )
+        ships_whole_file = all_env_variables_present() and not replication
+        _set_pragmas(
+            async_engine,
+            SQLITE_PRAGMAS if ships_whole_file else SQLITE_PRAGMAS | SQLITE_WAL_PRAGMAS,
+        )
+        _set_pragmas(read_engine, SQLITE_PRAGMAS | {"query_only": "1"})
+    else:
+        async_engine = create_async_engine(
+            db_url, echo=log_sql_stmts, query_cache_size=compiled_cache_size
+        )
+    if replication and "sqlite" in url.drivername and not in_memory:
+        _set_pragmas(async_engine, SQLITE_REPLICATION_PRAGMAS)
+
+    db = DBCtx(
+        async_engine,
+        snapshot_staleness=snapshot_staleness,
+        snapshot_upload_interval=snapshot_upload_interval,
+        replication=replication,
+        group_commit=group_commit,
+        read_engine=read_engine,
+        replica_engines=[
+            create_async_engine(
+                uri, echo=log_sql_stmts, query_cache_size=compiled_cache_size
+            )
+            for uri in replica_uris
+        ],
+        replica_health_interval=replica_health_interval,
     )
+    # In a thread, so the rest of the startup goes on while a large replica downloads.
+    await asyncio.to_thread(db.restore)
 
     async with async_engine.begin() as conn:
         # testing DB credentials...
         await conn.execute(text("select '1'"))
 
-    return DBCtx(async_engine)
+    db.start()
+    return db
@@ -11,29 +11,50 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import AsyncGenerator, Dict
+from typing import Any, AsyncGenerator, Dict, Iterator
 from urllib.parse import urlparse
 from uuid import UUID
 
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from core.persistent_fs.dr_file_system import all_env_variables_present
+from core.utils.rw_lock import FileReadWriteLock
 from datarobot.auth.oauth import AsyncOAuthComponent
+from sqlalchemy import Connection
 
+from alembic_migration import MigrationLock
 from app.ag_ui.stream_manager import AGUIStreamManager, create_stream_manager
 from app.auth.api_key import APIKeyValidator
 from app.auth.oauth import get_oauth
 from app.chats import ChatRepository
+from app.chats.purger import ChatPurger
 from app.config import Config
-from app.db import DBCtx, create_db_ctx
+from app.db import DBCtx, DBShards, create_db_ctx
 from app.messages import MessageRepository
+from app.messages.archive import ChatArchiver
 from app.users.identity import IdentityRepository
 from app.users.tokens import Tokens
 from app.users.user import UserRepository
 
 logger = logging.getLogger(__name__)
 
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+# Held while migrating at startup, so the first worker process of the container
+# migrates and the others find it done.
+MIGRATION_LOCK = Path(tempfile.gettempdir()) / "app-migration.lock"
+
+
+class MigrationError(Exception):
+    """The startup migration of the database failed."""
+
 
 @dataclass
 class Deps:
@@ -47,6 +68,10 @@ class Deps:
     tokens: Tokens
     user_repo: UserRepository
     stream_manager: AGUIStreamManager[UUID, Dict[str, str]]
+    chat_purger: ChatPurger
+    chat_archiver: ChatArchiver
+    # The chat and message data, when kept in a database per user.
+    shards: DBShards | None = None
 
 
 def sqlite_uri_to_path(uri: str) -> Path | None:
@@ -68,6 +93,65 @@ def sqlite_uri_to_path(uri: str) -> Path | None:
     return Path(db_path_str)
 
 
+def _upgrade_shard(connection: Connection) -> None:
+    """Migrate a database shard to the latest revision, on the given connection."""
+    alembic_cfg = AlembicConfig(str(ALEMBIC_INI))
+    alembic_cfg.attributes["connection"] = connection
+    command.upgrade(alembic_cfg, "head")
+
+
+def _migrate(lock_timeout: float) -> None:
+    """
+    Migrate the main database to the latest revision, see `migrations/env.py`. Only
+    the first worker process of the container migrates, while `MigrationLock` keeps
+    other instances of the app from migrating at the same time.
+    """
+    done = MIGRATION_LOCK.with_suffix(".done")
+    with FileReadWriteLock(str(MIGRATION_LOCK)).write_lock():
+        if done.exists():
+            return
+        alembic_cfg = AlembicConfig(str(ALEMBIC_INI))
+        alembic_cfg.attributes["configure_logger"] = False
+        try:
+            with MigrationLock(wait_timeout=lock_timeout):
+                command.upgrade(alembic_cfg, "head")
+        except Exception as e:
+            raise MigrationError("The database migration failed.") from e
+        done.touch()
+
+
+class StartupTimer:
+    """
+    Time the phases of the startup, some of which run concurrently, and log each
+    one as it finishes, then the breakdown of all of them.
+    """
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(
+                "Startup phase finished",
+                extra={"phase": name, "duration_ms": self.phases[name]},
+            )
+
+    def finish(self) -> None:
+        logger.info(
+            "Startup finished",
+            extra={
+                "duration_ms": round((time.perf_counter() - self._started) * 1000, 1),
+                "phases_ms": self.phases,
+            },
+        )
+
+
 @asynccontextmanager
 async def create_deps(
     config: Config, deps: Deps | None = None
@@ -82,41 +166,115 @@ async def create_deps(
         return
 
     # startup routine
+    timer = StartupTimer()
     # Ensure the directory exists for SQLite database files
     db_path = sqlite_uri_to_path(config.database_uri)
     if db_path:
         db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    db = await create_db_ctx(config.database_uri)
+    db_options: dict[str, Any] = dict(
+        snapshot_staleness=config.database_snapshot_staleness,
+        snapshot_upload_interval=config.database_snapshot_upload_interval,
+        replication=config.database_replication,
+        group_commit=config.database_group_commit,
+        sqlite_profile=config.database_sqlite_profile,
+        compiled_cache_size=config.database_compiled_cache_size,
+    )
 
-    api_key_validator = APIKeyValidator(datarobot_endpoint=config.datarobot_endpoint)
+    async def open_db() -> DBCtx:
+        if config.database_migrate_on_startup:
+            with timer.phase("migrations"):
+                await asyncio.to_thread(
+                    _migrate, config.database_migration_lock_timeout
+                )
+        with timer.phase("database"):
+            return await create_db_ctx(
+                config.database_uri,
+                replica_uris=config.database_replica_uris,
+                replica_health_interval=config.database_replica_health_interval,
+                **db_options,
+            )
 
-    if config.test_user_api_key:
-        logger.warning(
-            "Test User API key is set, so the application will assume the mocked user. "
-            "This must be enabled during local development only."
-        )
+    # The migrations and the snapshot restore run in threads, so the steps below
+    # that do not need the database run meanwhile.
+    db_task = asyncio.create_task(open_db())
+    await asyncio.sleep(0)
+    try:
+        with timer.phase("api_key_validator"):
+            api_key_validator = APIKeyValidator(
+                datarobot_endpoint=config.datarobot_endpoint
+            )
 
-    if config.test_user_email:
-        logger.warning(
-            "Test User email is set, so the application will assume the mocked user. "
-            "This must be enabled during local development only."
-        )
+        if config.test_user_api_key:
+            logger.warning(
+                "Test User API key is set, so the application will assume the mocked user. "
+                "This must be enabled during local development only."
+            )
 
-    oauth = get_oauth(config)
+        if config.test_user_email:
+            logger.warning(
+                "Test User email is set, so the application will assume the mocked user. "
+                "This must be enabled during local development only."
+            )
 
-    identity_repo = IdentityRepository(db)
+        with timer.phase("oauth"):
+            oauth = get_oauth(config)
+    except BaseException:
+        db_task.cancel()
+        raise
+    db = await db_task
 
-    chat_repo = ChatRepository(db)
-    message_repo = MessageRepository(db)
+    shards = None
+    if config.database_shard_directory:
+        shards = DBShards(
+            config.database_shard_directory,
+            max_open=config.database_max_open_shards,
+            create_db=partial(create_db_ctx, **db_options),
+            upgrade=_upgrade_shard,
+        )
+    chat_db = shards or db
 
-    stream_manager = create_stream_manager(
-        name="agent",
-        chat_repo=chat_repo,
-        message_repo=message_repo,
-        config=config,
+    identity_repo = IdentityRepository(db)
+
+    chat_repo = ChatRepository(chat_db)
+    message_repo = MessageRepository(
+        chat_db,
+        body_offload_threshold=config.message_body_offload_threshold,
+        body_preview_length=config.message_body_preview_length,
     )
 
+    with timer.phase("stream_manager"):
+        stream_manager = create_stream_manager(
+            name="agent",
+            chat_repo=chat_repo,
+            message_repo=message_repo,
+            config=config,
+            db=chat_db,
+        )
+
+    archive_after_days = config.chat_archive_after_days
+    if archive_after_days and not all_env_variables_present():
+        logger.warning("Chat archiving requires persistent storage, so it is disabled.")
+        archive_after_days = 0
+
+    with timer.phase("jobs"):
+        chat_archiver = ChatArchiver(
+            chat_db,
+            root=config.chat_archive_path,
+            idle_days=archive_after_days,
+            interval=config.chat_archive_interval,
+        )
+        chat_archiver.start()
+        chat_purger = ChatPurger(
+            message_repo,
+            batch_size=config.chat_purge_batch_size,
+            interval=config.chat_purge_interval,
+            archiver=chat_archiver,
+            shards=shards,
+        )
+        chat_purger.start()
+    timer.finish()
+
     yield Deps(
         config=config,
         chat_repo=chat_repo,
@@ -128,8 +286,15 @@ async def create_deps(
         tokens=Tokens(oauth, identity_repo),
         db=db,
         stream_manager=stream_manager,
+        chat_purger=chat_purger,
+        chat_archiver=chat_archiver,
+        shards=shards,
     )
 
     # shutdown routine
+    await chat_purger.stop()
+    await chat_archiver.stop()
     await oauth.close()
+    if shards:
+        await shards.shutdown()
     await db.shutdown()
@@ -0,0 +1,64 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from contextlib import suppress
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(ABC):
+    """
+    Background task calling `run_once` every `interval` seconds, and right away when
+    woken up. Failures are logged and the job retries at the next run.
+    """
+
+    name: str
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    @abstractmethod
+    async def run_once(self) -> int:
+        """Do all pending work. Returns the number of rows processed."""
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def wake(self) -> None:
+        """Run as soon as possible rather than at the next interval."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self._interval)
+            self._wakeup.clear()
+            try:
+                if rows := await self.run_once():
+                    logger.info(
+                        "Background job done", extra={"job": self.name, "rows": rows}
+                    )
+            except Exception:
+                logger.exception("Background job failed", extra={"job": self.name})
@@ -18,12 +18,44 @@ from datetime import datetime, timezone
 from enum import Enum
 from typing import Any, Sequence, cast
 
-from sqlalchemy import Column, DateTime, ForeignKey, desc
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    String,
+    and_,
+    bindparam,
+    case,
+    delete,
+    desc,
+    func,
+    or_,
+    union_all,
+    update,
+)
+from sqlalchemy import select as sa_select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
-from sqlmodel import Field, Index, Relationship, SQLModel, UniqueConstraint, select
-
-from app.db import DBCtx
+from sqlalchemy.orm import QueryableAttribute, load_only, raiseload, selectinload
+from sqlalchemy.sql.base import ExecutableOption
+from sqlalchemy.sql.dml import Update
+from sqlmodel import (
+    Field,
+    Index,
+    Relationship,
+    SQLModel,
+    UniqueConstraint,
+    col,
+    select,
+)
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.chats import Chat
+from app.db import DBCtx, DBShards
+from app.messages import bodies, search
+from app.messages.bodies import MessageBody
+from app.pagination import Cursor
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +73,10 @@ class Role(str, Enum):
     REASONING = "reasoning"
 
 
+def _version_column() -> Column[int]:
+    return Column(BigInteger, nullable=False, server_default="0", index=True)
+
+
 class AGUIMessageBase(SQLModel):
     agui_id: str | None = Field(default=None)
     role: str = Field(default=Role.USER)
@@ -67,10 +103,20 @@ class MessageBase(AGUIMessageBase):
         sa_column=Column(DateTime(timezone=True), nullable=False, index=True),
     )
     error: str | None = Field(default=None)
+    # Full length of the content when `content` is a preview of an offloaded body.
+    content_length: int | None = Field(default=None)
+
+    # Bumped by MessageRepository on every write, see `Chat.message_version`.
+    version: int = Field(default=0, sa_column=_version_column())
+    updated_at: datetime | None = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
 
     __table_args__ = (
         UniqueConstraint("chat_id", "agui_id", name="uq_chat_id_agui_id"),
         Index("ix_chat_id_agui_id", "chat_id", "agui_id"),
+        # Keyset pagination of a chat's history.
+        Index("ix_message_chat_id_created_at", "chat_id", "created_at"),
     )
 
     def dump_json_compatible(self) -> dict[str, Any]:
@@ -92,12 +138,19 @@ class MessageToolCallBase(AGUIMessageBase):
     arguments: str = Field(default="")
     in_progress: bool = Field(default=True)
     error: str | None = Field(default=None)
+    # Full length of the content when `content` is a preview of an offloaded body.
+    content_length: int | None = Field(default=None)
 
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column=Column(DateTime(timezone=True), nullable=False, index=True),
     )
 
+    version: int = Field(default=0, sa_column=_version_column())
+    updated_at: datetime | None = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+
     __table_args__ = (
         UniqueConstraint("message_uuid", "agui_id", name="unq_message_uuid_agui_id"),
         Index("ix_message_uuid_agui_id", "message_uuid", "agui_id"),
@@ -122,6 +175,11 @@ class MessageReasoningBase(AGUIMessageBase):
         sa_column=Column(DateTime(timezone=True), nullable=False, index=True),
     )
 
+    version: int = Field(default=0, sa_column=_version_column())
+    updated_at: datetime | None = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+
 
 class MessageToolCall(MessageToolCallBase, table=True):
     """Schema for a tool call in a message."""
@@ -149,8 +207,15 @@ class Message(MessageBase, table=True):
     uuid: uuidpkg.UUID = Field(
         default_factory=uuidpkg.uuid4, primary_key=True, unique=True
     )
-    tool_calls: list["MessageToolCall"] = Relationship(back_populates="message")
-    reasonings: list["MessageReasoning"] = Relationship(back_populates="message")
+    # Loaded in creation order, so translation to AG-UI does not need to sort them.
+    tool_calls: list["MessageToolCall"] = Relationship(
+        back_populates="message",
+        sa_relationship_kwargs={"order_by": "MessageToolCall.created_at"},
+    )
+    reasonings: list["MessageReasoning"] = Relationship(
+        back_populates="message",
+        sa_relationship_kwargs={"order_by": "MessageReasoning.created_at"},
+    )
 
 
 class MessagePublic(MessageBase):
@@ -212,13 +277,235 @@ class MessageReasoningUpdate(SQLModel):
     in_progress: bool | None = Field(default=False)
 
 
+# Bumping the version of the chat locks its row until the transaction ends, so
+# concurrent writers to a chat get unique versions and commit them in order, while
+# writers to other chats do not wait on each other.
+def _next_version(chat_id: Any) -> Update:
+    return (
+        update(Chat)
+        .where(col(Chat.uuid) == chat_id)
+        .values(message_version=col(Chat.message_version) + 1)
+        .returning(col(Chat.message_version))
+    )
+
+
+_NEXT_CHAT_VERSION = _next_version(bindparam("chat_id"))
+_NEXT_MESSAGE_VERSION = _next_version(
+    sa_select(col(Message.chat_id))
+    .where(col(Message.uuid) == bindparam("message_uuid"))
+    .scalar_subquery()
+)
+
+
+async def _touch(
+    session: AsyncSession, row: Message | MessageToolCall | MessageReasoning
+) -> None:
+    """Mark a row as changed so `get_chat_changes` picks it up."""
+    if isinstance(row, Message):
+        response = await session.execute(_NEXT_CHAT_VERSION, {"chat_id": row.chat_id})
+    else:
+        response = await session.execute(
+            _NEXT_MESSAGE_VERSION, {"message_uuid": row.message_uuid}
+        )
+    # Without its chat, the row is left for the insert to fail on its foreign key.
+    row.version = response.scalar_one_or_none() or 0
+    row.updated_at = datetime.now(timezone.utc)
+
+
+# Keeps IN clauses below the bound parameter limit of older SQLite builds.
+_IN_CLAUSE_CHUNK_SIZE = 500
+
+# Number of characters of the last message kept on the chat for listing.
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+
+
+# The chat summary updates and the lookups of the write path are built once, with
+# their parameters bound at execution.
+_CREATED_AT = bindparam("message_created_at", type_=DateTime(timezone=True))
+_PREVIEW = bindparam("message_preview", type_=String())
+_IS_LAST = or_(
+    col(Chat.last_message_at).is_(None), col(Chat.last_message_at) <= _CREATED_AT
+)
+_ADD_TO_CHAT_SUMMARY = (
+    update(Chat)
+    .where(col(Chat.uuid) == bindparam("chat_id"))
+    .values(
+        message_count=col(Chat.message_count) + 1,
+        last_message_at=case((_IS_LAST, _CREATED_AT), else_=col(Chat.last_message_at)),
+        last_message_preview=case(
+            (_IS_LAST, _PREVIEW), else_=col(Chat.last_message_preview)
+        ),
+    )
+)
+_UPDATE_CHAT_PREVIEW = (
+    update(Chat)
+    .where(
+        col(Chat.uuid) == bindparam("chat_id"),
+        col(Chat.last_message_at) == _CREATED_AT,
+    )
+    .values(last_message_preview=_PREVIEW)
+)
+
+
+def _chat_summary_params(message: Message) -> dict[str, Any]:
+    return {
+        "chat_id": message.chat_id,
+        "message_created_at": message.created_at,
+        "message_preview": message.content[:LAST_MESSAGE_PREVIEW_LENGTH],
+    }
+
+
+async def _add_to_chat_summary(session: AsyncSession, message: Message) -> None:
+    """Count a new message in the chat summary, and make it the last one if newest."""
+    await session.exec(_ADD_TO_CHAT_SUMMARY, params=_chat_summary_params(message))
+
+
+async def _update_chat_preview(session: AsyncSession, message: Message) -> None:
+    """Refresh the chat preview if the message is the last one of the chat."""
+    await session.exec(_UPDATE_CHAT_PREVIEW, params=_chat_summary_params(message))
+
+
+# SQLModel types relationships as their Python value, loader options need attributes.
+_TOOL_CALLS = cast(QueryableAttribute[Any], Message.tool_calls)
+_REASONINGS = cast(QueryableAttribute[Any], Message.reasonings)
+
+
+def _message_options(with_children: bool) -> list[ExecutableOption]:
+    """
+    Loader strategy for messages. Tool calls and reasonings cost one query each, and
+    their back-reference to the message is resolved from the session. Relationships
+    that are not loaded raise on access instead of lazy loading.
+    """
+    if not with_children:
+        return [raiseload("*")]
+    return [
+        selectinload(_TOOL_CALLS).raiseload("*", sql_only=True),
+        selectinload(_REASONINGS).raiseload("*", sql_only=True),
+    ]
+
+
+_MESSAGE_BY_UUID = (
+    select(Message).where(Message.uuid == bindparam("uuid")).options(raiseload("*"))
+)
+_TOOL_CALL_BY_UUID = (
+    select(MessageToolCall)
+    .where(MessageToolCall.uuid == bindparam("uuid"))
+    .options(raiseload("*"))
+)
+_REASONING_BY_UUID = (
+    select(MessageReasoning)
+    .where(MessageReasoning.uuid == bindparam("uuid"))
+    .options(raiseload("*"))
+)
+# By whether tool calls and reasonings are loaded.
+_MESSAGE_BY_AGUI_ID = {
+    with_children: select(Message)
+    .where(
+        Message.chat_id == bindparam("chat_id"),
+        Message.agui_id == bindparam("agui_id"),
+    )
+    .options(*_message_options(with_children))
+    .limit(1)
+    for with_children in [False, True]
+}
+_TOOL_CALL_BY_AGUI_ID = (
+    select(MessageToolCall)
+    .where(
+        MessageToolCall.message_uuid == bindparam("message_uuid"),
+        MessageToolCall.agui_id == bindparam("agui_id"),
+    )
+    .options(raiseload("*"))
+    .limit(1)
+)
+
+
+def message_version(message: Message) -> int:
+    """Latest version of a message, including its tool calls and reasonings."""
+    return max(
+        [message.version]
+        + [tc.version for tc in message.tool_calls]
+        + [r.version for r in message.reasonings]
+    )
+
+
+def chat_version_query(chat_id: uuidpkg.UUID) -> SelectOfScalar[Any]:
+    """Latest version of any message, tool call or reasoning in the chat."""
+    message_uuids = sa_select(col(Message.uuid)).where(col(Message.chat_id) == chat_id)
+    versions = union_all(
+        sa_select(func.max(Message.version)).where(col(Message.chat_id) == chat_id),
+        sa_select(func.max(MessageToolCall.version)).where(
+            col(MessageToolCall.message_uuid).in_(message_uuids)
+        ),
+        sa_select(func.max(MessageReasoning.version)).where(
+            col(MessageReasoning.message_uuid).in_(message_uuids)
+        ),
+    ).subquery()
+    return select(func.coalesce(func.max(versions.c[0]), 0))
+
+
+async def delete_messages(
+    session: AsyncSession, message_uuids: Sequence[uuidpkg.UUID]
+) -> None:
+    """
+    Delete messages with their tool calls, reasonings, offloaded bodies and search
+    index entries, within the session's transaction.
+    """
+    tool_calls = sa_select(col(MessageToolCall.uuid)).where(
+        col(MessageToolCall.message_uuid).in_(message_uuids)
+    )
+    statements = [
+        delete(MessageBody).where(
+            or_(
+                col(MessageBody.owner_uuid).in_(message_uuids),
+                col(MessageBody.owner_uuid).in_(tool_calls),
+            )
+        ),
+        delete(MessageToolCall).where(
+            col(MessageToolCall.message_uuid).in_(message_uuids)
+        ),
+        delete(MessageReasoning).where(
+            col(MessageReasoning.message_uuid).in_(message_uuids)
+        ),
+        delete(Message).where(col(Message.uuid).in_(message_uuids)),
+    ]
+    await search.unindex_messages(session, message_uuids)
+    for statement in statements:
+        await session.exec(statement.execution_options(synchronize_session=False))
+
+
 class MessageRepository:
     """
     Message repository class to handle message-related database operations.
     """
 
-    def __init__(self, db: DBCtx):
+    def __init__(
+        self,
+        db: DBCtx | DBShards,
+        body_offload_threshold: int = bodies.OFFLOAD_THRESHOLD,
+        body_preview_length: int = bodies.PREVIEW_LENGTH,
+    ):
         self._db = db
+        self._body_offload_threshold = body_offload_threshold
+        self._body_preview_length = body_preview_length
+
+    async def _store_content(
+        self, session: AsyncSession, row: Message | MessageToolCall
+    ) -> None:
+        """
+        Write the content of a row, offloading it to `message_body` when the row is
+        finished and the content is large. Only a preview is then kept in the row.
+        """
+        if row.content_length is not None:
+            # The offloaded body is replaced by the new content.
+            await session.exec(
+                delete(MessageBody).where(col(MessageBody.owner_uuid) == row.uuid)
+            )
+            row.content_length = None
+        if row.in_progress or len(row.content) <= self._body_offload_threshold:
+            return
+        session.add(MessageBody(owner_uuid=row.uuid, data=bodies.compress(row.content)))
+        row.content_length = len(row.content)
+        row.content = row.content[: self._body_preview_length]
 
     async def create_message(self, message_data: MessageCreate) -> Message:
         """
@@ -226,18 +513,24 @@ class MessageRepository:
         This method ensures the chat exists before creating the message.
         """
 
-        message = Message(**message_data.model_dump())
-
-        async with self._db.session(writable=True) as session:
+        async def create(session: AsyncSession) -> Message:
+            message = Message(**message_data.model_dump())
+            await _touch(session, message)
+            await _add_to_chat_summary(session, message)
+            content = message.content
+            await self._store_content(session, message)
             session.add(message)
-            try:
-                await session.commit()
-            except IntegrityError:
-                await session.rollback()
-                raise ValueError(f"Chat with ID {message_data.chat_id} does not exist")
-            await session.refresh(message)
+            if not message.in_progress:
+                # On Postgres the index is a column of the row, so it must exist.
+                await session.flush()
+                await search.index_message(session, message.uuid, content)
             return message
 
+        try:
+            return await self._db.write(create)
+        except IntegrityError:
+            raise ValueError(f"Chat with ID {message_data.chat_id} does not exist")
+
     async def update_message(
         self,
         uuid: uuidpkg.UUID,
@@ -245,105 +538,109 @@ class MessageRepository:
     ) -> Message | None:
         """Update a message (must be owned by the user)."""
         logger.debug("Writing message")
-        async with self._db.session(writable=True) as session:
-            query = await session.exec(
-                select(Message)
-                .where(
-                    Message.uuid == uuid,
-                )
-                .options(selectinload("*"))
-            )
+
+        async def apply(session: AsyncSession) -> Message | None:
+            query = await session.exec(_MESSAGE_BY_UUID, params={"uuid": uuid})
             message = query.first()
             if not message:
                 return None
 
-            for field, value in update.model_dump(exclude_unset=True).items():
+            was_in_progress = message.in_progress
+            changes = update.model_dump(exclude_unset=True)
+            for field, value in changes.items():
                 if value is not None:
                     setattr(message, field, value)
-
-            await session.commit()
-            await session.refresh(message)
-
+            await _touch(session, message)
+            if changes.get("content") is not None:
+                await _update_chat_preview(session, message)
+            finished = was_in_progress and not message.in_progress
+            # Only finished messages are indexed, so streaming does not reindex.
+            if not message.in_progress and (
+                was_in_progress or changes.get("content") is not None
+            ):
+                await search.index_message(session, message.uuid, message.content)
+            if finished or changes.get("content") is not None:
+                await self._store_content(session, message)
             return message
 
+        return await self._db.write(apply)
+
     async def create_message_tool_call(
         self, message_tool_call_data: MessageToolCallCreate
     ) -> MessageToolCall:
         """
         Create a tool call for a message.
         """
-        message_tool_call = MessageToolCall(**message_tool_call_data.model_dump())
-        async with self._db.session(writable=True) as session:
+
+        async def create(session: AsyncSession) -> MessageToolCall:
+            message_tool_call = MessageToolCall(**message_tool_call_data.model_dump())
+            await _touch(session, message_tool_call)
+            await self._store_content(session, message_tool_call)
             session.add(message_tool_call)
-            try:
-                await session.commit()
-            except IntegrityError:
-                await session.rollback()
-                raise ValueError(
-                    f"Message with ID {message_tool_call_data.message_uuid} does not exist"
-                )
-            await session.refresh(message_tool_call)
             return message_tool_call
 
+        try:
+            return await self._db.write(create)
+        except IntegrityError:
+            raise ValueError(
+                f"Message with ID {message_tool_call_data.message_uuid} does not exist"
+            )
+
     async def update_message_tool_call(
         self, uuid: uuidpkg.UUID, update: MessageToolCallUpdate
     ) -> MessageToolCall | None:
         """
         Updates a tool call in a message.
         """
-        async with self._db.session(writable=True) as session:
-            query = await session.exec(
-                select(MessageToolCall)
-                .where(
-                    MessageToolCall.uuid == uuid,
-                )
-                .options(selectinload("*"))
-            )
+
+        async def apply(session: AsyncSession) -> MessageToolCall | None:
+            query = await session.exec(_TOOL_CALL_BY_UUID, params={"uuid": uuid})
             tool_call = query.first()
             if not tool_call:
                 return None
 
-            for field, value in update.model_dump(exclude_unset=True).items():
+            was_in_progress = tool_call.in_progress
+            changes = update.model_dump(exclude_unset=True)
+            for field, value in changes.items():
                 if value is not None:
                     setattr(tool_call, field, value)
-
-            await session.commit()
-            await session.refresh(tool_call)
+            await _touch(session, tool_call)
+            finished = was_in_progress and not tool_call.in_progress
+            if finished or changes.get("content") is not None:
+                await self._store_content(session, tool_call)
             return tool_call
 
+        return await self._db.write(apply)
+
     async def create_message_reasoning(
         self, message_tool_call_data: MessageReasoningCreate
     ) -> MessageReasoning:
         """
         Create a tool call for a message.
         """
-        reasoning = MessageReasoning(**message_tool_call_data.model_dump())
-        async with self._db.session(writable=True) as session:
+
+        async def create(session: AsyncSession) -> MessageReasoning:
+            reasoning = MessageReasoning(**message_tool_call_data.model_dump())
+            await _touch(session, reasoning)
             session.add(reasoning)
-            try:
-                await session.commit()
-            except IntegrityError:
-                await session.rollback()
-                raise ValueError(
-                    f"Message with ID {message_tool_call_data.message_uuid} does not exist"
-                )
-            await session.refresh(reasoning)
             return reasoning
 
+        try:
+            return await self._db.write(create)
+        except IntegrityError:
+            raise ValueError(
+                f"Message with ID {message_tool_call_data.message_uuid} does not exist"
+            )
+
     async def update_message_reasoning(
         self, uuid: uuidpkg.UUID, update: MessageReasoningUpdate
     ) -> MessageReasoning | None:
         """
         Updates a tool call in a message.
         """
-        async with self._db.session(writable=True) as session:
-            query = await session.exec(
-                select(MessageReasoning)
-                .where(
-                    MessageReasoning.uuid == uuid,
-                )
-                .options(selectinload("*"))
-            )
+
+        async def apply(session: AsyncSession) -> MessageReasoning | None:
+            query = await session.exec(_REASONING_BY_UUID, params={"uuid": uuid})
             reasoning = query.first()
             if not reasoning:
                 return None
@@ -351,36 +648,38 @@ class MessageRepository:
             for field, value in update.model_dump(exclude_unset=True).items():
                 if value is not None:
                     setattr(reasoning, field, value)
-
-            await session.commit()
-            await session.refresh(reasoning)
+            await _touch(session, reasoning)
             return reasoning
 
-    async def get_message(self, uuid: uuidpkg.UUID) -> Message | None:
+        return await self._db.write(apply)
+
+    async def get_message(
+        self, uuid: uuidpkg.UUID, with_children: bool = True
+    ) -> Message | None:
         """
-        Retrieve a message by their ID.
+        Retrieve a message by their ID, with its tool calls and reasonings unless
+        `with_children` is False.
         """
         async with self._db.session() as sess:
             response = await sess.exec(
                 select(Message)
                 .where(Message.uuid == uuid)
-                .options(selectinload("*"))
+                .options(*_message_options(with_children))
                 .limit(1)
             )
             return response.one_or_none()
 
     async def get_message_by_agui_id(
-        self, chat_id: uuidpkg.UUID, agui_id: str
+        self, chat_id: uuidpkg.UUID, agui_id: str, with_children: bool = True
     ) -> Message | None:
         """
-        Retrieve messages from an AGUI ID.
+        Retrieve messages from an AGUI ID, with its tool calls and reasonings unless
+        `with_children` is False.
         """
         async with self._db.session(False) as sess:
             response = await sess.exec(
-                select(Message)
-                .where(Message.chat_id == chat_id, Message.agui_id == agui_id)
-                .options(selectinload("*"))
-                .limit(1)
+                _MESSAGE_BY_AGUI_ID[with_children],
+                params={"chat_id": chat_id, "agui_id": agui_id},
             )
             return response.one_or_none()
 
@@ -392,15 +691,171 @@ class MessageRepository:
         """
         async with self._db.session(False) as sess:
             response = await sess.exec(
-                select(MessageToolCall)
+                _TOOL_CALL_BY_AGUI_ID,
+                params={"message_uuid": message_uuid, "agui_id": agui_id},
+            )
+            return response.one_or_none()
+
+    async def get_body(self, owner_uuid: uuidpkg.UUID) -> str | None:
+        """
+        Retrieve the full offloaded content of a message or tool call.
+        """
+        async with self._db.session() as sess:
+            response = await sess.exec(
+                select(MessageBody.data).where(MessageBody.owner_uuid == owner_uuid)
+            )
+            data = response.first()
+            return bodies.decompress(data) if data is not None else None
+
+    async def get_full_content(
+        self, chat_id: uuidpkg.UUID, message_id: str
+    ) -> str | None:
+        """
+        Retrieve the full content of a message or tool result of the chat, by the id
+        it has in the AG-UI history, including offloaded bodies.
+        """
+        try:
+            uuid: uuidpkg.UUID | None = uuidpkg.UUID(message_id)
+        except ValueError:
+            uuid = None
+        chat_messages = sa_select(col(Message.uuid)).where(
+            col(Message.chat_id) == chat_id
+        )
+        queries = [
+            sa_select(
+                col(Message.uuid), col(Message.content), col(Message.content_length)
+            ).where(
+                col(Message.chat_id) == chat_id,
+                or_(col(Message.agui_id) == message_id, col(Message.uuid) == uuid),
+            ),
+            sa_select(
+                col(MessageToolCall.uuid),
+                col(MessageToolCall.content),
+                col(MessageToolCall.content_length),
+            ).where(
+                col(MessageToolCall.message_uuid).in_(chat_messages),
+                or_(
+                    col(MessageToolCall.tool_call_id) == message_id,
+                    col(MessageToolCall.uuid) == uuid,
+                ),
+            ),
+        ]
+        async with self._db.session() as sess:
+            for query in queries:
+                row = (await sess.execute(query.limit(1))).first()
+                if not row:
+                    continue
+                owner_uuid, content, content_length = row
+                if content_length is None:
+                    return cast(str, content)
+                data = (
+                    await sess.exec(
+                        select(MessageBody.data).where(
+                            MessageBody.owner_uuid == owner_uuid
+                        )
+                    )
+                ).first()
+                return bodies.decompress(data) if data is not None else None
+        return None
+
+    async def get_offloaded_contents(
+        self, chat_id: uuidpkg.UUID, message_ids: Sequence[str]
+    ) -> dict[str, str]:
+        """
+        Retrieve the full content of the offloaded messages and tool results of the
+        chat among `message_ids`, the ids they have in the AG-UI history, by id.
+        """
+        chat_messages = sa_select(col(Message.uuid)).where(
+            col(Message.chat_id) == chat_id
+        )
+        contents: dict[str, str] = {}
+        # Two IN clauses per query.
+        chunk_size = _IN_CLAUSE_CHUNK_SIZE // 2
+        async with self._db.session() as sess:
+            for start in range(0, len(message_ids), chunk_size):
+                ids = message_ids[start : start + chunk_size]
+                uuids = []
+                for message_id in ids:
+                    try:
+                        uuids.append(uuidpkg.UUID(message_id))
+                    except ValueError:
+                        pass
+                queries = [
+                    sa_select(
+                        col(Message.agui_id), col(Message.uuid), col(MessageBody.data)
+                    )
+                    .join(MessageBody, col(MessageBody.owner_uuid) == col(Message.uuid))
+                    .where(
+                        col(Message.chat_id) == chat_id,
+                        or_(
+                            col(Message.agui_id).in_(ids), col(Message.uuid).in_(uuids)
+                        ),
+                    ),
+                    sa_select(
+                        col(MessageToolCall.tool_call_id),
+                        col(MessageToolCall.uuid),
+                        col(MessageBody.data),
+                    )
+                    .join(
+                        MessageBody,
+                        col(MessageBody.owner_uuid) == col(MessageToolCall.uuid),
+                    )
+                    .where(
+                        col(MessageToolCall.message_uuid).in_(chat_messages),
+                        or_(
+                            col(MessageToolCall.tool_call_id).in_(ids),
+                            col(MessageToolCall.uuid).in_(uuids),
+                        ),
+                    ),
+                ]
+                for query in queries:
+                    for agui_id, uuid, data in await sess.execute(query):
+                        contents[agui_id or str(uuid)] = bodies.decompress(data)
+        return {
+            message_id: contents[message_id]
+            for message_id in message_ids
+            if message_id in contents
+        }
+
+    async def get_existing_agui_ids(
+        self, chat_id: uuidpkg.UUID, agui_ids: Sequence[str]
+    ) -> set[str]:
+        """
+        Retrieve which of `agui_ids` already belong to messages of the chat, without
+        loading the messages.
+        """
+        existing: set[str] = set()
+        async with self._db.session() as sess:
+            for start in range(0, len(agui_ids), _IN_CLAUSE_CHUNK_SIZE):
+                response = await sess.exec(
+                    select(Message.agui_id).where(
+                        Message.chat_id == chat_id,
+                        col(Message.agui_id).in_(
+                            agui_ids[start : start + _IN_CLAUSE_CHUNK_SIZE]
+                        ),
+                    )
+                )
+                existing.update(agui_id for agui_id in response if agui_id)
+        return existing
+
+    async def get_in_progress_reasoning(
+        self, message_uuid: uuidpkg.UUID
+    ) -> MessageReasoning | None:
+        """
+        Retrieve the latest reasoning of the message that is still in progress.
+        """
+        async with self._db.session() as sess:
+            response = await sess.exec(
+                select(MessageReasoning)
                 .where(
-                    MessageToolCall.message_uuid == message_uuid,
-                    MessageToolCall.agui_id == agui_id,
+                    MessageReasoning.message_uuid == message_uuid,
+                    col(MessageReasoning.in_progress),
                 )
-                .options(selectinload("*"))
+                .order_by(desc(col(MessageReasoning.created_at)))
+                .options(raiseload("*"))
                 .limit(1)
             )
-            return response.one_or_none()
+            return response.first()
 
     async def get_chat_messages(self, chat_id: uuidpkg.UUID) -> Sequence[Message]:
         """
@@ -411,34 +866,188 @@ class MessageRepository:
                 select(Message)
                 .where(Message.chat_id == chat_id)
                 .order_by(Message.created_at)  # type: ignore[arg-type]
-                .options(selectinload("*"))
+                .options(*_message_options(with_children=True))
             )
             return response.all()
 
+    async def get_chat_messages_page(
+        self,
+        chat_id: uuidpkg.UUID,
+        limit: int,
+        before: Cursor | None = None,
+    ) -> Sequence[Message]:
+        """
+        Retrieve the `limit` most recent messages of the chat that are older than the
+        `before` cursor, in chronological order. Uses a keyset on (created_at, uuid),
+        so the cost does not grow with the number of skipped messages.
+        """
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before:
+            created_at, uuid = before
+            query = query.where(
+                or_(
+                    Message.created_at < created_at,  # type: ignore[arg-type]
+                    and_(
+                        Message.created_at == created_at,  # type: ignore[arg-type]
+                        Message.uuid < uuid,  # type: ignore[arg-type]
+                    ),
+                )
+            )
+        async with self._db.session() as sess:
+            response = await sess.exec(
+                query.order_by(
+                    desc(Message.created_at),  # type: ignore[arg-type]
+                    desc(Message.uuid),  # type: ignore[arg-type]
+                )
+                .options(*_message_options(with_children=True))
+                .limit(limit)
+            )
+            return list(reversed(response.all()))
+
+    async def get_chat_changes(
+        self, chat_id: uuidpkg.UUID, since: int
+    ) -> Sequence[Message]:
+        """
+        Retrieve the messages of the chat that changed after version `since`, either
+        themselves or through one of their tool calls or reasonings.
+        """
+        changed_tool_calls = sa_select(col(MessageToolCall.message_uuid)).where(
+            col(MessageToolCall.version) > since
+        )
+        changed_reasonings = sa_select(col(MessageReasoning.message_uuid)).where(
+            col(MessageReasoning.version) > since
+        )
+        async with self._db.session() as sess:
+            response = await sess.exec(
+                select(Message)
+                .where(
+                    Message.chat_id == chat_id,
+                    or_(
+                        col(Message.version) > since,
+                        col(Message.uuid).in_(changed_tool_calls),
+                        col(Message.uuid).in_(changed_reasonings),
+                    ),
+                )
+                .order_by(col(Message.created_at))
+                .options(*_message_options(with_children=True))
+            )
+            return response.all()
+
+    async def get_chat_version(self, chat_id: uuidpkg.UUID) -> int:
+        """
+        Retrieve the latest version of any message, tool call or reasoning in the chat.
+        """
+        async with self._db.session() as sess:
+            response = await sess.exec(chat_version_query(chat_id))
+            return int(response.one())
+
+    async def purge_deleted_chats(self, batch_size: int) -> int:
+        """
+        Permanently remove up to `batch_size` messages of deleted chats, with their
+        tool calls, reasonings, offloaded bodies and search index entries. Deleted
+        chats are removed once they have no messages left.
+
+        Returns:
+            int: The number of messages or chats removed, 0 once nothing is left.
+        """
+        async with self._db.session(writable=True) as session:
+            response = await session.exec(
+                select(Message.uuid)
+                .join(Chat, col(Chat.uuid) == col(Message.chat_id))
+                .where(col(Chat.deleted_at).is_not(None))
+                .limit(batch_size)
+            )
+            message_uuids = list(response.all())
+            if message_uuids:
+                await delete_messages(session, message_uuids)
+                await session.commit()
+                return len(message_uuids)
+
+            has_messages = (
+                sa_select(col(Message.uuid))
+                .where(col(Message.chat_id) == col(Chat.uuid))
+                .exists()
+            )
+            response = await session.exec(
+                select(Chat.uuid)
+                .where(col(Chat.deleted_at).is_not(None), ~has_messages)
+                .limit(batch_size)
+            )
+            chat_uuids = list(response.all())
+            if chat_uuids:
+                await session.exec(
+                    delete(Chat)
+                    .where(col(Chat.uuid).in_(chat_uuids))
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+            return len(chat_uuids)
+
+    async def search_messages(
+        self, user_uuid: uuidpkg.UUID, query: str, limit: int
+    ) -> list[search.MessageSearchHit]:
+        """
+        Full-text search the finished messages of the user's chats, best matches
+        first.
+        """
+        async with self._db.session() as sess:
+            return await search.search_messages(sess, user_uuid, query, limit)
+
     async def get_last_messages(
-        self, chat_ids: list[uuidpkg.UUID]
+        self,
+        chat_ids: list[uuidpkg.UUID],
+        columns: Sequence[Any] | None = None,
+        with_children: bool = True,
     ) -> dict[uuidpkg.UUID, Message]:
         """
-        Retrieve last messages from each chat in the list.
+        Retrieve last messages from each chat in the list, in a single query per
+        `_IN_CLAUSE_CHUNK_SIZE` chats.
+
+        Args:
+            chat_ids (list[uuidpkg.UUID]): Chats to get the last message of.
+            columns (Sequence[Any] | None): Only load these message columns, and no
+                relationships. Accessing anything else on the result raises.
+            with_children (bool): Load the tool calls and reasonings of the messages.
         """
         if not chat_ids:
             return {}
 
-        async with self._db.session() as sess:
-            result_dict = {}
+        options: list[Any] = _message_options(with_children)
+        if columns is not None:
+            # chat_id is always needed to key the result.
+            options = [load_only(*[Message.chat_id, *columns]), raiseload("*")]
 
-            # For each chat, get the latest message
-            # This approach avoids the GROUP BY error and is compatible with both SQLite and PostgreSQL
-            for chat_id in chat_ids:
+        result_dict = {}
+        async with self._db.session() as sess:
+            for start in range(0, len(chat_ids), _IN_CLAUSE_CHUNK_SIZE):
+                ranked = (
+                    sa_select(
+                        col(Message.uuid).label("uuid"),
+                        func.row_number()
+                        .over(
+                            partition_by=col(Message.chat_id),
+                            order_by=(
+                                desc(col(Message.created_at)),
+                                desc(col(Message.uuid)),
+                            ),
+                        )
+                        .label("row_number"),
+                    )
+                    .where(
+                        col(Message.chat_id).in_(
+                            chat_ids[start : start + _IN_CLAUSE_CHUNK_SIZE]
+                        )
+                    )
+                    .subquery()
+                )
                 response = await sess.exec(
                     select(Message)
-                    .where(Message.chat_id == chat_id)
-                    .order_by(desc(Message.created_at))  # type: ignore[arg-type]
-                    .options(selectinload("*"))
-                    .limit(1)
+                    .join(ranked, col(Message.uuid) == ranked.c.uuid)
+                    .where(ranked.c.row_number == 1)
+                    .options(*options)
                 )
-                message = response.first()
-                if message:
-                    result_dict[chat_id] = message
+                for message in response.all():
+                    if message.chat_id:
+                        result_dict[message.chat_id] = message
 
             return result_dict
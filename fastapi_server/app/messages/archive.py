@@ -0,0 +1,370 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Archival of idle chats to Parquet.
+
+The messages, tool calls, reasonings and offloaded bodies of chats inactive for a
+while are moved out of the database into zstd-compressed Parquet files, one per
+table, under `<root>/<user uuid>/<chat uuid>/`. They are written with DuckDB through
+`core.persistent_fs.duckdb_extension`, so inside a DataRobot custom application they
+go to DataRobot file storage. The chat row stays as a stub, with its summary and
+`archived_at` set, and the chat is rehydrated into the database when opened.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Sequence
+
+from core.persistent_fs.dr_file_system import DRFileSystem, all_env_variables_present
+from core.persistent_fs.duckdb_extension import connect_dr_fs
+from core.utils.rw_lock import FileReadWriteLock
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    LargeBinary,
+    Row,
+    Table,
+    Uuid,
+    insert,
+    or_,
+    update,
+)
+from sqlalchemy import select as sa_select
+from sqlmodel import SQLModel, col, select
+
+from app.chats import Chat, last_activity_at, not_deleted
+from app.db import DBCtx, DBShards, each_shard
+from app.jobs import PeriodicJob
+from app.messages import (
+    Message,
+    MessageToolCall,
+    bodies,
+    chat_version_query,
+    delete_messages,
+    search,
+)
+
+logger = logging.getLogger(__name__)
+
+# Shared by the worker processes of the app.
+ARCHIVE_LOCK = os.path.join(tempfile.gettempdir(), "app-chat-archive.lock")
+
+
+class ChatArchiveError(Exception):
+    """The archive of a chat could not be read, so it is left archived."""
+
+
+# Archived tables, parents first so they can be restored in this order.
+ARCHIVED_TABLES: list[Table] = [
+    SQLModel.metadata.tables[name]
+    for name in ["message", "message_tool_call", "message_reasoning", "message_body"]
+]
+
+_DUCKDB_TYPES: list[tuple[type[Any], str]] = [
+    (Uuid, "UUID"),
+    (DateTime, "TIMESTAMPTZ"),
+    (Boolean, "BOOLEAN"),
+    (Integer, "BIGINT"),
+    (LargeBinary, "BLOB"),
+]
+
+
+def _duckdb_type(column: Column[Any]) -> str:
+    for sa_type, duckdb_type in _DUCKDB_TYPES:
+        if isinstance(column.type, sa_type):
+            return duckdb_type
+    return "VARCHAR"
+
+
+def _chat_rows_queries(chat_uuid: Any) -> dict[str, Any]:
+    """Queries of the rows of each archived table that belong to the chat."""
+    message, tool_call, reasoning, body = ARCHIVED_TABLES
+    message_uuids = sa_select(col(Message.uuid)).where(
+        col(Message.chat_id) == chat_uuid
+    )
+    tool_call_uuids = sa_select(col(MessageToolCall.uuid)).where(
+        col(MessageToolCall.message_uuid).in_(message_uuids)
+    )
+    return {
+        message.name: sa_select(message).where(message.c.chat_id == chat_uuid),
+        tool_call.name: sa_select(tool_call).where(
+            tool_call.c.message_uuid.in_(message_uuids)
+        ),
+        reasoning.name: sa_select(reasoning).where(
+            reasoning.c.message_uuid.in_(message_uuids)
+        ),
+        body.name: sa_select(body).where(
+            or_(
+                body.c.owner_uuid.in_(message_uuids),
+                body.c.owner_uuid.in_(tool_call_uuids),
+            )
+        ),
+    }
+
+
+class ChatArchiver(PeriodicJob):
+    """
+    Background task archiving the chats idle for more than `idle_days`, which also
+    rehydrates archived chats on demand.
+    """
+
+    name = "chat_archiver"
+
+    def __init__(
+        self, db: DBCtx | DBShards, root: str, idle_days: int, interval: float
+    ):
+        super().__init__(interval)
+        self._db = db
+        self._root = root
+        self._idle_days = idle_days
+        self._persistent = all_env_variables_present()
+        # Archiving and rehydrating the same chat concurrently would lose messages.
+        # The chat is also claimed in the database, which the other instances of the
+        # app share.
+        self._lock = FileReadWriteLock(ARCHIVE_LOCK)
+
+    def _directory(self, chat: Chat) -> str:
+        return os.path.join(self._root, str(chat.user_uuid), str(chat.uuid))
+
+    def _path(self, chat: Chat, table: Table) -> str:
+        path = os.path.join(self._directory(chat), f"{table.name}.parquet")
+        if self._persistent:
+            path = f"{DRFileSystem.protocol}://{path}"
+        return path.replace("'", "''")
+
+    async def run_once(self) -> int:
+        archived = 0
+        async for _ in each_shard(self._db):
+            archived += await self.archive_idle_chats()
+        return archived
+
+    async def archive_idle_chats(self) -> int:
+        """Archive every chat idle for too long. Returns the number archived."""
+        if self._idle_days <= 0:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self._idle_days)
+        async with self._db.session() as sess:
+            response = await sess.exec(
+                select(Chat).where(
+                    not_deleted,
+                    col(Chat.archived_at).is_(None),
+                    col(Chat.message_count) > 0,
+                    last_activity_at < cutoff,
+                )
+            )
+            chats = response.all()
+
+        archived = 0
+        for chat in chats:
+            archived += await self.archive_chat(chat)
+        return archived
+
+    async def archive_chat(self, chat: Chat) -> bool:
+        """
+        Move the messages of the chat to Parquet files. Skipped, and False returned,
+        if the chat changed while the files were written.
+        """
+        async with self._lock.async_write_lock():
+            async with self._db.session() as sess:
+                version = (await sess.exec(chat_version_query(chat.uuid))).one()
+                rows = {
+                    name: (await sess.execute(query)).all()
+                    for name, query in _chat_rows_queries(chat.uuid).items()
+                }
+            await asyncio.to_thread(self._write, chat, rows)
+
+            async with self._db.session(writable=True) as session:
+                claimed = await session.exec(
+                    update(Chat)
+                    .where(
+                        col(Chat.uuid) == chat.uuid,
+                        not_deleted,
+                        col(Chat.archived_at).is_(None),
+                    )
+                    .values(archived_at=datetime.now(timezone.utc))
+                    .returning(col(Chat.uuid))
+                )
+                if not claimed.first():
+                    # Deleted, or archived by another instance, whose files these are.
+                    await session.rollback()
+                    if not await self._is_archived(chat):
+                        await asyncio.to_thread(self._remove, chat)
+                    return False
+                new_version = (await session.exec(chat_version_query(chat.uuid))).one()
+                if new_version != version:
+                    await session.rollback()
+                    await asyncio.to_thread(self._remove, chat)
+                    return False
+
+                await delete_messages(
+                    session, [row.uuid for row in rows[ARCHIVED_TABLES[0].name]]
+                )
+                await session.commit()
+            return True
+
+    async def rehydrate(self, chat: Chat) -> None:
+        """
+        Restore the messages of an archived chat into the database. Raises
+        ChatArchiveError, leaving the chat archived, if its archive cannot be read.
+        """
+        # In a task of its own, so it commits before removing the archive even when
+        # called within a unit of work.
+        await asyncio.create_task(self._rehydrate(chat))
+
+    async def _rehydrate(self, chat: Chat) -> None:
+        async with self._lock.async_write_lock():
+            if not await self._is_archived(chat):
+                # Already rehydrated by a concurrent request.
+                chat.archived_at = None
+                return
+            try:
+                rows = await asyncio.to_thread(self._read, chat)
+            except Exception as e:
+                if not await self._is_archived(chat):
+                    # Rehydrated by another instance, which removed the archive.
+                    chat.archived_at = None
+                    return
+                logger.exception(
+                    "Failed to read chat archive",
+                    extra={
+                        "chat": str(chat.uuid),
+                        "exists": await asyncio.to_thread(self._exists, chat),
+                    },
+                )
+                raise ChatArchiveError(f"Cannot read the archive of {chat.uuid}") from e
+
+            async with self._db.session(writable=True) as session:
+                claimed = await session.exec(
+                    update(Chat)
+                    .where(
+                        col(Chat.uuid) == chat.uuid, col(Chat.archived_at).is_not(None)
+                    )
+                    .values(archived_at=None)
+                    .returning(col(Chat.uuid))
+                )
+                # Unless rehydrated by another instance in the meantime.
+                restored = claimed.first() is not None
+                if restored:
+                    for table in ARCHIVED_TABLES:
+                        if rows[table.name]:
+                            await session.execute(insert(table), rows[table.name])
+                    await self._index(session, rows)
+                    await session.commit()
+            if restored:
+                await asyncio.to_thread(self._remove, chat)
+            chat.archived_at = None
+
+    async def _is_archived(self, chat: Chat) -> bool:
+        async with self._db.session() as sess:
+            response = await sess.exec(
+                select(Chat.uuid).where(
+                    Chat.uuid == chat.uuid, col(Chat.archived_at).is_not(None)
+                )
+            )
+            return response.first() is not None
+
+    async def remove_deleted_archives(self) -> int:
+        """Remove the archives of deleted chats, so the purger can remove the stubs."""
+        async with self._db.session(writable=True) as session:
+            response = await session.exec(
+                select(Chat).where(
+                    col(Chat.deleted_at).is_not(None),
+                    col(Chat.archived_at).is_not(None),
+                )
+            )
+            chats = response.all()
+            for chat in chats:
+                await asyncio.to_thread(self._remove, chat)
+            if chats:
+                await session.exec(
+                    update(Chat)
+                    .where(col(Chat.uuid).in_([chat.uuid for chat in chats]))
+                    .values(archived_at=None)
+                )
+                await session.commit()
+            return len(chats)
+
+    @staticmethod
+    async def _index(session: Any, rows: dict[str, list[dict[str, Any]]]) -> None:
+        """Add the finished rehydrated messages back to the search index."""
+        offloaded = {row["owner_uuid"]: row["data"] for row in rows["message_body"]}
+        for message in rows["message"]:
+            if message["in_progress"]:
+                continue
+            content = message["content"]
+            if message.get("content_length") is not None:
+                content = bodies.decompress(offloaded[message["uuid"]])
+            await search.index_message(session, message["uuid"], content)
+
+    def _write(self, chat: Chat, rows: dict[str, Sequence[Row[Any]]]) -> None:
+        if not self._persistent:
+            os.makedirs(self._directory(chat), exist_ok=True)
+        con = connect_dr_fs()
+        try:
+            for table in ARCHIVED_TABLES:
+                columns = ", ".join(f'"{c.name}" {_duckdb_type(c)}' for c in table.c)
+                con.execute(f'CREATE TABLE "{table.name}" ({columns})')
+                if rows[table.name]:
+                    placeholders = ", ".join("?" for _ in table.c)
+                    con.executemany(
+                        f'INSERT INTO "{table.name}" VALUES ({placeholders})',
+                        [tuple(row) for row in rows[table.name]],
+                    )
+                con.execute(
+                    f"COPY \"{table.name}\" TO '{self._path(chat, table)}' "
+                    "(FORMAT parquet, COMPRESSION zstd)"
+                )
+        finally:
+            con.close()
+
+    def _read(self, chat: Chat) -> dict[str, list[dict[str, Any]]]:
+        con = connect_dr_fs()
+        try:
+            rows = {}
+            for table in ARCHIVED_TABLES:
+                cursor = con.execute(
+                    f"SELECT * FROM read_parquet('{self._path(chat, table)}')"
+                )
+                names = [d[0] for d in cursor.description or []]
+                # Columns added since the chat was archived get their defaults.
+                rows[table.name] = [
+                    {k: v for k, v in zip(names, row) if k in table.c}
+                    for row in cursor.fetchall()
+                ]
+            return rows
+        finally:
+            con.close()
+
+    def _exists(self, chat: Chat) -> bool:
+        path = os.path.join(self._directory(chat), f"{ARCHIVED_TABLES[0].name}.parquet")
+        if self._persistent:
+            return bool(DRFileSystem().exists(path))
+        return os.path.exists(path)
+
+    def _remove(self, chat: Chat) -> None:
+        try:
+            if self._persistent:
+                DRFileSystem().rm(self._directory(chat), recursive=True)
+            else:
+                shutil.rmtree(self._directory(chat), ignore_errors=True)
+        except Exception:
+            logger.warning(
+                "Failed to remove chat archive", extra={"chat": str(chat.uuid)}
+            )
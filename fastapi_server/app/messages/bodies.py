@@ -0,0 +1,52 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Offloading of large message and tool result bodies.
+
+Finished contents above a threshold, such as tool results with ROC curves or
+prediction previews, are stored zstd-compressed in the `message_body` table. The
+message or tool call row keeps a truncated preview in `content` and the full length
+in `content_length`, so history reads stay small and the full body is only
+decompressed when a client asks for it.
+"""
+
+import uuid as uuidpkg
+
+import zstandard
+from sqlalchemy import Column, LargeBinary
+from sqlmodel import Field, SQLModel
+
+# Number of characters above which finished contents are offloaded.
+OFFLOAD_THRESHOLD = 16 * 1024
+# Number of characters of an offloaded content kept inline.
+PREVIEW_LENGTH = 2000
+COMPRESSION_LEVEL = 3
+
+
+class MessageBody(SQLModel, table=True):
+    """Compressed full content of a message or tool call."""
+
+    __tablename__ = "message_body"
+
+    # Uuid of the message or tool call the content belongs to.
+    owner_uuid: uuidpkg.UUID = Field(primary_key=True)
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+
+def compress(content: str) -> bytes:
+    return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(content.encode())
+
+
+def decompress(data: bytes) -> str:
+    return zstandard.ZstdDecompressor().decompress(data).decode()
@@ -0,0 +1,196 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Full-text search over message content.
+
+On SQLite messages are indexed in the `message_fts` FTS5 table, using the trigram
+tokenizer so substring search also works for languages without word separators such
+as Japanese. On Postgres they are indexed in a `search_vector` tsvector column of the
+message table with a GIN index. Neither is part of the SQLModel schema; both are
+created by migrations, and by the `after_create` hooks below for `create_all`.
+"""
+
+import html
+import uuid as uuidpkg
+from datetime import datetime
+from typing import Any, Sequence
+
+from sqlalchemy import DDL, DateTime, Uuid, bindparam, event, text
+from sqlalchemy.types import TypeEngine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+FTS_TABLE = "message_fts"
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+# Control characters delimiting the matches in the snippets returned by the database,
+# replaced by SNIPPET_START and SNIPPET_END once the content is escaped.
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+# The trigram tokenizer cannot match shorter queries through the index.
+MIN_QUERY_LENGTH = 3
+# Trigram tokens count as single characters in snippets, so use FTS5's maximum.
+SNIPPET_TOKENS = 64
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "content, message_uuid UNINDEXED, tokenize='trigram')",
+]
+POSTGRES_DDL = [
+    "ALTER TABLE message ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_message_search_vector "
+    "ON message USING GIN (search_vector)",
+]
+
+for _dialect, _statements in [("sqlite", SQLITE_DDL), ("postgresql", POSTGRES_DDL)]:
+    for _statement in _statements:
+        event.listen(
+            SQLModel.metadata,
+            "after_create",
+            DDL(_statement).execute_if(dialect=_dialect),  # type: ignore[no-untyped-call]
+        )
+
+
+class MessageSearchHit(SQLModel):
+    """A message matching a search query."""
+
+    thread_id: str | None
+    chat_name: str
+    message_uuid: uuidpkg.UUID
+    message_agui_id: str | None
+    role: str
+    created_at: datetime
+    # Matching excerpt of the content, escaped for HTML, with matches between `<mark>`
+    # and `</mark>`.
+    snippet: str
+
+
+def fts_rowid(message_uuid: uuidpkg.UUID) -> int:
+    """FTS5 needs integer rowids; derive a stable one from the message uuid."""
+    return message_uuid.int & (2**63 - 1)
+
+
+def _fts_phrase(query: str) -> str:
+    """Quote the query as a single FTS5 phrase, so user input is never syntax."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+async def index_message(
+    session: AsyncSession, message_uuid: uuidpkg.UUID, content: str
+) -> None:
+    """(Re)index the content of a message within the session's transaction."""
+    conn = await session.connection()
+    if conn.dialect.name == "sqlite":
+        rowid = fts_rowid(message_uuid)
+        await conn.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": rowid}
+        )
+        await conn.execute(
+            text(
+                f"INSERT INTO {FTS_TABLE} (rowid, content, message_uuid) "
+                "VALUES (:rowid, :content, :message_uuid)"
+            ),
+            {"rowid": rowid, "content": content, "message_uuid": message_uuid.hex},
+        )
+    elif conn.dialect.name == "postgresql":
+        await conn.execute(
+            text(
+                "UPDATE message SET search_vector = to_tsvector('simple', :content) "
+                "WHERE uuid = :message_uuid"
+            ).bindparams(bindparam("message_uuid", type_=Uuid())),
+            {"message_uuid": message_uuid, "content": content},
+        )
+
+
+async def unindex_messages(
+    session: AsyncSession, message_uuids: Sequence[uuidpkg.UUID]
+) -> None:
+    """Remove messages from the index. On Postgres it goes away with the rows."""
+    conn = await session.connection()
+    if conn.dialect.name == "sqlite" and message_uuids:
+        await conn.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :rowids").bindparams(
+                bindparam("rowids", expanding=True)
+            ),
+            {"rowids": [fts_rowid(uuid) for uuid in message_uuids]},
+        )
+
+
+_RESULT_COLUMNS: dict[str, TypeEngine[Any]] = {
+    "message_uuid": Uuid(),
+    "created_at": DateTime(timezone=True),
+}
+
+_SQLITE_SEARCH = f"""
+SELECT chat.thread_id, chat.name AS chat_name, message.uuid AS message_uuid,
+    message.agui_id AS message_agui_id, message.role, message.created_at,
+    snippet({FTS_TABLE}, 0, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet
+FROM {FTS_TABLE}
+JOIN message ON message.uuid = {FTS_TABLE}.message_uuid
+JOIN chat ON chat.uuid = message.chat_id
+WHERE {FTS_TABLE} MATCH :query AND chat."user" = :user_uuid
+    AND chat.deleted_at IS NULL
+ORDER BY {FTS_TABLE}.rank
+LIMIT :limit
+"""
+
+_POSTGRES_SEARCH = """
+SELECT chat.thread_id, chat.name AS chat_name, message.uuid AS message_uuid,
+    message.agui_id AS message_agui_id, message.role, message.created_at,
+    ts_headline('simple', message.content, query,
+        'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxFragments=1')
+        AS snippet
+FROM message
+JOIN chat ON chat.uuid = message.chat_id,
+    websearch_to_tsquery('simple', :query) AS query
+WHERE message.search_vector @@ query AND chat."user" = :user_uuid
+    AND chat.deleted_at IS NULL
+ORDER BY ts_rank(message.search_vector, query) DESC
+LIMIT :limit
+"""
+
+
+async def search_messages(
+    session: AsyncSession, user_uuid: uuidpkg.UUID, query: str, limit: int
+) -> list[MessageSearchHit]:
+    """Return the best matches for `query` among the messages of the user's chats."""
+    conn = await session.connection()
+    if conn.dialect.name == "sqlite":
+        statement, query = _SQLITE_SEARCH, _fts_phrase(query)
+    elif conn.dialect.name == "postgresql":
+        statement = _POSTGRES_SEARCH
+    else:
+        raise NotImplementedError(f"Search is not supported on {conn.dialect.name}")
+
+    response = await conn.execute(
+        text(statement)
+        .bindparams(bindparam("user_uuid", type_=Uuid()))
+        .columns(**_RESULT_COLUMNS),
+        {"query": query, "user_uuid": user_uuid, "limit": limit},
+    )
+    return [
+        MessageSearchHit.model_validate(
+            {**row._mapping, "snippet": _highlight(row.snippet)}
+        )
+        for row in response
+    ]
+
+
+def _highlight(snippet: str) -> str:
+    """Mark the matches in a snippet, once its content is escaped for HTML."""
+    return (
+        html.escape(snippet)
+        .replace(_MATCH_START, SNIPPET_START)
+        .replace(_MATCH_END, SNIPPET_END)
+    )
@@ -0,0 +1,41 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import base64
+import binascii
+import uuid as uuidpkg
+from datetime import datetime
+
+# Keyset position of a row: its sort timestamp and its uuid as a tie breaker.
+Cursor = tuple[datetime, uuidpkg.UUID]
+
+
+def encode_cursor(position: Cursor) -> str:
+    """Encode a keyset position as an opaque cursor."""
+    at, uuid = position
+    raw = f"{at.isoformat()}|{uuid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        at, uuid = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(at), uuidpkg.UUID(uuid)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
@@ -0,0 +1,115 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark `MessageRepository.get_last_messages` against the previous per-chat loop.
+
+Usage: uv run python -m benchmarks.get_last_messages [--messages-per-chat 20]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import desc
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel, col, select
+
+from app.chats import Chat
+from app.db import DBCtx, create_db_ctx
+from app.messages import Message, MessageRepository
+
+CHAT_COUNTS = [1, 100, 1000]
+
+
+async def per_chat_loop(db: DBCtx, chat_ids: list[uuid.UUID]) -> dict[uuid.UUID, Any]:
+    """The implementation replaced by the window function query."""
+    result = {}
+    async with db.session() as sess:
+        for chat_id in chat_ids:
+            response = await sess.exec(
+                select(Message)
+                .where(Message.chat_id == chat_id)
+                .order_by(desc(col(Message.created_at)))
+                .options(selectinload("*"))
+                .limit(1)
+            )
+            if message := response.first():
+                result[chat_id] = message
+    return result
+
+
+async def populate(db: DBCtx, chats: int, messages_per_chat: int) -> list[uuid.UUID]:
+    async with db.engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    chat_ids = []
+    async with db.session(writable=True) as sess:
+        for i in range(chats):
+            chat = Chat(thread_id=f"thread-{i}")
+            chat_ids.append(chat.uuid)
+            sess.add(chat)
+            sess.add_all(
+                Message(
+                    chat_id=chat.uuid,
+                    content=f"Message {j}",
+                    created_at=start + timedelta(seconds=j),
+                )
+                for j in range(messages_per_chat)
+            )
+        await sess.commit()
+    return chat_ids
+
+
+async def timed(
+    fn: Callable[[], Awaitable[dict[uuid.UUID, Any]]], repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages-per-chat", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await create_db_ctx(f"sqlite+aiosqlite:///{tmp}/benchmark.db")
+        all_chat_ids = await populate(db, max(CHAT_COUNTS), args.messages_per_chat)
+        repo = MessageRepository(db)
+
+        print(f"{'chats':>6} {'loop ms':>10} {'bulk ms':>10} {'projected ms':>13}")
+        for count in CHAT_COUNTS:
+            chat_ids = all_chat_ids[:count]
+            loop = await timed(lambda: per_chat_loop(db, chat_ids), args.repeat)
+            bulk = await timed(lambda: repo.get_last_messages(chat_ids), args.repeat)
+            projected = await timed(
+                lambda: repo.get_last_messages(chat_ids, columns=[Message.created_at]),
+                args.repeat,
+            )
+            print(f"{count:>6} {loop:>10.1f} {bulk:>10.1f} {projected:>13.1f}")
+        await db.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark concurrent streaming runs persisting their messages, with and without
+group commit.
+
+Usage: uv run python -m benchmarks.group_commit [--streams 100] [--chunks 20]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+from sqlmodel import SQLModel
+
+from app.chats import ChatCreate, ChatRepository
+from app.db import create_db_ctx
+from app.messages import MessageCreate, MessageRepository, MessageUpdate
+
+
+async def stream(
+    chat_repo: ChatRepository, message_repo: MessageRepository, i: int, chunks: int
+) -> None:
+    """Persist a streamed reply like AGUIAgentWithStorage does."""
+    chat = await chat_repo.create_chat(ChatCreate(thread_id=f"thread-{i}"))
+    message = await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, role="assistant", content="")
+    )
+    content = ""
+    for j in range(chunks):
+        content += f"chunk {j} of the churn model report. "
+        await message_repo.update_message(message.uuid, MessageUpdate(content=content))
+    await message_repo.update_message(message.uuid, MessageUpdate(in_progress=False))
+
+
+async def run(group_commit: bool, streams: int, chunks: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await create_db_ctx(
+            f"sqlite+aiosqlite:///{tmp}/benchmark.db", group_commit=group_commit
+        )
+        # Serialize write sessions as in persistence mode, SQLite would otherwise
+        # fail the concurrent ones with "database is locked".
+        db._lock = asyncio.Lock()
+        async with db.engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        chat_repo = ChatRepository(db)
+        message_repo = MessageRepository(db)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(stream(chat_repo, message_repo, i, chunks) for i in range(streams))
+        )
+        elapsed = time.perf_counter() - started
+        await db.shutdown()
+        return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=20)
+    args = parser.parse_args()
+
+    # Chat creation, message creation, chunks and the final update.
+    writes = args.streams * (args.chunks + 3)
+    print(f"{'group commit':>12} {'seconds':>8} {'writes/s':>9}")
+    for group_commit in [False, True]:
+        elapsed = await run(group_commit, args.streams, args.chunks)
+        print(f"{group_commit!s:>12} {elapsed:>8.2f} {writes / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark the Python-side cost per call of the hot-path lookups, built once with
+bound parameters, against the previous statements built on every call, with and
+without the compiled statement cache. The database is in memory and the session is
+reused, so the timings are mostly SQLAlchemy overhead.
+
+Usage: uv run python -m benchmarks.orm_overhead [--calls 2000] [--profile]
+"""
+
+import argparse
+import asyncio
+import cProfile
+import pstats
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.orm import raiseload
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.chats import _CHAT_BY_THREAD_ID, Chat, not_deleted
+from app.db import create_db_ctx
+from app.messages import (
+    _MESSAGE_BY_AGUI_ID,
+    _MESSAGE_BY_UUID,
+    _TOOL_CALL_BY_AGUI_ID,
+    Message,
+    MessageToolCall,
+    _message_options,
+)
+from app.users.user import User
+
+Lookup = Callable[[AsyncSession], Awaitable[Any]]
+
+
+def lookups(
+    user: User, chat: Chat, message: Message, tool_call: MessageToolCall
+) -> dict[str, tuple[Lookup, Lookup]]:
+    """The previous and the current statement of each lookup, by repository method."""
+
+    async def chat_previous(sess: AsyncSession) -> Any:
+        query = (
+            select(Chat)
+            .where(
+                Chat.user_uuid == user.uuid,
+                Chat.thread_id == chat.thread_id,
+                not_deleted,
+            )
+            .limit(1)
+        )
+        return (await sess.exec(query)).one_or_none()
+
+    async def chat_current(sess: AsyncSession) -> Any:
+        params = {"user_uuid": user.uuid, "thread_id": chat.thread_id}
+        return (await sess.exec(_CHAT_BY_THREAD_ID, params=params)).one_or_none()
+
+    async def message_previous(sess: AsyncSession) -> Any:
+        query = (
+            select(Message)
+            .where(Message.chat_id == chat.uuid, Message.agui_id == message.agui_id)
+            .options(*_message_options(False))
+            .limit(1)
+        )
+        return (await sess.exec(query)).one_or_none()
+
+    async def message_current(sess: AsyncSession) -> Any:
+        params = {"chat_id": chat.uuid, "agui_id": message.agui_id}
+        return (
+            await sess.exec(_MESSAGE_BY_AGUI_ID[False], params=params)
+        ).one_or_none()
+
+    async def tool_call_previous(sess: AsyncSession) -> Any:
+        query = (
+            select(MessageToolCall)
+            .where(
+                MessageToolCall.message_uuid == message.uuid,
+                MessageToolCall.agui_id == tool_call.agui_id,
+            )
+            .options(raiseload("*"))
+            .limit(1)
+        )
+        return (await sess.exec(query)).one_or_none()
+
+    async def tool_call_current(sess: AsyncSession) -> Any:
+        params = {"message_uuid": message.uuid, "agui_id": tool_call.agui_id}
+        return (await sess.exec(_TOOL_CALL_BY_AGUI_ID, params=params)).one_or_none()
+
+    async def update_previous(sess: AsyncSession) -> Any:
+        query = (
+            select(Message).where(Message.uuid == message.uuid).options(raiseload("*"))
+        )
+        return (await sess.exec(query)).first()
+
+    async def update_current(sess: AsyncSession) -> Any:
+        params = {"uuid": message.uuid}
+        return (await sess.exec(_MESSAGE_BY_UUID, params=params)).first()
+
+    return {
+        "get_chat_by_thread_id": (chat_previous, chat_current),
+        "get_message_by_agui_id": (message_previous, message_current),
+        "get_tool_call_by_agui_id": (tool_call_previous, tool_call_current),
+        "update_message lookup": (update_previous, update_current),
+    }
+
+
+async def timed(sess: AsyncSession, lookup: Lookup, calls: int) -> float:
+    """Microseconds per call."""
+    await lookup(sess)
+    started = time.perf_counter()
+    for _ in range(calls):
+        await lookup(sess)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def run(calls: int, profile: bool) -> None:
+    results: dict[str, list[float]] = {}
+    for cache_size in [0, 500]:
+        db = await create_db_ctx(
+            "sqlite+aiosqlite:///:memory:", compiled_cache_size=cache_size
+        )
+        async with db.engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        user = User(email="benchmark@example.com")
+        chat = Chat(thread_id="thread", user_uuid=user.uuid)
+        message = Message(chat_id=chat.uuid, agui_id=str(uuid.uuid4()))
+        tool_call = MessageToolCall(message_uuid=message.uuid, agui_id="call")
+        async with db.session(writable=True) as sess:
+            sess.add_all([user, chat, message, tool_call])
+            await sess.commit()
+
+        async with db.session() as sess:
+            for name, (previous, current) in lookups(
+                user, chat, message, tool_call
+            ).items():
+                results.setdefault(name, [])
+                results[name] += [
+                    await timed(sess, previous, calls),
+                    await timed(sess, current, calls),
+                ]
+            if profile and cache_size:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                for _, current in lookups(user, chat, message, tool_call).values():
+                    await timed(sess, current, calls)
+                profiler.disable()
+        await db.shutdown()
+
+    print(f"{'':<26} {'no cache':^21} {'cache':^21}")
+    print(
+        f"{'µs per call':<26}" + " {:>10} {:>10}".format("previous", "built once") * 2
+    )
+    for name, timings in results.items():
+        print(f"{name:<26}" + "".join(f" {t:>10.0f}" for t in timings))
+    if profile:
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(15)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the statements built once, with the cache",
+    )
+    args = parser.parse_args()
+    await run(args.calls, args.profile)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark a concurrent read/write mix on a SQLite database file, with default
+settings and with the SQLite profile of `app.db`.
+
+Usage: uv run python -m benchmarks.sqlite_profile [--clients 50] [--ops 20]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from sqlmodel import SQLModel
+
+from app.chats import Chat
+from app.db import DBCtx, create_db_ctx
+from app.messages import Message, MessageRepository, MessageUpdate
+
+CHATS = 50
+MESSAGES_PER_CHAT = 50
+WRITE_RATIO = 0.2
+
+
+async def populate(db: DBCtx) -> list[tuple[uuid.UUID, uuid.UUID]]:
+    """Create the chats, returning the uuids of each chat and its last message."""
+    async with db.engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    chats = []
+    async with db.session(writable=True) as sess:
+        for i in range(CHATS):
+            chat = Chat(thread_id=f"thread-{i}")
+            messages = [
+                Message(chat_id=chat.uuid, content=f"Message {j} " * 20)
+                for j in range(MESSAGES_PER_CHAT)
+            ]
+            sess.add(chat)
+            sess.add_all(messages)
+            chats.append((chat.uuid, messages[-1].uuid))
+        await sess.commit()
+    return chats
+
+
+async def client(
+    repo: MessageRepository,
+    chats: list[tuple[uuid.UUID, uuid.UUID]],
+    ops: int,
+    reads: list[float],
+    writes: list[float],
+) -> None:
+    rng = random.Random()
+    for _ in range(ops):
+        chat_id, message_id = rng.choice(chats)
+        started = time.perf_counter()
+        if rng.random() < WRITE_RATIO:
+            await repo.update_message(
+                message_id, MessageUpdate(content=f"Edited {rng.random()}")
+            )
+            writes.append(time.perf_counter() - started)
+        else:
+            await repo.get_chat_messages(chat_id)
+            reads.append(time.perf_counter() - started)
+
+
+async def run(sqlite_profile: bool, clients: int, ops: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await create_db_ctx(
+            f"sqlite+aiosqlite:///{tmp}/benchmark.db", sqlite_profile=sqlite_profile
+        )
+        if not sqlite_profile:
+            # Serialize write sessions as in persistence mode, SQLite would
+            # otherwise fail some of the concurrent ones with "database is locked".
+            db._lock = asyncio.Lock()
+        chats = await populate(db)
+        repo = MessageRepository(db)
+
+        reads: list[float] = []
+        writes: list[float] = []
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(client(repo, chats, ops, reads, writes) for _ in range(clients))
+        )
+        elapsed = time.perf_counter() - started
+        await db.shutdown()
+
+    print(
+        f"{'profile' if sqlite_profile else 'default':>8} {elapsed:>8.2f}"
+        f" {statistics.mean(reads) * 1000:>10.1f}"
+        f" {statistics.mean(writes) * 1000:>11.1f}"
+        f" {(len(reads) + len(writes)) / elapsed:>7.0f}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--ops", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'':>8} {'seconds':>8} {'read ms':>10} {'write ms':>11} {'ops/s':>7}")
+    for sqlite_profile in [False, True]:
+        await run(sqlite_profile, args.clients, args.ops)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark translating and serializing a long chat, as done by `GET /chat/{thread_id}`.
+
+Usage: uv run python -m benchmarks.translate_messages [--messages 10000] [--repeat 5]
+"""
+
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.ag_ui.translate import translate_messages
+from app.api.v1.chat import ChatWithUpdateTimeAndMessages
+from app.messages import Message, MessageReasoning, MessageToolCall, Role
+
+
+def synthetic_chat(size: int) -> list[Message]:
+    """
+    Build a chat alternating user and assistant messages, where every assistant
+    message has two tool calls and a reasoning.
+    """
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(size):
+        created_at = start + timedelta(seconds=i)
+        message = Message(
+            uuid=uuid.uuid4(),
+            role=Role.USER.value if i % 2 == 0 else Role.ASSISTANT.value,
+            content=f"Message {i} " * 20,
+            in_progress=False,
+            created_at=created_at,
+        )
+        if message.role == Role.ASSISTANT.value:
+            message.tool_calls = [
+                MessageToolCall(
+                    message_uuid=message.uuid,
+                    agui_id=f"call-{i}-{j}",
+                    tool_call_id=f"call-{i}-{j}",
+                    name="search",
+                    arguments='{"query": "automl"}',
+                    content="result " * 20,
+                    in_progress=False,
+                    created_at=created_at + timedelta(milliseconds=j),
+                )
+                for j in range(2)
+            ]
+            message.reasonings = [
+                MessageReasoning(
+                    message_uuid=message.uuid,
+                    content="Thinking " * 20,
+                    in_progress=False,
+                    created_at=created_at,
+                )
+            ]
+        messages.append(message)
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = synthetic_chat(args.messages)
+    translate_times, serialize_times = [], []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        translated = list(translate_messages(messages))
+        translated_at = time.perf_counter()
+        ChatWithUpdateTimeAndMessages(
+            thread_id="benchmark",
+            created_at=messages[0].created_at,
+            update_time=messages[-1].created_at,
+            messages=translated,
+        ).model_dump_json(by_alias=True)
+        translate_times.append(translated_at - started)
+        serialize_times.append(time.perf_counter() - translated_at)
+
+    print(f"{args.messages} messages, {len(translated)} AG-UI messages")
+    print(f"translate: best {min(translate_times) * 1000:.1f} ms")
+    print(f"serialize: best {min(serialize_times) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
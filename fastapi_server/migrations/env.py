@@ -15,28 +15,32 @@
 import asyncio
 from logging.config import fileConfig
 from pathlib import Path
-from typing import cast
+from typing import Any, cast
 
 from alembic import context
-from core.persistent_fs.dr_file_system import (
-    DRFileSystem,
-    all_env_variables_present,
-    calculate_checksum,
-)
-from sqlalchemy import pool
+from sqlalchemy import URL, make_url
 from sqlalchemy.engine import Connection
-from sqlalchemy.ext.asyncio import AsyncEngine, async_engine_from_config
 from sqlmodel import SQLModel
 
 from app.config import Config as ApplicationConfig
+from app.db import create_db_ctx
+from app.messages.search import FTS_TABLE
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
-# Interpret the config file for Python logging.
+# Given when the app migrates a database itself, such as a shard, on its connection.
+app_connection: Connection | None = config.attributes.get("connection")
+
+# Interpret the config file for Python logging, unless the app, which configured
+# logging itself, runs the migrations.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+if (
+    config.config_file_name is not None
+    and app_connection is None
+    and config.attributes.get("configure_logger", True)
+):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -59,8 +63,20 @@ SQLModel.metadata.naming_convention = convention
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
-# default class with application config
-app_config = ApplicationConfig()
+# default class with application config, not needed with a connection from the app
+app_config = ApplicationConfig() if app_connection is None else None
+
+# Full-text search objects created by app.messages.search outside of the models.
+SEARCH_OBJECTS = {"search_vector", "ix_message_search_vector"}
+
+
+def include_object(
+    obj: Any, name: str | None, type_: str, reflected: bool, compare_to: Any
+) -> bool:
+    """Keep autogenerate from dropping the full-text search objects."""
+    if reflected and compare_to is None and name:
+        return not (name.startswith(FTS_TABLE) or name in SEARCH_OBJECTS)
+    return True
 
 
 def run_migrations_offline() -> None:
@@ -76,8 +92,9 @@ def run_migrations_offline() -> None:
 
     """
     context.configure(
-        url=app_config.database_uri,
+        url=cast(ApplicationConfig, app_config).database_uri,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -87,62 +104,46 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
 
 
-def _get_persistence_fs(engine: AsyncEngine) -> DRFileSystem | None:
-    if not all_env_variables_present():
-        return None
-    if "sqlite" not in engine.url.drivername:
-        return None
-    if not engine.url.database or ":memory:" == engine.url.database:
-        return None
-    return DRFileSystem()
-
-
-def _prepare_folder(engine: AsyncEngine) -> None:
-    if "sqlite" not in engine.url.drivername:
+def _prepare_folder(url: URL) -> None:
+    if "sqlite" not in url.drivername:
         return
-    if not engine.url.database or ":memory:" == engine.url.database:
+    if not url.database or ":memory:" == url.database:
         return
 
-    Path(engine.url.database).parent.mkdir(parents=True, exist_ok=True)
+    Path(url.database).parent.mkdir(parents=True, exist_ok=True)
 
 
 async def run_async_migrations() -> None:
-    """In this scenario we need to create an Engine
-    and associate a connection with the context.
+    """Migrate on a write session of the application's database context.
 
-    """
+    It restores the database from persistent storage, from its replica when
+    replicated, holds the lock of the database file that the worker processes of
+    the app share, and syncs the migrated database back, as any write.
 
-    connectable = async_engine_from_config(
-        {"url": app_config.database_uri},
-        prefix="",
-        poolclass=pool.NullPool,
+    """
+    database_uri = cast(ApplicationConfig, app_config).database_uri
+    _prepare_folder(make_url(database_uri))  # create a folder for DB file
+    db = await create_db_ctx(
+        database_uri,
+        replication=cast(ApplicationConfig, app_config).database_replication,
     )
-
-    # getting DB file from persistent storage if applicable
-    fs = _get_persistence_fs(connectable)
-    _prepare_folder(connectable)  # create a folder for DB file
-    db_path = connectable.url.database
-    checksum: bytes | None = None
-
-    if fs and fs.exists(db_path):
-        fs.get(db_path, db_path)
-        checksum = calculate_checksum(cast(str, db_path))
-
-    async with connectable.connect() as connection:
-        await connection.run_sync(do_run_migrations)
-
-    await connectable.dispose()
-
-    if fs:
-        new_checksum = calculate_checksum(cast(str, db_path))
-        if new_checksum != checksum:
-            fs.put(db_path, db_path)
+    try:
+        async with db.session(writable=True) as session:
+            connection = await session.connection()
+            await connection.run_sync(do_run_migrations)
+            await session.commit()
+    finally:
+        await db.shutdown()
 
 
 def run_migrations_online() -> None:
@@ -153,5 +154,7 @@ def run_migrations_online() -> None:
 
 if context.is_offline_mode():
     run_migrations_offline()
+elif app_connection is not None:
+    do_run_migrations(app_connection)
 else:
     run_migrations_online()
@@ -0,0 +1,77 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""chat_message_version
+
+Revision ID: 9f3b6e2d8c14
+Revises: c1d7f4a9e2b6
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9f3b6e2d8c14"
+down_revision: Union[str, Sequence[str], None] = "c1d7f4a9e2b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("chat") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "message_version", sa.BigInteger(), nullable=False, server_default="0"
+            )
+        )
+
+    # Carry on from the highest version given so far in each chat.
+    op.execute(
+        """
+        UPDATE chat SET message_version = (
+            SELECT COALESCE(MAX(version), 0) FROM (
+                SELECT MAX(message.version) AS version
+                FROM message WHERE message.chat_id = chat.uuid
+                UNION ALL
+                SELECT MAX(message_tool_call.version)
+                FROM message_tool_call JOIN message
+                    ON message.uuid = message_tool_call.message_uuid
+                WHERE message.chat_id = chat.uuid
+                UNION ALL
+                SELECT MAX(message_reasoning.version)
+                FROM message_reasoning JOIN message
+                    ON message.uuid = message_reasoning.message_uuid
+                WHERE message.chat_id = chat.uuid
+            ) AS versions
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Recreating the table in batch mode would lose the expression index.
+    op.drop_index("ix_chat_user_last_activity", table_name="chat")
+    with op.batch_alter_table("chat") as batch_op:
+        batch_op.drop_column("message_version")
+    op.create_index(
+        "ix_chat_user_last_activity",
+        "chat",
+        ["user", sa.text("coalesce(last_message_at, created_at)"), "uuid"],
+        unique=False,
+    )
@@ -0,0 +1,131 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""message_body_offload
+
+Revision ID: a4c9e1f07b52
+Revises: f2a7c5e83d91
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import zstandard
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a4c9e1f07b52"
+down_revision: Union[str, Sequence[str], None] = "f2a7c5e83d91"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keep in sync with app.messages.bodies.
+OFFLOAD_THRESHOLD = 16 * 1024
+PREVIEW_LENGTH = 2000
+COMPRESSION_LEVEL = 3
+BACKFILL_BATCH_SIZE = 100
+
+message_body = sa.table(
+    "message_body", sa.column("owner_uuid", sa.Uuid()), sa.column("data")
+)
+
+
+def _offload(table_name: str) -> None:
+    """Move the large finished contents of a table to message_body."""
+    conn = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column("uuid", sa.Uuid()),
+        sa.column("content"),
+        sa.column("content_length"),
+        sa.column("in_progress"),
+    )
+    uuids = conn.scalars(
+        sa.select(table.c.uuid).where(
+            sa.not_(table.c.in_progress),
+            sa.func.length(table.c.content) > OFFLOAD_THRESHOLD,
+        )
+    ).all()
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    for start in range(0, len(uuids), BACKFILL_BATCH_SIZE):
+        rows = conn.execute(
+            sa.select(table.c.uuid, table.c.content).where(
+                table.c.uuid.in_(uuids[start : start + BACKFILL_BATCH_SIZE])
+            )
+        ).all()
+        conn.execute(
+            message_body.insert(),
+            [
+                {"owner_uuid": uuid, "data": compressor.compress(content.encode())}
+                for uuid, content in rows
+            ],
+        )
+        for uuid, content in rows:
+            conn.execute(
+                table.update()
+                .where(table.c.uuid == uuid)
+                .values(content=content[:PREVIEW_LENGTH], content_length=len(content))
+            )
+
+
+def _restore(table_name: str) -> None:
+    """Move the contents in message_body back into a table."""
+    conn = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column("uuid", sa.Uuid()),
+        sa.column("content"),
+        sa.column("content_length"),
+    )
+    decompressor = zstandard.ZstdDecompressor()
+    rows = conn.execute(
+        sa.select(message_body.c.owner_uuid, message_body.c.data).where(
+            message_body.c.owner_uuid.in_(
+                sa.select(table.c.uuid).where(table.c.content_length.is_not(None))
+            )
+        )
+    ).all()
+    for uuid, data in rows:
+        conn.execute(
+            table.update()
+            .where(table.c.uuid == uuid)
+            .values(content=decompressor.decompress(data).decode())
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "message_body",
+        sa.Column("owner_uuid", sa.Uuid(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("owner_uuid"),
+    )
+    for table_name in ["message", "message_tool_call"]:
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(
+                sa.Column("content_length", sa.Integer(), nullable=True)
+            )
+        _offload(table_name)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in ["message", "message_tool_call"]:
+        _restore(table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column("content_length")
+    op.drop_table("message_body")
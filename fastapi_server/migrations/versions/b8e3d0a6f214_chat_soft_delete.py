@@ -0,0 +1,56 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""chat_soft_delete
+
+Revision ID: b8e3d0a6f214
+Revises: a4c9e1f07b52
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e3d0a6f214"
+down_revision: Union[str, Sequence[str], None] = "a4c9e1f07b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("chat") as batch_op:
+        batch_op.add_column(
+            sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True)
+        )
+        batch_op.create_index(op.f("ix_chat_deleted_at"), ["deleted_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Recreating the table in batch mode would lose the expression index.
+    op.drop_index("ix_chat_user_last_activity", table_name="chat")
+    with op.batch_alter_table("chat") as batch_op:
+        batch_op.drop_index(op.f("ix_chat_deleted_at"))
+        batch_op.drop_column("deleted_at")
+    op.create_index(
+        "ix_chat_user_last_activity",
+        "chat",
+        ["user", sa.text("coalesce(last_message_at, created_at)"), "uuid"],
+        unique=False,
+    )
@@ -0,0 +1,61 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""message_versions
+
+Revision ID: c3d8f2a61e47
+Revises: b7c41e9d2a10
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3d8f2a61e47"
+down_revision: Union[str, Sequence[str], None] = "b7c41e9d2a10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["message", "message_tool_call", "message_reasoning"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(
+                sa.Column(
+                    "version", sa.BigInteger(), nullable=False, server_default="0"
+                )
+            )
+            batch_op.add_column(
+                sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True)
+            )
+            batch_op.create_index(
+                op.f(f"ix_{table}_version"), ["version"], unique=False
+            )
+        op.execute(f"UPDATE {table} SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(op.f(f"ix_{table}_version"))
+            batch_op.drop_column("updated_at")
+            batch_op.drop_column("version")
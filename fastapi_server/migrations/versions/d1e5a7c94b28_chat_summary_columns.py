@@ -0,0 +1,76 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""chat_summary_columns
+
+Revision ID: d1e5a7c94b28
+Revises: c3d8f2a61e47
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d1e5a7c94b28"
+down_revision: Union[str, Sequence[str], None] = "c3d8f2a61e47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keep in sync with app.messages.LAST_MESSAGE_PREVIEW_LENGTH.
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("chat") as batch_op:
+        batch_op.add_column(
+            sa.Column("last_message_at", sa.DateTime(timezone=True), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("message_count", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(
+            sa.Column("last_message_preview", sa.String(), nullable=True)
+        )
+
+    op.execute(
+        f"""
+        UPDATE chat SET
+            message_count = (
+                SELECT count(*) FROM message WHERE message.chat_id = chat.uuid
+            ),
+            last_message_at = (
+                SELECT max(created_at) FROM message WHERE message.chat_id = chat.uuid
+            ),
+            last_message_preview = (
+                SELECT substr(content, 1, {LAST_MESSAGE_PREVIEW_LENGTH})
+                FROM message
+                WHERE message.chat_id = chat.uuid
+                ORDER BY created_at DESC
+                LIMIT 1
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("chat") as batch_op:
+        batch_op.drop_column("last_message_preview")
+        batch_op.drop_column("message_count")
+        batch_op.drop_column("last_message_at")
@@ -0,0 +1,94 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""message_search_index
+
+Revision ID: f2a7c5e83d91
+Revises: e6b92d4f1c35
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+import uuid
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a7c5e83d91"
+down_revision: Union[str, Sequence[str], None] = "e6b92d4f1c35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Migrations must not depend on application code that may change later, so the
+# statements of app.messages.search are repeated here.
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5("
+    "content, message_uuid UNINDEXED, tokenize='trigram')"
+)
+POSTGRES_DDL = [
+    "ALTER TABLE message ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_message_search_vector "
+    "ON message USING GIN (search_vector)",
+]
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _backfill_sqlite() -> None:
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text("SELECT uuid, content FROM message WHERE NOT in_progress")
+    )
+    while batch := rows.fetchmany(BACKFILL_BATCH_SIZE):
+        conn.execute(
+            sa.text(
+                "INSERT INTO message_fts (rowid, content, message_uuid) "
+                "VALUES (:rowid, :content, :message_uuid)"
+            ),
+            [
+                {
+                    # Same as app.messages.search.fts_rowid.
+                    "rowid": uuid.UUID(message_uuid).int & (2**63 - 1),
+                    "content": content,
+                    "message_uuid": message_uuid,
+                }
+                for message_uuid, content in batch
+            ],
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute(SQLITE_DDL)
+        _backfill_sqlite()
+    elif dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+        op.execute(
+            "UPDATE message SET search_vector = to_tsvector('simple', content) "
+            "WHERE NOT in_progress"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS message_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_message_search_vector")
+        op.execute("ALTER TABLE message DROP COLUMN IF EXISTS search_vector")
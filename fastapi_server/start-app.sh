@@ -4,7 +4,12 @@
 export UV_CACHE_DIR=.uv
 
 
-uv run python alembic_migration.py  # migrating base to the last change
-
-uv run uvicorn app.main:app --host 0.0.0.0 --port 8080 --proxy-headers --timeout-keep-alive 300
+# The app migrates the database at startup, while it already answers /health. The
+# first worker process of the container migrates, one app instance at a time, see
+# app/deps.py.
+export DATABASE_MIGRATE_ON_STARTUP="${DATABASE_MIGRATE_ON_STARTUP:-true}"
+
+# The worker processes coordinate their database writes, see app/db.py.
+uv run uvicorn app.main:app --host 0.0.0.0 --port 8080 --proxy-headers --timeout-keep-alive 300 \
+    --workers "${UVICORN_WORKERS:-1}"
 
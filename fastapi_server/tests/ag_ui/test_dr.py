@@ -19,6 +19,7 @@ from unittest.mock import patch
 
 import pytest
 from ag_ui.core import (
+    AssistantMessage,
     BaseEvent,
     CustomEvent,
     Message,
@@ -29,7 +30,10 @@ from ag_ui.core import (
     TextMessageContentEvent,
     TextMessageEndEvent,
     TextMessageStartEvent,
-    ToolCallChunkEvent,
+    ToolCallArgsEvent,
+    ToolCallEndEvent,
+    ToolCallStartEvent,
+    UserMessage,
 )
 from openai.types.chat.chat_completion_chunk import (
     ChatCompletionChunk,
@@ -281,21 +285,23 @@ async def test_run_complex(
             TextMessageContentEvent(
                 message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc", delta="Hi"
             ),
-            ToolCallChunkEvent(
+            ToolCallStartEvent(
                 parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
                 tool_call_id="c1",
-                delta="a1",
                 tool_call_name="n1",
             ),
-            ToolCallChunkEvent(
-                parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
-                tool_call_id="c2",
-                delta=None,
-                tool_call_name=None,
-            ),
+            ToolCallArgsEvent(tool_call_id="c1", delta="a1"),
+            ToolCallEndEvent(tool_call_id="c1"),
             TextMessageContentEvent(
                 message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc", delta="Bye"
             ),
+            # Started once it ends, as its name never came.
+            ToolCallStartEvent(
+                parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
+                tool_call_id="c2",
+                tool_call_name="",
+            ),
+            ToolCallEndEvent(tool_call_id="c2"),
             TextMessageEndEvent(message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc"),
             RunFinishedEvent(thread_id="thread", run_id="run"),
         ]
@@ -333,24 +339,230 @@ async def test_run_complex_slow_stream(
             TextMessageContentEvent(
                 message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc", delta="Hi"
             ),
-            ToolCallChunkEvent(
+            ToolCallStartEvent(
                 parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
                 tool_call_id="c1",
-                delta="a1",
                 tool_call_name="n1",
             ),
-            ToolCallChunkEvent(
-                parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
-                tool_call_id="c2",
-                delta=None,
-                tool_call_name=None,
-            ),
+            ToolCallArgsEvent(tool_call_id="c1", delta="a1"),
+            ToolCallEndEvent(tool_call_id="c1"),
             CustomEvent(
                 name="Heartbeat", value={"thread_id": "thread", "run_id": "run"}
             ),
             TextMessageContentEvent(
                 message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc", delta="Bye"
             ),
+            # Started once it ends, as its name never came.
+            ToolCallStartEvent(
+                parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
+                tool_call_id="c2",
+                tool_call_name="",
+            ),
+            ToolCallEndEvent(tool_call_id="c2"),
             TextMessageEndEvent(message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc"),
             RunFinishedEvent(thread_id="thread", run_id="run"),
         ]
+
+
+async def test_run_parallel_tool_calls_coalesce_arguments(
+    set_completions: Callable[[list[ChatCompletionChunk]], None],
+    name: str,
+    config: Config,
+) -> None:
+    config.tool_call_args_flush_size = 4
+
+    def fragment(
+        index: int, arguments: str, id: str | None = None, name: str | None = None
+    ) -> ChoiceDeltaToolCall:
+        return ChoiceDeltaToolCall(
+            index=index,
+            id=id,
+            function=ChoiceDeltaToolCallFunction(arguments=arguments, name=name),
+        )
+
+    completions = chat_completions(
+        ("", [fragment(0, "", id="c1", name="n1"), fragment(1, "", "c2", "n2")]),
+        ("", [fragment(0, '{"a'), fragment(1, '{"b')]),
+        ("", [fragment(0, '":1'), fragment(1, '":2}')]),
+        ("", [fragment(0, "}")]),
+    )
+    completions[-1].choices[0].finish_reason = "tool_calls"
+    set_completions(completions)
+    with patch("uuid.uuid4") as uuid4:
+        uuid4.return_value = uuid.UUID("8825aa49-97ce-4fdf-9807-2ad9b4158acc")
+        result = await run(DataRobotAGUIAgent(name, config))
+    assert result == [
+        RunStartedEvent(thread_id="thread", run_id="run"),
+        ToolCallStartEvent(
+            parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
+            tool_call_id="c1",
+            tool_call_name="n1",
+        ),
+        ToolCallStartEvent(
+            parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
+            tool_call_id="c2",
+            tool_call_name="n2",
+        ),
+        ToolCallArgsEvent(tool_call_id="c1", delta='{"a":1'),
+        ToolCallArgsEvent(tool_call_id="c2", delta='{"b":2}'),
+        ToolCallArgsEvent(tool_call_id="c1", delta="}"),
+        ToolCallEndEvent(tool_call_id="c1"),
+        ToolCallEndEvent(tool_call_id="c2"),
+        RunFinishedEvent(thread_id="thread", run_id="run"),
+    ]
+
+
+async def test_run_tool_call_name_after_first_fragment(
+    set_completions: Callable[[list[ChatCompletionChunk]], None],
+    dr_agui_agent: DataRobotAGUIAgent,
+) -> None:
+    def fragment(
+        arguments: str, id: str | None = None, name: str | None = None
+    ) -> ChoiceDeltaToolCall:
+        return ChoiceDeltaToolCall(
+            index=0,
+            id=id,
+            function=ChoiceDeltaToolCallFunction(arguments=arguments, name=name),
+        )
+
+    set_completions(
+        chat_completions(
+            ("", [fragment("", id="c1")]),
+            ("", [fragment('{"a"', name="n1")]),
+            ("", [fragment(":1}")]),
+        )
+    )
+    with patch("uuid.uuid4") as uuid4:
+        uuid4.return_value = uuid.UUID("8825aa49-97ce-4fdf-9807-2ad9b4158acc")
+        result = await run(dr_agui_agent)
+    assert result == [
+        RunStartedEvent(thread_id="thread", run_id="run"),
+        ToolCallStartEvent(
+            parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
+            tool_call_id="c1",
+            tool_call_name="n1",
+        ),
+        ToolCallArgsEvent(tool_call_id="c1", delta='{"a":1}'),
+        ToolCallEndEvent(tool_call_id="c1"),
+        RunFinishedEvent(thread_id="thread", run_id="run"),
+    ]
+
+
+async def test_run_error_flushes_tool_call_arguments(
+    monkeypatch: pytest.MonkeyPatch, dr_agui_agent: DataRobotAGUIAgent
+) -> None:
+    async def failing_stream() -> AsyncIterator[ChatCompletionChunk]:
+        for chunk in chat_completions(
+            (
+                "",
+                [
+                    ChoiceDeltaToolCall(
+                        index=0,
+                        id="c1",
+                        function=ChoiceDeltaToolCallFunction(
+                            arguments='{"a"', name="n1"
+                        ),
+                    )
+                ],
+            )
+        ):
+            yield chunk
+        raise RuntimeError("Connection lost")
+
+    async def create(*args: Any, **kwargs: Any) -> AsyncIterator[ChatCompletionChunk]:
+        return failing_stream()
+
+    monkeypatch.setattr(
+        "openai.resources.chat.completions.AsyncCompletions.create", create
+    )
+    with patch("uuid.uuid4") as uuid4:
+        uuid4.return_value = uuid.UUID("8825aa49-97ce-4fdf-9807-2ad9b4158acc")
+        result = await run(dr_agui_agent)
+    assert result == [
+        RunStartedEvent(thread_id="thread", run_id="run"),
+        ToolCallStartEvent(
+            parent_message_id="8825aa49-97ce-4fdf-9807-2ad9b4158acc",
+            tool_call_id="c1",
+            tool_call_name="n1",
+        ),
+        ToolCallArgsEvent(tool_call_id="c1", delta='{"a"'),
+        ToolCallEndEvent(tool_call_id="c1"),
+        RunErrorEvent(message="Connection lost"),
+    ]
+
+
+async def test_run_embedded_tool_call_args_are_coalesced(
+    set_completions: Callable[[list[ChatCompletionChunk]], None],
+    dr_agui_agent: DataRobotAGUIAgent,
+) -> None:
+    events: list[BaseEvent] = [
+        ToolCallStartEvent(tool_call_id="c1", tool_call_name="n1"),
+        ToolCallArgsEvent(tool_call_id="c1", delta='{"a"'),
+        ToolCallArgsEvent(tool_call_id="c1", delta=":1}"),
+        ToolCallEndEvent(tool_call_id="c1"),
+    ]
+    set_completions(
+        [
+            ChatCompletionChunk(
+                id="",
+                model="",
+                created=0,
+                object="chat.completion.chunk",
+                choices=[],
+                event=event.model_dump(),
+            )
+            for event in events
+        ]
+    )
+    result = await run(dr_agui_agent)
+    assert result == [
+        RunStartedEvent(thread_id="thread", run_id="run"),
+        ToolCallStartEvent(tool_call_id="c1", tool_call_name="n1"),
+        ToolCallArgsEvent(tool_call_id="c1", delta='{"a":1}'),
+        ToolCallEndEvent(tool_call_id="c1"),
+        RunFinishedEvent(thread_id="thread", run_id="run"),
+    ]
+
+
+def test_prepare_chat_completions_input_full_history(
+    dr_agui_agent: DataRobotAGUIAgent,
+) -> None:
+    params = dr_agui_agent._prepare_chat_completions_input(
+        run_input(
+            UserMessage(id="m1", content="Hi"),
+            AssistantMessage(id="m2", content="Hello"),
+            UserMessage(id="m3", content="Bye"),
+        )
+    )
+    assert params["messages"] == [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello"},
+        {"role": "user", "content": "Bye"},
+    ]
+    assert params["extra_body"] == {}
+
+
+def test_prepare_chat_completions_input_message_delta(
+    name: str, config: Config
+) -> None:
+    config.agent_send_message_delta = True
+    agent = DataRobotAGUIAgent(name, config)
+
+    params = agent._prepare_chat_completions_input(
+        run_input(
+            UserMessage(id="m1", content="Hi"),
+            AssistantMessage(id="m2", content="Hello"),
+            UserMessage(id="m3", content="Bye"),
+            UserMessage(id="m4", content="Really"),
+        )
+    )
+    assert params["messages"] == [
+        {"role": "user", "content": "Bye"},
+        {"role": "user", "content": "Really"},
+    ]
+    assert params["extra_body"] == {"thread_id": "thread"}
+
+    params = agent._prepare_chat_completions_input(
+        run_input(UserMessage(id="m1", content="Hi"))
+    )
+    assert params["messages"] == [{"role": "user", "content": "Hi"}]
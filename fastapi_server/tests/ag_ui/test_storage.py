@@ -16,6 +16,7 @@ from typing import AsyncGenerator, NamedTuple
 
 import pytest
 from ag_ui.core import (
+    AssistantMessage,
     BaseEvent,
     Message,
     RunAgentInput,
@@ -47,7 +48,12 @@ from app.ag_ui.base import AGUIAgent
 from app.ag_ui.storage import AGUIAgentWithStorage
 from app.chats import ChatRepository
 from app.db import DBCtx
-from app.messages import MessageRepository, Role
+from app.messages import (
+    MessageCreate,
+    MessageRepository,
+    MessageToolCallCreate,
+    Role,
+)
 from app.users.user import User, UserCreate, UserRepository
 
 
@@ -88,12 +94,14 @@ async def user(user_repo: UserRepository) -> User:
 class StubAgent(AGUIAgent):
     def __init__(self, name: str):
         self._events: list[BaseEvent] = []
+        self.inputs: list[RunAgentInput] = []
         super().__init__(name)
 
     def set_events(self, *events: BaseEvent) -> None:
         self._events = list(events)
 
     async def run(self, input: RunAgentInput) -> AsyncGenerator[BaseEvent, None]:
+        self.inputs.append(input)
         for e in self._events:
             yield e
 
@@ -194,6 +202,57 @@ async def test_chat_name_from_empty_string_content(
     assert chat.name == "New Chat"
 
 
+async def test_offloaded_previews_are_expanded(
+    storage_agent: AGUIAgentWithStorage,
+    stub_agent: StubAgent,
+    chat_repo: ChatRepository,
+    message_repo: MessageRepository,
+) -> None:
+    stub_agent.set_events()
+    await run(storage_agent, "t-offload", UserMessage(id="m1", content="Hi"))
+    chat = await chat_repo.get_chat_by_thread_id(
+        user_uuid=storage_agent._user_id, thread_id="t-offload"
+    )
+    assert chat is not None
+
+    content = "lift chart " * 2000
+    message = await message_repo.create_message(
+        MessageCreate(
+            chat_id=chat.uuid,
+            agui_id="m2",
+            role=Role.ASSISTANT,
+            content=content,
+            in_progress=False,
+        )
+    )
+    await message_repo.create_message_tool_call(
+        MessageToolCallCreate(
+            message_uuid=message.uuid,
+            tool_call_id="tc1",
+            content=content,
+            in_progress=False,
+        )
+    )
+    assert message.content_length == len(content)
+
+    await run(
+        storage_agent,
+        "t-offload",
+        UserMessage(id="m1", content="Hi"),
+        AssistantMessage(id="m2", content=message.content),
+        UserMessage(id="m3", content="Thanks"),
+    )
+
+    assert [m.content for m in stub_agent.inputs[-1].messages] == [
+        "Hi",
+        content,
+        "Thanks",
+    ]
+    assert await message_repo.get_offloaded_contents(chat.uuid, ["tc1", "m1"]) == {
+        "tc1": content
+    }
+
+
 class TC(NamedTuple):
     agui_id: str
     name: str
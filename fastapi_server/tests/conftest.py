@@ -15,7 +15,7 @@
 import os
 from datetime import UTC, datetime, timedelta
 from typing import AsyncGenerator, Awaitable, Callable, Generator, TypeVar
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from datarobot.auth.datarobot.oauth import AsyncOAuth
@@ -28,10 +28,12 @@ from app import create_app
 from app.ag_ui.stream_manager import AGUIStreamManager
 from app.auth.api_key import APIKeyValidator, DRUser
 from app.chats import ChatRepository
+from app.chats.purger import ChatPurger
 from app.config import Config
 from app.db import DBCtx
 from app.deps import Deps, create_deps
 from app.messages import MessageRepository
+from app.messages.archive import ChatArchiver
 from app.users.identity import AuthSchema, Identity, IdentityCreate, IdentityRepository
 from app.users.tokens import Tokens
 from app.users.user import User, UserCreate, UserRepository
@@ -70,6 +72,8 @@ def deps(config: Config) -> Deps:
         api_key_validator=AsyncMock(spec=APIKeyValidator),
         db=AsyncMock(spec=DBCtx),
         stream_manager=AsyncMock(spec=AGUIStreamManager),
+        chat_purger=MagicMock(spec=ChatPurger),
+        chat_archiver=MagicMock(spec=ChatArchiver),
     )
 
 
@@ -11,8 +11,15 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
+import shutil
 import uuid as uuidpkg
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Any, AsyncGenerator
+from unittest.mock import patch
 
 import pytest
 from ag_ui.core import (
@@ -30,11 +37,27 @@ from datarobot.auth.users import User as AuthUser
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from httpx_sse import connect_sse
+from sqlalchemy import event
 
 from app import Deps, create_app
 from app.auth.ctx import AUTH_CTX_HEADER, get_auth_ctx
+from app.chats import ChatCreate
+from app.config import Config
+from app.db import use_shard
+from app.deps import create_deps
+from app.messages import (
+    LAST_MESSAGE_PREVIEW_LENGTH,
+    MessageCreate,
+    MessageToolCallCreate,
+    MessageToolCallUpdate,
+    MessageUpdate,
+    Role,
+)
+from app.messages.archive import ChatArchiver
+from app.messages.bodies import PREVIEW_LENGTH
 from app.users.user import User, UserCreate
-from tests.conftest import dep
+from tests.conftest import dep, migrate_tables_to_db
+from tests.integration.conftest import QueryCounter
 
 
 @pytest.fixture
@@ -172,3 +195,464 @@ async def test_chat_endpoint_includes_auth_header(
         "JWT metadata should contain DataRobot context"
     )
     assert decoded["metadata"]["dr_ctx"]["email"] == test_chat_user.email
+
+
+async def test_get_chat_returns_translated_messages(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    user_message = await db_deps.message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content="Hi", in_progress=False)
+    )
+    assistant_message = await db_deps.message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, agui_id="m2", role=Role.ASSISTANT.value)
+    )
+    await db_deps.message_repo.create_message_tool_call(
+        MessageToolCallCreate(
+            message_uuid=assistant_message.uuid,
+            agui_id="c1",
+            tool_call_id="c1",
+            name="tool",
+            arguments="{}",
+            content="result",
+        )
+    )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.get("/api/v1/chat/t1")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["thread_id"] == "t1"
+    assert body["messages"] == [
+        {
+            "id": str(user_message.uuid),
+            "role": "user",
+            "content": "Hi",
+            "name": "",
+            "inProgress": False,
+            "error": None,
+            "toolCalls": None,
+            "contentLength": None,
+        },
+        {
+            "id": "m2",
+            "role": "assistant",
+            "content": "",
+            "name": "",
+            "inProgress": True,
+            "error": None,
+            "toolCalls": [
+                {
+                    "id": "c1",
+                    "type": "function",
+                    "function": {"name": "tool", "arguments": "{}"},
+                }
+            ],
+            "contentLength": None,
+        },
+        {
+            "id": "c1",
+            "role": "tool",
+            "content": "result",
+            "name": "tool",
+            "inProgress": True,
+            "error": None,
+            "toolCalls": None,
+            "contentLength": None,
+        },
+    ]
+
+
+async def test_get_chat_checks_out_one_connection(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    await db_deps.message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content="Hi", in_progress=False)
+    )
+    checkouts = []
+    event.listen(
+        db_deps.db.read_engine.sync_engine,
+        "checkout",
+        lambda *args: checkouts.append(args),
+    )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.get("/api/v1/chat/t1", params={"limit": 10})
+
+    assert response.status_code == 200
+    # The user, the chat, its messages and its version share one session.
+    assert len(checkouts) == 1
+
+
+async def test_get_chat_returns_preview_of_large_tool_results(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    message = await db_deps.message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, agui_id="m1", role=Role.ASSISTANT.value)
+    )
+    roc_curve = json.dumps([{"fpr": i / 5000, "tpr": i / 5000} for i in range(5000)])
+    await db_deps.message_repo.create_message_tool_call(
+        MessageToolCallCreate(
+            message_uuid=message.uuid,
+            agui_id="c1",
+            tool_call_id="c1",
+            content=roc_curve,
+            in_progress=False,
+        )
+    )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.get("/api/v1/chat/t1")
+        content_response = client.get("/api/v1/chat/t1/messages/c1/content")
+        missing_response = client.get("/api/v1/chat/t1/messages/c2/content")
+
+    tool_result = response.json()["messages"][1]
+    assert tool_result["content"] == roc_curve[:PREVIEW_LENGTH]
+    assert tool_result["contentLength"] == len(roc_curve)
+    assert content_response.json() == {"id": "c1", "content": roc_curve}
+    assert missing_response.status_code == 404
+
+
+async def test_get_chat_messages_pages_through_history(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    # Two messages share a timestamp, so the keyset has to fall back to the uuid.
+    for i, created_at in enumerate([0, 1, 1, 2, 3]):
+        await db_deps.message_repo.create_message(
+            MessageCreate(
+                chat_id=chat.uuid,
+                agui_id=f"m{i}",
+                created_at=start + timedelta(seconds=created_at),
+            )
+        )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        latest = client.get("/api/v1/chat/t1", params={"limit": 2})
+        pages = [[m["id"] for m in latest.json()["messages"]]]
+        cursor = latest.headers.get("X-Next-Cursor")
+        while cursor:
+            page = client.get(
+                "/api/v1/chat/t1/messages", params={"limit": 2, "cursor": cursor}
+            )
+            pages.append([m["id"] for m in page.json()])
+            cursor = page.headers.get("X-Next-Cursor")
+
+        invalid = client.get("/api/v1/chat/t1/messages", params={"cursor": "nope"})
+
+    assert pages[0] == ["m3", "m4"]
+    assert len(pages) == 3
+    assert sorted(pages[1]) == ["m1", "m2"]
+    assert pages[2] == ["m0"]
+    assert invalid.status_code == 400
+
+
+async def test_get_chat_changes_returns_only_changed_messages(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    message_repo = db_deps.message_repo
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, agui_id="m1", in_progress=False)
+    )
+    assistant = await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, agui_id="m2", role=Role.ASSISTANT.value)
+    )
+    tool_call = await message_repo.create_message_tool_call(
+        MessageToolCallCreate(
+            message_uuid=assistant.uuid, agui_id="c1", tool_call_id="c1"
+        )
+    )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        version = client.get("/api/v1/chat/t1").json()["version"]
+        unchanged = client.get("/api/v1/chat/t1/changes", params={"since": version})
+
+        await message_repo.update_message_tool_call(
+            tool_call.uuid, MessageToolCallUpdate(content="result")
+        )
+        changed = client.get("/api/v1/chat/t1/changes", params={"since": version})
+
+    assert version == tool_call.version
+    assert unchanged.json() == {"messages": [], "version": version}
+    body = changed.json()
+    assert body["version"] > version
+    assert [m["id"] for m in body["messages"]] == ["m2", "c1"]
+    assert body["messages"][1]["content"] == "result"
+
+
+async def test_get_chats_uses_chat_summary(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    message_repo = db_deps.message_repo
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t2", user_uuid=test_chat_user.uuid)
+    )
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content="Hi", created_at=start)
+    )
+    last = await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, created_at=start + timedelta(seconds=2))
+    )
+    # An older message does not become the chat's last message.
+    await message_repo.create_message(
+        MessageCreate(
+            chat_id=chat.uuid, content="Late", created_at=start + timedelta(seconds=1)
+        )
+    )
+    await message_repo.update_message(last.uuid, MessageUpdate(content="x" * 500))
+
+    with (
+        patch.object(message_repo, "get_last_messages") as get_last_messages,
+        TestClient(authenticated_chat_webapp) as client,
+    ):
+        chats = {c["thread_id"]: c for c in client.get("/api/v1/chat").json()}
+
+    get_last_messages.assert_not_called()
+    assert chats["t1"]["message_count"] == 3
+    assert chats["t1"]["update_time"] == "2025-01-01T00:00:02"
+    assert chats["t1"]["last_message_preview"] == "x" * LAST_MESSAGE_PREVIEW_LENGTH
+    assert chats["t2"]["message_count"] == 0
+    assert chats["t2"]["last_message_preview"] is None
+    assert chats["t2"]["update_time"] == chats["t2"]["created_at"]
+
+
+async def test_get_chats_pages_by_last_activity(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    chats = [
+        await db_deps.chat_repo.create_chat(
+            ChatCreate(thread_id=f"t{i}", user_uuid=test_chat_user.uuid)
+        )
+        for i in range(5)
+    ]
+    # A message makes the oldest chat the most recently active one.
+    await db_deps.message_repo.create_message(
+        MessageCreate(
+            chat_id=chats[0].uuid,
+            created_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        )
+    )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        full = client.get("/api/v1/chat")
+        pages = []
+        params: dict[str, str | int] = {"limit": 2}
+        while True:
+            page = client.get("/api/v1/chat", params=params)
+            pages.append([c["thread_id"] for c in page.json()])
+            if "X-Next-Cursor" not in page.headers:
+                break
+            params["cursor"] = page.headers["X-Next-Cursor"]
+
+        invalid = client.get("/api/v1/chat", params={"cursor": "nope"})
+
+    assert "X-Next-Cursor" not in full.headers
+    assert [c["thread_id"] for c in full.json()] == ["t0", "t4", "t3", "t2", "t1"]
+    assert pages == [["t0", "t4"], ["t3", "t2"], ["t1"]]
+    assert invalid.status_code == 400
+
+
+async def test_get_chats_stays_within_query_budget(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+    query_budget: Callable[[int], AbstractContextManager[QueryCounter]],
+) -> None:
+    for count in [1, 10]:
+        while len(await db_deps.chat_repo.get_all_chats(test_chat_user)) < count:
+            await db_deps.chat_repo.create_chat(
+                ChatCreate(
+                    thread_id=str(uuidpkg.uuid4()), user_uuid=test_chat_user.uuid
+                )
+            )
+        # The user, then the chats, however many there are.
+        with query_budget(2), TestClient(authenticated_chat_webapp) as client:
+            response = client.get("/api/v1/chat")
+
+        assert len(response.json()) == count
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+        assert response.headers["Server-Timing"].endswith('desc="2 queries"')
+
+
+async def test_search_chats(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    message = await db_deps.message_repo.create_message(
+        MessageCreate(
+            chat_id=chat.uuid, content="Train a churn model", in_progress=False
+        )
+    )
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.get("/api/v1/chat/search", params={"q": "churn"})
+        too_short = client.get("/api/v1/chat/search", params={"q": "ch"})
+
+    assert response.status_code == 200
+    assert [(hit["message_uuid"], hit["thread_id"]) for hit in response.json()] == [
+        (str(message.uuid), "t1")
+    ]
+    assert response.json()[0]["snippet"] == "Train a <mark>churn</mark> model"
+    assert too_short.status_code == 422
+
+
+async def test_delete_chats_in_bulk(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+) -> None:
+    for thread_id in ["t1", "t2", "t3"]:
+        chat = await db_deps.chat_repo.create_chat(
+            ChatCreate(thread_id=thread_id, user_uuid=test_chat_user.uuid)
+        )
+        await db_deps.message_repo.create_message(MessageCreate(chat_id=chat.uuid))
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.request(
+            "DELETE", "/api/v1/chat", json={"thread_ids": ["t1", "t3", "t4"]}
+        )
+        remaining = client.get("/api/v1/chat")
+        deleted_chat = client.get("/api/v1/chat/t1")
+        empty_request = client.request(
+            "DELETE", "/api/v1/chat", json={"thread_ids": []}
+        )
+
+    assert response.status_code == 200
+    assert sorted(chat["thread_id"] for chat in response.json()) == ["t1", "t3"]
+    assert [chat["thread_id"] for chat in remaining.json()] == ["t2"]
+    assert deleted_chat.status_code == 404
+    assert empty_request.status_code == 422
+
+    assert await db_deps.chat_purger.purge() == 4
+    assert len(await db_deps.message_repo.get_last_messages([chat.uuid])) == 0
+
+
+async def test_get_archived_chat_rehydrates_it(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+    tmp_path: Path,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    await db_deps.message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content="Hello", in_progress=False)
+    )
+    db_deps.chat_archiver = ChatArchiver(
+        db_deps.db, str(tmp_path), idle_days=90, interval=60
+    )
+    assert await db_deps.chat_archiver.archive_chat(chat)
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.get("/api/v1/chat/t1")
+
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()["messages"]] == ["Hello"]
+    assert len(await db_deps.message_repo.get_chat_messages(chat.uuid)) == 1
+
+
+async def test_get_chat_with_unreadable_archive(
+    db_deps: Deps,
+    test_chat_user: User,
+    authenticated_chat_webapp: FastAPI,
+    tmp_path: Path,
+) -> None:
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=test_chat_user.uuid)
+    )
+    await db_deps.message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content="Hello", in_progress=False)
+    )
+    db_deps.chat_archiver = ChatArchiver(
+        db_deps.db, str(tmp_path), idle_days=90, interval=60
+    )
+    assert await db_deps.chat_archiver.archive_chat(chat)
+    shutil.rmtree(tmp_path / str(test_chat_user.uuid))
+
+    with TestClient(authenticated_chat_webapp) as client:
+        response = client.get("/api/v1/chat/t1")
+
+    assert response.status_code == 503
+    archived = await db_deps.chat_repo.get_chat(chat.uuid)
+    assert archived and archived.archived_at
+
+
+@pytest.fixture
+async def sharded_deps(config: Config, tmp_path: Path) -> AsyncGenerator[Deps, None]:
+    """Dependencies keeping the chats and messages of each user in their own database."""
+    config.database_shard_directory = str(tmp_path / "shards")
+    async with create_deps(config) as deps:
+        await migrate_tables_to_db(deps.db)
+        yield deps
+
+
+async def test_chats_are_kept_in_the_database_of_their_user(
+    sharded_deps: Deps, tmp_path: Path
+) -> None:
+    users = [
+        await sharded_deps.user_repo.create_user(
+            UserCreate(email=f"{name}@example.com", first_name=name, last_name="Doe")
+        )
+        for name in ["ann", "bob"]
+    ]
+    for user in users:
+        with use_shard(user.uuid):
+            chat = await sharded_deps.chat_repo.create_chat(
+                ChatCreate(thread_id=f"{user.first_name}-thread", user_uuid=user.uuid)
+            )
+            await sharded_deps.message_repo.create_message(
+                MessageCreate(chat_id=chat.uuid, content="Hi", in_progress=False)
+            )
+
+    webapp = create_app(config=sharded_deps.config, deps=sharded_deps)
+    webapp.dependency_overrides[get_auth_ctx] = dep(
+        AuthCtx(user=AuthUser(id=str(users[0].id), email=users[0].email), identities=[])
+    )
+    with TestClient(webapp) as client:
+        chats = client.get("/api/v1/chat").json()
+        chat = client.get("/api/v1/chat/ann-thread").json()
+        missing = client.get("/api/v1/chat/bob-thread")
+
+    assert [c["thread_id"] for c in chats] == ["ann-thread"]
+    assert [m["content"] for m in chat["messages"]] == ["Hi"]
+    assert missing.status_code == 404
+    shard_files = {path.name for path in (tmp_path / "shards").glob("*.sqlite")}
+    assert shard_files == {f"{user.uuid}.sqlite" for user in users}
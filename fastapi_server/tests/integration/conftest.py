@@ -11,10 +11,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any
+
 import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
 
 from app.config import Config
 from app.db import DBCtx, create_db_ctx
+from app.deps import Deps
 from app.users.user import User, UserCreate, UserRepository
 from tests.conftest import migrate_tables_to_db
 
@@ -44,3 +51,54 @@ async def db_ctx() -> DBCtx:
     db = await create_db_ctx(config.database_uri)
     await migrate_tables_to_db(db)
     return db
+
+
+class QueryCounter:
+    """Counts the SQL statements executed and the ORM rows loaded on a database."""
+
+    def __init__(self, db: DBCtx):
+        self._engines = {db.engine.sync_engine, db.read_engine.sync_engine}
+        self.statements = 0
+        self.rows = 0
+
+    def _count_statement(self, *args: Any) -> None:
+        self.statements += 1
+
+    def _count_row(self, *args: Any) -> None:
+        self.rows += 1
+
+    @contextmanager
+    def count(self) -> Generator["QueryCounter", None, None]:
+        self.statements = self.rows = 0
+        for engine in self._engines:
+            event.listen(engine, "after_cursor_execute", self._count_statement)
+        event.listen(Mapper, "load", self._count_row)
+        try:
+            yield self
+        finally:
+            for engine in self._engines:
+                event.remove(engine, "after_cursor_execute", self._count_statement)
+            event.remove(Mapper, "load", self._count_row)
+
+
+@pytest.fixture
+def query_budget(
+    db_deps: Deps,
+) -> Callable[[int], AbstractContextManager[QueryCounter]]:
+    """
+    Fail the test when the code run within `query_budget(n)`, such as an endpoint
+    call, executes more than n SQL statements.
+    """
+    counter = QueryCounter(db_deps.db)
+
+    @contextmanager
+    def budget(statements: int) -> Generator[QueryCounter, None, None]:
+        with counter.count():
+            yield counter
+        if counter.statements > statements:
+            pytest.fail(
+                f"{counter.statements} SQL statements executed, over the budget "
+                f"of {statements}"
+            )
+
+    return budget
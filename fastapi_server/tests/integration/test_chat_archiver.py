@@ -0,0 +1,227 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Sequence
+
+import pytest
+from sqlalchemy import Row, func, text, update
+from sqlmodel import col, select
+
+from app import Deps
+from app.chats import Chat, ChatCreate
+from app.chats.purger import ChatPurger
+from app.messages import (
+    Message,
+    MessageCreate,
+    MessageReasoningCreate,
+    MessageToolCallCreate,
+)
+from app.messages.archive import ChatArchiveError, ChatArchiver
+from app.messages.bodies import OFFLOAD_THRESHOLD, MessageBody
+from app.messages.search import FTS_TABLE
+from app.users.user import UserCreate
+
+
+async def _create_chats(db_deps: Deps) -> list[Chat]:
+    user = await db_deps.user_repo.create_user(
+        UserCreate(email="archive@example.com", first_name="Al", last_name="Bo")
+    )
+    chats = []
+    for thread_id in ["old", "recent"]:
+        chat = await db_deps.chat_repo.create_chat(
+            ChatCreate(thread_id=thread_id, user_uuid=user.uuid)
+        )
+        await db_deps.message_repo.create_message(
+            MessageCreate(
+                chat_id=chat.uuid,
+                agui_id=f"{thread_id}-q",
+                content="x" * (OFFLOAD_THRESHOLD + 1) + " churn",
+                in_progress=False,
+            )
+        )
+        message = await db_deps.message_repo.create_message(
+            MessageCreate(
+                chat_id=chat.uuid,
+                agui_id=f"{thread_id}-a",
+                role="assistant",
+                content="The churn model is ready",
+                in_progress=False,
+            )
+        )
+        await db_deps.message_repo.create_message_tool_call(
+            MessageToolCallCreate(
+                message_uuid=message.uuid,
+                name="train",
+                content="y" * (OFFLOAD_THRESHOLD + 1),
+                in_progress=False,
+            )
+        )
+        await db_deps.message_repo.create_message_reasoning(
+            MessageReasoningCreate(message_uuid=message.uuid, content="thinking")
+        )
+        chats.append(chat)
+
+    async with db_deps.db.session(writable=True) as session:
+        await session.exec(
+            update(Chat)
+            .where(col(Chat.uuid) == chats[0].uuid)
+            .values(last_message_at=datetime.now(timezone.utc) - timedelta(days=100))
+        )
+        await session.commit()
+    return chats
+
+
+async def _count(db_deps: Deps, table: Any) -> int:
+    async with db_deps.db.session() as sess:
+        return (await sess.exec(select(func.count()).select_from(table))).one()
+
+
+async def test_archive_and_rehydrate(db_deps: Deps, tmp_path: Path) -> None:
+    old, recent = await _create_chats(db_deps)
+    assert old.user_uuid
+    before = await db_deps.message_repo.get_chat_messages(old.uuid)
+    archiver = ChatArchiver(db_deps.db, str(tmp_path), idle_days=90, interval=60)
+
+    assert await archiver.archive_idle_chats() == 1
+    assert await archiver.archive_idle_chats() == 0
+
+    directory = tmp_path / str(old.user_uuid) / str(old.uuid)
+    assert sorted(os.listdir(directory)) == [
+        "message.parquet",
+        "message_body.parquet",
+        "message_reasoning.parquet",
+        "message_tool_call.parquet",
+    ]
+    assert not await db_deps.message_repo.get_chat_messages(old.uuid)
+    assert await _count(db_deps, Message) == 2
+    assert await _count(db_deps, MessageBody) == 2
+    assert await _count(db_deps, text(FTS_TABLE)) == 2
+    # Archived chats are still listed.
+    chat = await db_deps.chat_repo.get_chat_by_thread_id(old.user_uuid, "old")
+    assert chat and chat.archived_at
+
+    await archiver.rehydrate(chat)
+
+    assert chat.archived_at is None
+    assert not directory.exists()
+    after = await db_deps.message_repo.get_chat_messages(old.uuid)
+    assert [m.model_dump() for m in after] == [m.model_dump() for m in before]
+    assert [[tc.model_dump() for tc in m.tool_calls] for m in after] == [
+        [tc.model_dump() for tc in m.tool_calls] for m in before
+    ]
+    assert [[r.model_dump() for r in m.reasonings] for m in after] == [
+        [r.model_dump() for r in m.reasonings] for m in before
+    ]
+    assert await db_deps.message_repo.get_full_content(old.uuid, "old-q") == (
+        "x" * (OFFLOAD_THRESHOLD + 1) + " churn"
+    )
+    hits = await db_deps.message_repo.search_messages(old.user_uuid, "churn", 10)
+    assert sorted(hit.message_agui_id or "" for hit in hits) == [
+        "old-a",
+        "old-q",
+        "recent-a",
+        "recent-q",
+    ]
+
+
+async def test_archive_is_skipped_when_chat_changes(
+    db_deps: Deps, tmp_path: Path
+) -> None:
+    old, _ = await _create_chats(db_deps)
+    archiver = ChatArchiver(db_deps.db, str(tmp_path), idle_days=90, interval=60)
+    loop = asyncio.get_running_loop()
+    write = archiver._write
+
+    def write_during_reply(chat: Chat, rows: dict[str, Sequence[Row[Any]]]) -> None:
+        write(chat, rows)
+        # A message is added to the chat while its files are written.
+        asyncio.run_coroutine_threadsafe(
+            db_deps.message_repo.create_message(
+                MessageCreate(chat_id=old.uuid, content="late", in_progress=False)
+            ),
+            loop,
+        ).result()
+
+    archiver._write = write_during_reply  # type: ignore[method-assign]
+
+    assert await archiver.archive_idle_chats() == 0
+
+    assert not (tmp_path / str(old.user_uuid) / str(old.uuid)).exists()
+    assert len(await db_deps.message_repo.get_chat_messages(old.uuid)) == 3
+    chat = await db_deps.chat_repo.get_chat(old.uuid)
+    assert chat and chat.archived_at is None
+
+
+async def test_rehydrate_without_archive(db_deps: Deps, tmp_path: Path) -> None:
+    old, _ = await _create_chats(db_deps)
+    assert old.user_uuid
+    archiver = ChatArchiver(db_deps.db, str(tmp_path), idle_days=90, interval=60)
+    assert await archiver.archive_idle_chats() == 1
+    shutil.rmtree(tmp_path / str(old.user_uuid))
+
+    chat = await db_deps.chat_repo.get_chat_by_thread_id(old.user_uuid, "old")
+    assert chat and chat.archived_at
+    with pytest.raises(ChatArchiveError):
+        await archiver.rehydrate(chat)
+
+    # Left archived, so the messages are not lost for good.
+    assert chat.archived_at
+    chat = await db_deps.chat_repo.get_chat(old.uuid)
+    assert chat and chat.archived_at
+
+
+async def test_concurrent_rehydrates(db_deps: Deps, tmp_path: Path) -> None:
+    old, _ = await _create_chats(db_deps)
+    assert old.user_uuid
+    before = await db_deps.message_repo.get_chat_messages(old.uuid)
+    # Archivers of different app instances.
+    archivers = [
+        ChatArchiver(db_deps.db, str(tmp_path), idle_days=90, interval=60)
+        for _ in range(2)
+    ]
+    assert await archivers[0].archive_idle_chats() == 1
+    chats = [
+        await db_deps.chat_repo.get_chat_by_thread_id(old.user_uuid, "old")
+        for _ in archivers
+    ]
+
+    await asyncio.gather(
+        *(archiver.rehydrate(chat) for archiver, chat in zip(archivers, chats) if chat)
+    )
+
+    assert all(chat and chat.archived_at is None for chat in chats)
+    after = await db_deps.message_repo.get_chat_messages(old.uuid)
+    assert [m.uuid for m in after] == [m.uuid for m in before]
+
+
+async def test_purger_removes_archives_of_deleted_chats(
+    db_deps: Deps, tmp_path: Path
+) -> None:
+    old, _ = await _create_chats(db_deps)
+    archiver = ChatArchiver(db_deps.db, str(tmp_path), idle_days=90, interval=60)
+    assert await archiver.archive_idle_chats() == 1
+    await db_deps.chat_repo.delete_chat(old.uuid)
+
+    purger = ChatPurger(
+        db_deps.message_repo, batch_size=10, interval=60, archiver=archiver
+    )
+    # Only the stub chat is left to purge.
+    assert await purger.purge() == 1
+
+    assert not (tmp_path / str(old.user_uuid) / str(old.uuid)).exists()
+    assert await _count(db_deps, Chat) == 1
@@ -0,0 +1,90 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from typing import Any
+
+from sqlalchemy import func, text
+from sqlmodel import select
+
+from app import Deps
+from app.chats import Chat, ChatCreate
+from app.chats.purger import ChatPurger
+from app.messages import (
+    Message,
+    MessageCreate,
+    MessageReasoning,
+    MessageReasoningCreate,
+    MessageToolCall,
+    MessageToolCallCreate,
+)
+from app.messages.bodies import OFFLOAD_THRESHOLD, MessageBody
+from app.messages.search import FTS_TABLE
+from app.users.user import UserCreate
+
+
+async def _count(db_deps: Deps, table: Any) -> int:
+    async with db_deps.db.session() as sess:
+        return (await sess.exec(select(func.count()).select_from(table))).one()
+
+
+async def test_deleted_chats_are_hidden_then_purged(db_deps: Deps) -> None:
+    user = await db_deps.user_repo.create_user(
+        UserCreate(email="purge@example.com", first_name="Al", last_name="Bo")
+    )
+    chats = [
+        await db_deps.chat_repo.create_chat(
+            ChatCreate(thread_id=thread_id, user_uuid=user.uuid)
+        )
+        for thread_id in ["t1", "t2"]
+    ]
+    for chat in chats:
+        for i in range(3):
+            message = await db_deps.message_repo.create_message(
+                MessageCreate(
+                    chat_id=chat.uuid, content=f"churn model {i}", in_progress=False
+                )
+            )
+        await db_deps.message_repo.create_message_tool_call(
+            MessageToolCallCreate(
+                message_uuid=message.uuid,
+                content="x" * (OFFLOAD_THRESHOLD + 1),
+                in_progress=False,
+            )
+        )
+        await db_deps.message_repo.create_message_reasoning(
+            MessageReasoningCreate(message_uuid=message.uuid)
+        )
+
+    deleted = await db_deps.chat_repo.delete_chats(user.uuid, ["t1", "missing"])
+    assert [chat.thread_id for chat in deleted] == ["t1"]
+
+    assert [chat.uuid for chat in await db_deps.chat_repo.get_all_chats(user)] == [
+        chats[1].uuid
+    ]
+    assert await db_deps.chat_repo.get_chat_by_thread_id(user.uuid, "t1") is None
+    hits = await db_deps.message_repo.search_messages(user.uuid, "churn", 10)
+    assert {hit.thread_id for hit in hits} == {"t2"}
+    # The thread id is released right away.
+    await db_deps.chat_repo.create_chat(ChatCreate(thread_id="t1", user_uuid=user.uuid))
+
+    purger = ChatPurger(db_deps.message_repo, batch_size=2, interval=60)
+    # 3 messages in 2 batches, then the chat.
+    assert await purger.purge() == 4
+    assert await purger.purge() == 0
+
+    assert await _count(db_deps, Chat) == 2
+    assert await _count(db_deps, Message) == 3
+    assert await _count(db_deps, MessageToolCall) == 1
+    assert await _count(db_deps, MessageReasoning) == 1
+    assert await _count(db_deps, MessageBody) == 1
+    assert await _count(db_deps, text(FTS_TABLE)) == 3
@@ -0,0 +1,451 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import uuid as uuidpkg
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import Deps
+from app.chats import ChatCreate
+from app.messages import (
+    Message,
+    MessageCreate,
+    MessageReasoningCreate,
+    MessageReasoningUpdate,
+    MessageToolCallCreate,
+    MessageToolCallUpdate,
+    MessageUpdate,
+    search,
+)
+from app.messages.bodies import OFFLOAD_THRESHOLD, PREVIEW_LENGTH
+from app.users.user import UserCreate
+from tests.integration.conftest import QueryCounter
+
+
+async def test_get_last_messages(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    chats = [
+        await db_deps.chat_repo.create_chat(ChatCreate(thread_id=f"t{i}"))
+        for i in range(3)
+    ]
+    for i, chat in enumerate(chats[:2]):
+        for j in range(3):
+            message = await message_repo.create_message(
+                MessageCreate(
+                    chat_id=chat.uuid,
+                    agui_id=f"m{i}{j}",
+                    created_at=start + timedelta(seconds=j),
+                )
+            )
+    await message_repo.create_message_tool_call(
+        MessageToolCallCreate(message_uuid=message.uuid, agui_id="c1")
+    )
+
+    with patch("app.messages._IN_CLAUSE_CHUNK_SIZE", 1):
+        last_messages = await message_repo.get_last_messages(
+            [chat.uuid for chat in chats] + [uuidpkg.uuid4()]
+        )
+
+    assert {k: m.agui_id for k, m in last_messages.items()} == {
+        chats[0].uuid: "m02",
+        chats[1].uuid: "m12",
+    }
+    assert [tc.agui_id for tc in last_messages[chats[1].uuid].tool_calls] == ["c1"]
+    assert await message_repo.get_last_messages([]) == {}
+
+
+async def test_get_last_messages_projection(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    chat = await db_deps.chat_repo.create_chat(ChatCreate(thread_id="t1"))
+    await message_repo.create_message(MessageCreate(chat_id=chat.uuid, agui_id="m1"))
+
+    last_messages = await message_repo.get_last_messages(
+        [chat.uuid], columns=[Message.agui_id, Message.created_at]
+    )
+
+    assert last_messages[chat.uuid].agui_id == "m1"
+    with pytest.raises(InvalidRequestError):
+        last_messages[chat.uuid].tool_calls
+
+
+async def test_lightweight_reads(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    chat = await db_deps.chat_repo.create_chat(ChatCreate(thread_id="t1"))
+    message = await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, agui_id="m1")
+    )
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i, in_progress in enumerate([True, True, False]):
+        await message_repo.create_message_reasoning(
+            MessageReasoningCreate(
+                message_uuid=message.uuid,
+                name=f"r{i}",
+                in_progress=in_progress,
+                created_at=start + timedelta(seconds=i),
+            )
+        )
+
+    reasoning = await message_repo.get_in_progress_reasoning(message.uuid)
+    assert reasoning and reasoning.name == "r1"
+    assert await message_repo.get_in_progress_reasoning(uuidpkg.uuid4()) is None
+
+    assert await message_repo.get_existing_agui_ids(chat.uuid, ["m1", "m2"]) == {"m1"}
+
+    loaded = await message_repo.get_message(message.uuid, with_children=False)
+    assert loaded and loaded.agui_id == "m1"
+    with pytest.raises(InvalidRequestError):
+        loaded.reasonings
+
+
+async def test_large_contents_are_offloaded(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    user = await db_deps.user_repo.create_user(
+        UserCreate(email="body@example.com", first_name="Al", last_name="Bo")
+    )
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=user.uuid)
+    )
+    feature_impact = "feature,impact\n" + "".join(
+        f"feature_{i},{1 / (i + 1):.6f}\n" for i in range(2000)
+    )
+    assert len(feature_impact) > OFFLOAD_THRESHOLD
+
+    message = await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content=feature_impact, in_progress=False)
+    )
+    assert message.content == feature_impact[:PREVIEW_LENGTH]
+    assert message.content_length == len(feature_impact)
+    assert await message_repo.get_body(message.uuid) == feature_impact
+    assert (
+        await message_repo.get_full_content(chat.uuid, str(message.uuid))
+        == feature_impact
+    )
+    # The whole content is searchable, not only the preview.
+    assert await message_repo.search_messages(user.uuid, "feature_1999", 10)
+
+    # Rewriting a small content drops the offloaded body.
+    updated = await message_repo.update_message(
+        message.uuid, MessageUpdate(content="short")
+    )
+    assert updated and updated.content == "short"
+    assert updated.content_length is None
+    assert await message_repo.get_body(message.uuid) is None
+
+    # Tool results are offloaded once finished, not while streaming.
+    tool_call = await message_repo.create_message_tool_call(
+        MessageToolCallCreate(
+            message_uuid=message.uuid, tool_call_id="c1", content=feature_impact
+        )
+    )
+    assert tool_call.content_length is None
+    finished = await message_repo.update_message_tool_call(
+        tool_call.uuid, MessageToolCallUpdate(in_progress=False)
+    )
+    assert finished and finished.content_length == len(feature_impact)
+    assert await message_repo.get_full_content(chat.uuid, "c1") == feature_impact
+    assert await message_repo.get_full_content(chat.uuid, "c2") is None
+
+
+async def test_search_messages_indexes_finished_messages(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    user = await db_deps.user_repo.create_user(
+        UserCreate(email="search@example.com", first_name="Al", last_name="Bo")
+    )
+    other = await db_deps.user_repo.create_user(
+        UserCreate(email="other@example.com", first_name="Al", last_name="Bo")
+    )
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", name="Churn", user_uuid=user.uuid)
+    )
+    other_chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t2", user_uuid=other.uuid)
+    )
+    finished = await message_repo.create_message(
+        MessageCreate(
+            chat_id=chat.uuid,
+            agui_id="m1",
+            content="AutoMLのプロジェクトを作成しました",
+            in_progress=False,
+        )
+    )
+    streaming = await message_repo.create_message(
+        MessageCreate(chat_id=chat.uuid, content="プロジェクトの", in_progress=True)
+    )
+    await message_repo.create_message(
+        MessageCreate(
+            chat_id=other_chat.uuid, content="別のプロジェクト", in_progress=False
+        )
+    )
+
+    hits = await message_repo.search_messages(user.uuid, "プロジェクト", limit=10)
+    assert [hit.message_uuid for hit in hits] == [finished.uuid]
+    assert hits[0].thread_id == "t1"
+    assert hits[0].chat_name == "Churn"
+    assert hits[0].message_agui_id == "m1"
+    assert "<mark>プロジェクト</mark>" in hits[0].snippet
+
+    # Messages are indexed once they leave in_progress, with their final content.
+    await message_repo.update_message(
+        streaming.uuid,
+        MessageUpdate(content="プロジェクトの分析が完了", in_progress=False),
+    )
+    hits = await message_repo.search_messages(user.uuid, "分析が完了", limit=10)
+    assert [hit.message_uuid for hit in hits] == [streaming.uuid]
+
+    # Only the marks of the matches are left as HTML.
+    await message_repo.create_message(
+        MessageCreate(
+            chat_id=chat.uuid,
+            content='<img src=x onerror="alert(1)"> マーク',
+            in_progress=False,
+        )
+    )
+    hits = await message_repo.search_messages(user.uuid, "マーク", limit=10)
+    assert hits[0].snippet == (
+        "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>マーク</mark>"
+    )
+
+    # Query syntax in user input is searched for literally.
+    assert await message_repo.search_messages(user.uuid, 'AND "OR', limit=10) == []
+
+
+async def test_messages_created_finished_are_indexed(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    user = await db_deps.user_repo.create_user(
+        UserCreate(email="index@example.com", first_name="Al", last_name="Bo")
+    )
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=user.uuid)
+    )
+    indexed = []
+    index_message = search.index_message
+
+    async def index_existing_message(
+        session: AsyncSession, message_uuid: uuidpkg.UUID, content: str
+    ) -> None:
+        # The Postgres index is an update of the message row, which must exist.
+        query = select(Message.uuid).where(Message.uuid == message_uuid)
+        indexed.append((await session.exec(query)).first())
+        await index_message(session, message_uuid, content)
+
+    with patch("app.messages.search.index_message", index_existing_message):
+        message = await message_repo.create_message(
+            MessageCreate(
+                chat_id=chat.uuid,
+                content="x" * OFFLOAD_THRESHOLD + " lift chart ready",
+                in_progress=False,
+            )
+        )
+
+    assert indexed == [message.uuid]
+    # The full content is indexed, not the preview kept in the row.
+    hits = await message_repo.search_messages(user.uuid, "lift chart", limit=10)
+    assert [hit.message_uuid for hit in hits] == [message.uuid]
+
+
+async def test_concurrent_writes_get_unique_versions(db_deps: Deps) -> None:
+    message_repo = db_deps.message_repo
+    chat = await db_deps.chat_repo.create_chat(ChatCreate(thread_id="t1"))
+    message = await message_repo.create_message(MessageCreate(chat_id=chat.uuid))
+
+    tool_calls = await asyncio.gather(
+        *[
+            message_repo.create_message_tool_call(
+                MessageToolCallCreate(message_uuid=message.uuid, agui_id=f"c{i}")
+            )
+            for i in range(10)
+        ]
+    )
+    updated = await message_repo.update_message(message.uuid, MessageUpdate())
+
+    versions = [message.version] + [tc.version for tc in tool_calls]
+    assert sorted(versions) == list(range(1, 12))
+    assert updated is not None and updated.version == 12
+    assert await message_repo.get_chat_version(chat.uuid) == 12
+    # Each chat counts its own versions.
+    other = await db_deps.chat_repo.create_chat(ChatCreate(thread_id="t2"))
+    assert (
+        await message_repo.create_message(MessageCreate(chat_id=other.uuid))
+    ).version == 1
+
+
+async def test_updates_return_loaded_rows(db_deps: Deps) -> None:
+    """The rows returned by updates are usable once their session is closed."""
+    message_repo = db_deps.message_repo
+    chat = await db_deps.chat_repo.create_chat(ChatCreate(thread_id="t1"))
+    message = await message_repo.create_message(MessageCreate(chat_id=chat.uuid))
+    tool_call = await message_repo.create_message_tool_call(
+        MessageToolCallCreate(message_uuid=message.uuid)
+    )
+    reasoning = await message_repo.create_message_reasoning(
+        MessageReasoningCreate(message_uuid=message.uuid)
+    )
+    content = "x" * (OFFLOAD_THRESHOLD + 1)
+
+    updated_message = await message_repo.update_message(
+        message.uuid, MessageUpdate(content=content, in_progress=False)
+    )
+    updated_tool_call = await message_repo.update_message_tool_call(
+        tool_call.uuid, MessageToolCallUpdate(content=content, in_progress=False)
+    )
+    updated_reasoning = await message_repo.update_message_reasoning(
+        reasoning.uuid, MessageReasoningUpdate(content="done", in_progress=False)
+    )
+
+    assert updated_message and updated_tool_call and updated_reasoning
+    assert [
+        updated_message.version,
+        updated_tool_call.version,
+        updated_reasoning.version,
+    ] == [4, 5, 6]
+    assert updated_message.updated_at and message.updated_at
+    assert updated_message.updated_at > message.updated_at
+    assert updated_tool_call.updated_at and tool_call.updated_at
+    assert updated_tool_call.updated_at > tool_call.updated_at
+    assert updated_reasoning.updated_at and reasoning.updated_at
+    assert updated_reasoning.updated_at > reasoning.updated_at
+    assert not updated_message.in_progress and updated_message.created_at
+    assert updated_message.content_length == len(content)
+    assert updated_message.content == content[:PREVIEW_LENGTH]
+    assert updated_tool_call.content_length == len(content)
+    assert updated_tool_call.content == content[:PREVIEW_LENGTH]
+    assert updated_reasoning.content == "done"
+
+
+async def test_query_counts(db_deps: Deps) -> None:
+    """
+    Regression test for the number of statements and ORM rows of each repository
+    method, on a chat of 3 messages with a tool call and a reasoning each.
+    """
+    message_repo = db_deps.message_repo
+    user = await db_deps.user_repo.create_user(
+        UserCreate(email="count@example.com", first_name="Al", last_name="Bo")
+    )
+    chat = await db_deps.chat_repo.create_chat(
+        ChatCreate(thread_id="t1", user_uuid=user.uuid)
+    )
+    messages = [
+        await message_repo.create_message(
+            MessageCreate(chat_id=chat.uuid, agui_id=f"m{i}", in_progress=False)
+        )
+        for i in range(3)
+    ]
+    message = messages[-1]
+    for m in messages:
+        tool_call = await message_repo.create_message_tool_call(
+            MessageToolCallCreate(message_uuid=m.uuid, agui_id=f"c{m.agui_id}")
+        )
+        reasoning = await message_repo.create_message_reasoning(
+            MessageReasoningCreate(message_uuid=m.uuid)
+        )
+
+    calls: dict[str, Callable[[], Awaitable[Any]]] = {
+        "create_message": lambda: message_repo.create_message(
+            MessageCreate(chat_id=chat.uuid, in_progress=False)
+        ),
+        "update_message": lambda: message_repo.update_message(
+            message.uuid, MessageUpdate(content="done")
+        ),
+        "create_message_tool_call": lambda: message_repo.create_message_tool_call(
+            MessageToolCallCreate(message_uuid=message.uuid)
+        ),
+        "update_message_tool_call": lambda: message_repo.update_message_tool_call(
+            tool_call.uuid, MessageToolCallUpdate(arguments="{}")
+        ),
+        "create_message_reasoning": lambda: message_repo.create_message_reasoning(
+            MessageReasoningCreate(message_uuid=message.uuid)
+        ),
+        "update_message_reasoning": lambda: message_repo.update_message_reasoning(
+            reasoning.uuid, MessageReasoningUpdate(in_progress=True)
+        ),
+        "get_message": lambda: message_repo.get_message(message.uuid),
+        "get_message without children": lambda: message_repo.get_message(
+            message.uuid, with_children=False
+        ),
+        "get_message_by_agui_id": lambda: message_repo.get_message_by_agui_id(
+            chat.uuid, "m2"
+        ),
+        "get_message_by_agui_id without children": (
+            lambda: message_repo.get_message_by_agui_id(
+                chat.uuid, "m2", with_children=False
+            )
+        ),
+        "get_tool_call_by_agui_id": lambda: message_repo.get_tool_call_by_agui_id(
+            message.uuid, "cm2"
+        ),
+        "get_existing_agui_ids": lambda: message_repo.get_existing_agui_ids(
+            chat.uuid, ["m0", "m1", "x"]
+        ),
+        "get_in_progress_reasoning": lambda: message_repo.get_in_progress_reasoning(
+            message.uuid
+        ),
+        "get_chat_messages": lambda: message_repo.get_chat_messages(chat.uuid),
+        "get_chat_messages_page": lambda: message_repo.get_chat_messages_page(
+            chat.uuid, limit=2
+        ),
+        "get_chat_changes": lambda: message_repo.get_chat_changes(chat.uuid, 0),
+        "get_chat_version": lambda: message_repo.get_chat_version(chat.uuid),
+        "search_messages": lambda: message_repo.search_messages(
+            user.uuid, "done", limit=10
+        ),
+        "get_last_messages": lambda: message_repo.get_last_messages([chat.uuid]),
+        "get_last_messages without children": (
+            lambda: message_repo.get_last_messages([chat.uuid], with_children=False)
+        ),
+        "get_last_messages projected": lambda: message_repo.get_last_messages(
+            [chat.uuid], columns=[Message.role]
+        ),
+    }
+
+    counts = {}
+    counter = QueryCounter(db_deps.db)
+    for name, call in calls.items():
+        with counter.count():
+            await call()
+        counts[name] = (counter.statements, counter.rows)
+
+    # (statements, rows). The chat now has 4 messages, tool calls and reasonings,
+    # the last message has 2 of each, and the newest message has none.
+    assert counts == {
+        # Writes bump the version of the chat first.
+        # Summary update, FTS delete and insert, and insert.
+        "create_message": (5, 0),
+        "update_message": (6, 1),
+        "create_message_tool_call": (2, 0),
+        "update_message_tool_call": (3, 1),
+        "create_message_reasoning": (2, 0),
+        "update_message_reasoning": (3, 1),
+        "get_message": (3, 5),
+        "get_message without children": (1, 1),
+        "get_message_by_agui_id": (3, 5),
+        "get_message_by_agui_id without children": (1, 1),
+        "get_tool_call_by_agui_id": (1, 1),
+        "get_existing_agui_ids": (1, 0),
+        "get_in_progress_reasoning": (1, 1),
+        "get_chat_messages": (3, 12),
+        "get_chat_messages_page": (3, 6),
+        "get_chat_changes": (3, 12),
+        "get_chat_version": (1, 0),
+        "search_messages": (1, 0),
+        "get_last_messages": (3, 1),
+        "get_last_messages without children": (1, 1),
+        "get_last_messages projected": (1, 1),
+    }
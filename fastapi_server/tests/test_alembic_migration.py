@@ -0,0 +1,54 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from alembic_migration import MigrationLock
+
+
+def _lock(values: list[bool], wait_timeout: float) -> tuple[MigrationLock, MagicMock]:
+    lock = MigrationLock(wait_timeout=wait_timeout, poll_interval=0)
+    set_value = MagicMock()
+    lock._get_lock_value = MagicMock(side_effect=values)  # type: ignore[method-assign]
+    lock._set_lock_value = set_value  # type: ignore[method-assign]
+    return lock, set_value
+
+
+def test_held_lock_raises_without_wait_timeout() -> None:
+    lock, set_value = _lock([True], wait_timeout=0)
+
+    with pytest.raises(RuntimeError), patch.dict("os.environ", {"APPLICATION_ID": "a"}):
+        lock.__enter__()
+    set_value.assert_not_called()
+
+
+def test_held_lock_is_waited_for() -> None:
+    lock, set_value = _lock([True, True, False], wait_timeout=60)
+
+    with lock:
+        set_value.assert_called_once_with(True)
+    set_value.assert_called_with(False)
+
+
+def test_stale_lock_is_taken_over() -> None:
+    lock, set_value = _lock([True] * 1000, wait_timeout=0.01)
+
+    with (
+        patch("alembic_migration.time.sleep"),
+        patch("alembic_migration.time.monotonic", side_effect=[0.0, 0.0, 1.0]),
+    ):
+        lock.__enter__()
+    set_value.assert_called_once_with(True)
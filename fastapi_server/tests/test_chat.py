@@ -23,7 +23,7 @@ handle authentication setup with a default test user.
 import datetime
 import uuid as uuidpkg
 from typing import Any, AsyncGenerator, Dict, Generator
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
 import litellm.exceptions
 import pytest
@@ -43,6 +43,7 @@ from fastapi import Request
 from fastapi.testclient import TestClient
 from httpx_sse import connect_sse
 
+from app.api.v1.chat import CHATS_PAGE_SIZE
 from app.auth.ctx import (
     AUTH_CTX_HEADER,
     VISITOR_SCOPED_API_KEY_HEADER,
@@ -226,16 +227,10 @@ def test_get_chats_with_authentication(
     deps: Deps, authenticated_client: TestClient, sample_chat: Chat
 ) -> None:
     """Example test showing how easy it is to test authenticated endpoints."""
-    with (
-        patch.object(
-            deps.chat_repo, "get_all_chats", new_callable=AsyncMock
-        ) as mock_get_chats,
-        patch.object(
-            deps.message_repo, "get_last_messages", new_callable=AsyncMock
-        ) as mock_get_messages,
-    ):
+    with patch.object(
+        deps.chat_repo, "get_all_chats", new_callable=AsyncMock
+    ) as mock_get_chats:
         mock_get_chats.return_value = [sample_chat]
-        mock_get_messages.return_value = {}
 
         response = authenticated_client.get("/api/v1/chat")
 
@@ -248,8 +243,13 @@ def test_get_chats_with_authentication(
                 "user_uuid": None,
                 "update_time": "2025-10-08T00:00:00Z",
                 "created_at": "2025-10-08T00:00:00Z",
+                "message_count": 0,
+                "last_message_preview": None,
             }
         ]
+        mock_get_chats.assert_called_once_with(
+            ANY, limit=CHATS_PAGE_SIZE + 1, before=None
+        )
 
 
 # Chat deletion tests
@@ -265,6 +265,8 @@ def test_delete_chat_success(
             deps.chat_repo, "get_chat_by_thread_id", new_callable=AsyncMock
         ) as mock_get,
         patch.object(deps.user_repo, "get_user", new_callable=AsyncMock) as get_user,
+        patch.object(deps.chat_purger, "wake") as wake_purger,
+        patch.object(deps.db, "after_commit") as after_commit,
     ):
         get_user.return_value = test_user
         mock_get.return_value = sample_chat
@@ -279,6 +281,8 @@ def test_delete_chat_success(
 
         mock_get.assert_called_once_with(test_user.uuid, "123")
         mock_delete.assert_called_once_with(sample_chat.uuid)
+        # Once the deletion is committed.
+        after_commit.assert_called_once_with(wake_purger)
 
 
 def test_delete_chat_not_found(
@@ -321,8 +325,9 @@ async def test_chat_repository_delete_chat_success(sample_chat: Chat) -> None:
     result = await repo.delete_chat(sample_chat.uuid)
 
     assert result == sample_chat
-    mock_session.exec.assert_called_once()
-    mock_session.delete.assert_called_once_with(sample_chat)
+    # The chat is selected, then soft-deleted.
+    assert mock_session.exec.call_count == 2
+    mock_session.delete.assert_not_called()
     mock_session.commit.assert_called_once()
 
 
@@ -0,0 +1,499 @@
+# Copyright 2025 DataRobot, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import hashlib
+import multiprocessing
+import shutil
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable
+from unittest.mock import MagicMock, patch
+
+import pytest
+from core.persistent_fs.dr_file_system import DRFileSystem
+from fsspec.implementations.dirfs import DirFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from sqlalchemy import Connection, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import DBCtx, DBShards, create_db_ctx, each_shard, use_shard
+
+PersistentDB = tuple[Callable[..., DBCtx], MagicMock, list[float]]
+
+
+@pytest.fixture
+async def persistent_db(tmp_path: Path) -> AsyncGenerator[PersistentDB, None]:
+    """A DBCtx factory with a fake persistent storage, the storage and a clock."""
+    db_path = str(tmp_path / "db.sqlite")
+    fs = MagicMock(spec=DRFileSystem)
+    fs.modified.return_value = 1.0
+    fs.get.side_effect = lambda rpath, lpath: Path(lpath).touch()
+    # Uploading makes a new snapshot.
+    fs.put.side_effect = lambda *args: setattr(
+        fs.modified, "return_value", fs.modified.return_value + 1
+    )
+    clock = [100.0]
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+
+    def create(**kwargs: Any) -> DBCtx:
+        return DBCtx(engine, snapshot_staleness=5, **kwargs)
+
+    with (
+        patch("app.db._prepare_persistence_storage", return_value=(fs, db_path)),
+        patch("app.db.time.monotonic", side_effect=lambda: clock[0]),
+    ):
+        yield create, fs, clock
+    await engine.dispose()
+
+
+async def _write(db: DBCtx | DBShards, statement: str) -> None:
+    async with db.session(writable=True) as session:
+        await session.exec(text(statement))  # type: ignore[call-overload]
+        await session.commit()
+
+
+async def test_reads_reuse_the_applied_snapshot(persistent_db: PersistentDB) -> None:
+    create, fs, clock = persistent_db
+    db = create()
+
+    for _ in range(3):
+        async with db.session() as sess:
+            await sess.exec(text("select 1"))  # type: ignore[call-overload]
+    # Downloaded once, the next reads are within the staleness window.
+    assert fs.get.call_count == 1
+    assert fs.modified.call_count == 1
+
+    clock[0] += 10
+    async with db.session():
+        pass
+    # Checked again, but the snapshot did not change.
+    assert fs.get.call_count == 1
+    assert fs.modified.call_count == 2
+
+    clock[0] += 10
+    fs.modified.return_value = 2.0
+    async with db.session():
+        pass
+    assert fs.get.call_count == 2
+
+
+async def test_writes_check_for_a_newer_snapshot(persistent_db: PersistentDB) -> None:
+    create, fs, clock = persistent_db
+    db = create()
+    async with db.session():
+        pass
+
+    fs.modified.return_value = 2.0
+    await _write(db, "create table t (id integer)")
+    assert fs.get.call_count == 2
+    fs.put.assert_called_once()
+
+    # The uploaded snapshot is the applied one.
+    clock[0] += 10
+    async with db.session():
+        pass
+    assert fs.get.call_count == 2
+
+
+async def test_uploads_are_deferred_and_flushed(persistent_db: PersistentDB) -> None:
+    create, fs, clock = persistent_db
+    db = create(snapshot_upload_interval=60)
+
+    await _write(db, "create table t (id integer)")
+    await _write(db, "insert into t values (1)")
+    async with db.session(writable=True):
+        pass
+    fs.put.assert_not_called()
+    # Pending writes are not overwritten by the remote snapshot.
+    clock[0] += 10
+    fs.modified.return_value = 5.0
+    async with db.session():
+        pass
+    assert fs.get.call_count == 1
+
+    assert await db.flush_snapshot()
+    assert not await db.flush_snapshot()
+    fs.put.assert_called_once()
+
+    await _write(db, "insert into t values (2)")
+    await db.shutdown()
+    assert fs.put.call_count == 2
+
+
+def _remote(tmp_path: Path) -> DirFileSystem:
+    (tmp_path / "remote").mkdir()
+    return DirFileSystem(path=str(tmp_path / "remote"), fs=LocalFileSystem())
+
+
+async def _start_replicated(remote: DirFileSystem, db_path: str) -> DBCtx:
+    with patch("app.db._prepare_persistence_storage", return_value=(remote, db_path)):
+        return await create_db_ctx(
+            f"sqlite+aiosqlite:///{db_path}",
+            snapshot_upload_interval=60,
+            replication=True,
+        )
+
+
+async def test_replication_restores_the_database(tmp_path: Path) -> None:
+    remote = _remote(tmp_path)
+    db_path = str(tmp_path / "db.sqlite")
+
+    async def start() -> DBCtx:
+        return await _start_replicated(remote, db_path)
+
+    db = await start()
+    await _write(db, "create table t (id integer)")
+    assert await db.flush_snapshot()
+    await _write(db, "insert into t values (1)")
+    await db.shutdown()
+    assert len(remote.ls(f"{db_path}.replica", detail=False)) == 2
+
+    # A new container.
+    for suffix in ["", "-wal", "-shm", ".sync"]:
+        Path(db_path + suffix).unlink(missing_ok=True)
+    db = await start()
+    async with db.session() as sess:
+        rows = await sess.exec(text("select id from t"))  # type: ignore[call-overload]
+        assert rows.all() == [(1,)]
+        mode = await sess.exec(text("pragma journal_mode"))  # type: ignore[call-overload]
+        assert mode.one() == ("wal",)
+    await db.shutdown()
+
+
+async def test_replication_is_seeded_from_the_snapshot(tmp_path: Path) -> None:
+    remote = _remote(tmp_path)
+    db_path = str(tmp_path / "db.sqlite")
+    # The whole-file snapshot of a deployment before replication was turned on.
+    snapshot = sqlite3.connect(tmp_path / "snapshot.sqlite")
+    snapshot.executescript("create table t (id integer); insert into t values (1);")
+    snapshot.close()
+    remote.makedirs(str(tmp_path), exist_ok=True)
+    remote.put(str(tmp_path / "snapshot.sqlite"), db_path)
+
+    db = await _start_replicated(remote, db_path)
+    assert [
+        Path(path).name for path in remote.ls(f"{db_path}.replica", detail=False)
+    ] == ["snapshot-0000000001"]
+    await _write(db, "insert into t values (2)")
+
+    # Another worker process does not restore over the database in use.
+    other = await _start_replicated(remote, db_path)
+    async with other.session() as sess:
+        rows = await sess.exec(text("select id from t"))  # type: ignore[call-overload]
+        assert rows.all() == [(1,), (2,)]
+    # It carries on replicating from the state of the first one.
+    await _write(other, "insert into t values (3)")
+    assert await other.flush_snapshot()
+    assert sorted(
+        Path(path).name for path in remote.ls(f"{db_path}.replica", detail=False)
+    ) == ["segment-0000000001-0000000001", "snapshot-0000000001"]
+    await other.shutdown()
+    await db.shutdown()
+
+
+async def test_group_commit_batches_concurrent_writes(tmp_path: Path) -> None:
+    db = await create_db_ctx(
+        f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}", group_commit=True
+    )
+    await _write(db, "create table t (id integer)")
+    commits = []
+    event.listen(db.engine.sync_engine, "commit", lambda conn: commits.append(1))
+
+    async def insert(i: int) -> int:
+        async def operation(session: AsyncSession) -> int:
+            if i == 13:
+                raise ValueError("unlucky")
+            await session.exec(text(f"insert into t values ({i})"))  # type: ignore[call-overload]
+            return i
+
+        return await db.write(operation)
+
+    results = await asyncio.gather(*map(insert, range(50)), return_exceptions=True)
+
+    assert isinstance(results.pop(13), ValueError)
+    assert results == [i for i in range(50) if i != 13]
+    # The failing batch is retried one write at a time.
+    assert len(commits) < 50
+    async with db.session() as sess:
+        rows = await sess.exec(text("select count(*) from t"))  # type: ignore[call-overload]
+        assert rows.one() == (49,)
+    await db.shutdown()
+
+
+async def test_sqlite_profile(tmp_path: Path) -> None:
+    db = await create_db_ctx(
+        f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}", sqlite_profile=True
+    )
+    assert db.read_engine is not db.engine
+    await _write(db, "create table t (id integer)")
+
+    async with db.session(writable=True) as session:
+        mode = await session.exec(text("pragma journal_mode"))  # type: ignore[call-overload]
+        assert mode.one() == ("wal",)
+        synchronous = await session.exec(text("pragma synchronous"))  # type: ignore[call-overload]
+        assert synchronous.one() == (1,)
+    async with db.session() as sess:
+        with pytest.raises(OperationalError, match="readonly"):
+            await sess.exec(text("insert into t values (1)"))  # type: ignore[call-overload]
+    await db.shutdown()
+
+
+async def test_sqlite_profile_without_wal(tmp_path: Path) -> None:
+    db_path = str(tmp_path / "db.sqlite")
+    # The whole database file is shipped to persistent storage.
+    with (
+        patch("app.db.all_env_variables_present", return_value=True),
+        patch("app.db._prepare_persistence_storage", return_value=(None, None)),
+    ):
+        db = await create_db_ctx(f"sqlite+aiosqlite:///{db_path}", sqlite_profile=True)
+
+    async with db.session(writable=True) as session:
+        mode = await session.exec(text("pragma journal_mode"))  # type: ignore[call-overload]
+        assert mode.one() == ("delete",)
+        synchronous = await session.exec(text("pragma synchronous"))  # type: ignore[call-overload]
+        assert synchronous.one() == (2,)
+    await db.shutdown()
+
+
+async def test_reads_are_routed_to_replicas(tmp_path: Path) -> None:
+    uris = []
+    for name in ["primary", "replica-1", "replica-2"]:
+        path = tmp_path / f"{name}.sqlite"
+        conn = sqlite3.connect(path)
+        conn.execute("create table t (name text)")
+        conn.execute("insert into t values (?)", (name,))
+        conn.commit()
+        conn.close()
+        uris.append(f"sqlite+aiosqlite:///{path}")
+    down = f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.sqlite'}"
+    db = await create_db_ctx(uris[0], replica_uris=[*uris[1:], down])
+
+    async def read() -> str:
+        async with db.session() as sess:
+            rows = await sess.exec(text("select name from t"))  # type: ignore[call-overload]
+            return str(rows.one()[0])
+
+    async def write_then_read() -> str:
+        await _write(db, "update t set name = 'written'")
+        return await read()
+
+    # Each task is a request of its own.
+    assert await db.check_replicas() == 1
+    reads = [await asyncio.create_task(read()) for _ in range(4)]
+    assert reads == ["replica-1", "replica-2", "replica-1", "replica-2"]
+    assert await asyncio.create_task(write_then_read()) == "written"
+    assert await asyncio.create_task(read()) == "replica-1"
+    await db.shutdown()
+
+
+async def test_unit_of_work_shares_sessions_and_commits_once(tmp_path: Path) -> None:
+    db = await create_db_ctx(
+        f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}", sqlite_profile=True
+    )
+    await _write(db, "create table t (name text)")
+
+    async def names() -> list[str]:
+        async with db.session() as sess:
+            rows = await sess.exec(text("select name from t order by name"))  # type: ignore[call-overload]
+            return [row[0] for row in rows.all()]
+
+    async def failing_write() -> None:
+        async with db.session(writable=True) as session:
+            await session.exec(text("insert into t values ('b')"))  # type: ignore[call-overload]
+            await session.rollback()
+
+    async with db.unit_of_work():
+        async with db.session() as first, db.session() as second:
+            assert first is second
+        await _write(db, "insert into t values ('a')")
+        await failing_write()
+        # The unit of work reads its own writes, other tasks only once committed.
+        assert await names() == ["a"]
+        assert await asyncio.create_task(names()) == []
+        async with db.session() as reader, db.session(writable=True) as writer:
+            assert reader is writer
+    assert await names() == ["a"]
+
+    with pytest.raises(RuntimeError):
+        async with db.unit_of_work():
+            await _write(db, "insert into t values ('c')")
+            raise RuntimeError()
+    assert await names() == ["a"]
+    await db.shutdown()
+
+
+async def test_after_commit(tmp_path: Path) -> None:
+    db = await create_db_ctx(f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}")
+    await _write(db, "create table t (name text)")
+    called = []
+
+    async with db.unit_of_work():
+        await _write(db, "insert into t values ('a')")
+        db.after_commit(lambda: called.append("committed"))
+        assert called == []
+    assert called == ["committed"]
+
+    with pytest.raises(RuntimeError):
+        async with db.unit_of_work():
+            await _write(db, "insert into t values ('b')")
+            db.after_commit(lambda: called.append("rolled back"))
+            raise RuntimeError()
+    db.after_commit(lambda: called.append("now"))
+    assert called == ["committed", "now"]
+    await db.shutdown()
+
+
+class _SharedStorage:
+    """A fake persistent storage in a directory, shared by the worker processes."""
+
+    def __init__(self, root: Path):
+        self._snapshot = root / "snapshot"
+        self._version = root / "version"
+        self.uploads = root / "uploads"
+
+    def modified(self, path: str) -> float:
+        if not self._version.exists():
+            raise FileNotFoundError(path)
+        return float(self._version.read_text())
+
+    def get(self, rpath: str, lpath: str) -> None:
+        shutil.copyfile(self._snapshot, lpath)
+
+    def put(self, lpath: str, rpath: str) -> None:
+        shutil.copyfile(lpath, self._snapshot)
+        self._version.write_text(
+            str(self.modified(rpath) + 1 if self._version.exists() else 1)
+        )
+        with self.uploads.open("a") as f:
+            f.write(hashlib.sha256(self._snapshot.read_bytes()).hexdigest() + "\n")
+
+
+async def _insert_rows(root: Path, worker: int, count: int) -> None:
+    db_path = str(root / "db.sqlite")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    storage = _SharedStorage(root)
+    with patch("app.db._prepare_persistence_storage", return_value=(storage, db_path)):
+        db = DBCtx(engine, snapshot_upload_interval=0.01 if worker % 2 else 0)
+        db.start()
+        for i in range(count):
+            await _write(db, f"insert into t values ({worker}, {i})")
+            async with db.session() as sess:
+                await sess.exec(text("select count(*) from t"))  # type: ignore[call-overload]
+        await db.shutdown()
+    await engine.dispose()
+
+
+def _worker(root: str, worker: int, count: int) -> None:
+    asyncio.run(_insert_rows(Path(root), worker, count))
+
+
+async def test_worker_processes_share_the_database(tmp_path: Path) -> None:
+    workers, count = 4, 10
+    storage = _SharedStorage(tmp_path)
+    db_path = str(tmp_path / "db.sqlite")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    with patch("app.db._prepare_persistence_storage", return_value=(storage, db_path)):
+        await _write(DBCtx(engine), "create table t (worker integer, i integer)")
+    await engine.dispose()
+
+    processes = [
+        multiprocessing.get_context("spawn").Process(
+            target=_worker, args=(str(tmp_path), worker, count)
+        )
+        for worker in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        await asyncio.to_thread(p.join)
+    assert [p.exitcode for p in processes] == [0] * workers
+
+    # No write is lost and each snapshot is uploaded once.
+    snapshot = sqlite3.connect(tmp_path / "snapshot")
+    assert snapshot.execute("pragma integrity_check").fetchone() == ("ok",)
+    rows = snapshot.execute("select count(distinct worker || '-' || i) from t")
+    assert rows.fetchone() == (workers * count,)
+    snapshot.close()
+    uploads = storage.uploads.read_text().split()
+    assert len(uploads) == len(set(uploads))
+
+
+async def test_shards_open_lazily_and_close_least_recently_used(tmp_path: Path) -> None:
+    upgraded: list[str] = []
+
+    def upgrade(connection: Connection) -> None:
+        upgraded.append(str(connection.engine.url.database))
+        connection.execute(text("create table if not exists t (name text)"))
+
+    shards = DBShards(
+        str(tmp_path), max_open=2, create_db=create_db_ctx, upgrade=upgrade
+    )
+    users = [uuid.uuid4() for _ in range(3)]
+
+    async def names(user: uuid.UUID) -> list[str]:
+        with use_shard(user):
+            async with shards.session() as sess:
+                rows = await sess.exec(text("select name from t"))  # type: ignore[call-overload]
+                return [row[0] for row in rows.all()]
+
+    with pytest.raises(RuntimeError):
+        await _write(shards, "insert into t values ('nobody')")
+    assert upgraded == []
+
+    for user in users[:2]:
+        with use_shard(user):
+            await _write(shards, f"insert into t values ('{user}')")
+    assert shards.open_users() == users[:2]
+    assert await names(users[0]) == [str(users[0])]
+
+    # The least recently used shard not in use is closed, even when others are.
+    with use_shard(users[0]):
+        async with shards.session():
+            assert await names(users[2]) == []
+            assert shards.open_users() == [users[0], users[2]]
+    # Closed shards are reopened from their file.
+    assert await names(users[1]) == [str(users[1])]
+    assert shards.open_users() == [users[2], users[1]]
+    assert len(upgraded) == 4
+    await shards.shutdown()
+    assert shards.open_users() == []
+
+
+async def test_each_shard_visits_closed_shards(tmp_path: Path) -> None:
+    def upgrade(connection: Connection) -> None:
+        connection.execute(text("create table if not exists t (name text)"))
+
+    shards = DBShards(
+        str(tmp_path), max_open=2, create_db=create_db_ctx, upgrade=upgrade
+    )
+    users = sorted(uuid.uuid4() for _ in range(3))
+    for user in users:
+        with use_shard(user):
+            await _write(shards, f"insert into t values ('{user}')")
+    assert shards.open_users() == users[1:]
+    (tmp_path / "notes.txt").write_text("not a shard")
+
+    visited = []
+    async for _ in each_shard(shards):
+        async with shards.session() as sess:
+            rows = await sess.exec(text("select name from t"))  # type: ignore[call-overload]
+            visited.append(rows.one()[0])
+
+    assert visited == [str(user) for user in users]
+    # The shards the job opened are closed again.
+    assert shards.open_users() == users[2:]
+    await shards.shutdown()
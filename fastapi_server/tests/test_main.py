@@ -11,8 +11,20 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+import pytest
 from fastapi.testclient import TestClient
 
+import app as app_module
+from app import create_app
+from app.config import Config
+from app.deps import Deps, MigrationError
+
 
 def test_index(client: TestClient) -> None:
     response = client.get("/")
@@ -24,3 +36,66 @@ def test_health(client: TestClient) -> None:
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+def test_ready_once_started_up(
+    monkeypatch: pytest.MonkeyPatch, config: Config, deps: Deps
+) -> None:
+    started = threading.Event()
+
+    @asynccontextmanager
+    async def slow_deps(config: Config) -> AsyncGenerator[Deps, None]:
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        yield deps
+
+    monkeypatch.setattr(app_module, "create_deps", slow_deps)
+    with TestClient(create_app(config=config)) as client:
+        assert client.get("/health").status_code == 200
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "starting"}
+        response = client.get("/api/v1/chat")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+        started.set()
+        for _ in range(100):
+            if client.get("/ready").status_code == 200:
+                break
+            time.sleep(0.01)
+        assert client.get("/ready").json() == {"status": "ready"}
+
+
+def test_failed_startup(monkeypatch: pytest.MonkeyPatch, config: Config) -> None:
+    @asynccontextmanager
+    async def failing_deps(config: Config) -> AsyncGenerator[Deps, None]:
+        raise RuntimeError("no database")
+        yield
+
+    monkeypatch.setattr(app_module, "create_deps", failing_deps)
+    with TestClient(create_app(config=config)) as client:
+        for _ in range(100):
+            if client.get("/health").status_code == 503:
+                break
+            time.sleep(0.01)
+        assert client.get("/health").json() == {"status": "failed"}
+        assert client.get("/ready").json() == {"status": "failed"}
+
+
+def test_failed_migration_keeps_the_app_alive(
+    monkeypatch: pytest.MonkeyPatch, config: Config
+) -> None:
+    @asynccontextmanager
+    async def failing_deps(config: Config) -> AsyncGenerator[Deps, None]:
+        raise MigrationError("The database migration failed.")
+        yield
+
+    monkeypatch.setattr(app_module, "create_deps", failing_deps)
+    with TestClient(create_app(config=config)) as client:
+        for _ in range(100):
+            if client.get("/ready").json() == {"status": "failed"}:
+                break
+            time.sleep(0.01)
+        assert client.get("/ready").json() == {"status": "failed"}
+        assert client.get("/health").json() == {"status": "healthy"}
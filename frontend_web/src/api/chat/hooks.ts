@@ -1,15 +1,32 @@
-import { useMutation, useQuery } from '@tanstack/react-query';
-import { deleteChat, getChatHistory, getChats, updateChat } from '@/api/chat/requests';
+import { useInfiniteQuery, useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
+import {
+  deleteChat,
+  getChatChanges,
+  getChatHistory,
+  getChatMessages,
+  getChats,
+  getNextCursor,
+  MESSAGES_PAGE_SIZE,
+  updateChat,
+} from '@/api/chat/requests';
 import { chatsKeys } from '@/api/chat/keys';
-import { selectChats, selectMessages } from '@/api/chat/selectors';
+import {
+  mergeChatChanges,
+  prependChatMessages,
+  selectChats,
+  selectHistory,
+} from '@/api/chat/selectors';
+import type { ChatHistory } from '@/api/chat/types';
 
 const staleTime = 60 * 1000;
 
 export function useFetchChats() {
-  return useQuery({
-    queryFn: ({ signal }) => getChats({ signal }),
+  return useInfiniteQuery({
+    queryFn: ({ signal, pageParam }) => getChats({ signal, cursor: pageParam }),
     queryKey: chatsKeys.list,
-    select: selectChats,
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: getNextCursor,
+    select: data => selectChats(data.pages),
     staleTime,
   });
 }
@@ -27,11 +44,45 @@ export function useUpdateChat() {
 }
 
 export function useFetchHistory({ chatId, enabled = true }: { chatId: string; enabled: boolean }) {
+  const queryClient = useQueryClient();
   return useQuery({
     queryKey: chatsKeys.history(chatId!),
-    queryFn: ({ signal }) => getChatHistory({ signal, chatId }),
+    queryFn: async ({ signal }): Promise<ChatHistory> => {
+      // Once loaded, only the messages changed since are fetched
+      const cached = queryClient.getQueryData<ChatHistory>(chatsKeys.history(chatId));
+      if (cached?.data.version === undefined) {
+        // Older messages are loaded on demand, see useFetchOlderMessages
+        const res = await getChatHistory({ signal, chatId, limit: MESSAGES_PAGE_SIZE });
+        return { data: res.data, nextCursor: getNextCursor(res) };
+      }
+      const changes = await getChatChanges({ signal, chatId, since: cached.data.version });
+      return { ...cached, data: mergeChatChanges(cached.data, changes.data) };
+    },
     enabled: !!chatId && enabled,
-    select: selectMessages,
+    select: selectHistory,
     staleTime,
   });
 }
+
+export function useFetchOlderMessages({ chatId }: { chatId: string }) {
+  const queryClient = useQueryClient();
+  return useMutation({
+    mutationFn: async () => {
+      const cursor = queryClient.getQueryData<ChatHistory>(chatsKeys.history(chatId))?.nextCursor;
+      return cursor ? getChatMessages({ chatId, cursor }) : null;
+    },
+    onSuccess: res => {
+      if (!res) {
+        return;
+      }
+      queryClient.setQueryData<ChatHistory>(
+        chatsKeys.history(chatId),
+        cached =>
+          cached && {
+            data: prependChatMessages(cached.data, res.data),
+            nextCursor: getNextCursor(res),
+          }
+      );
+    },
+  });
+}
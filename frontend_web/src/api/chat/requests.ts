@@ -1,8 +1,17 @@
-import { APIChat, APIChatWithMessages } from './types';
+import type { AxiosResponse } from 'axios';
+import { APIChat, APIChatChanges, APIChatWithMessages, MessageHistoryResponse } from './types';
 import apiClient from '../apiClient';
 
-export async function getChats({ signal }: { signal: AbortSignal }) {
-  return apiClient.get<APIChat[]>('v1/chat', { signal });
+// Paged endpoints return the cursor of the next page, if any, in this header
+export const NEXT_CURSOR_HEADER = 'x-next-cursor';
+export const MESSAGES_PAGE_SIZE = 50;
+
+export function getNextCursor(res: AxiosResponse): string | undefined {
+  return res.headers[NEXT_CURSOR_HEADER] || undefined;
+}
+
+export async function getChats({ signal, cursor }: { signal: AbortSignal; cursor?: string }) {
+  return apiClient.get<APIChat[]>('v1/chat', { signal, params: { cursor } });
 }
 
 export async function deleteChat({ chatId }: any): Promise<void> {
@@ -19,6 +28,46 @@ export async function updateChat({
   await apiClient.patch(`v1/chat/${chatId}`, { name });
 }
 
-export async function getChatHistory({ signal, chatId }: { signal: AbortSignal; chatId: string }) {
-  return await apiClient.get<APIChatWithMessages>(`v1/chat/${chatId}`, { signal });
+export async function getChatHistory({
+  signal,
+  chatId,
+  limit,
+}: {
+  signal: AbortSignal;
+  chatId: string;
+  limit?: number;
+}) {
+  return await apiClient.get<APIChatWithMessages>(`v1/chat/${chatId}`, {
+    signal,
+    params: { limit },
+  });
+}
+
+export async function getChatMessages({
+  chatId,
+  cursor,
+  limit = MESSAGES_PAGE_SIZE,
+}: {
+  chatId: string;
+  cursor: string;
+  limit?: number;
+}) {
+  return await apiClient.get<MessageHistoryResponse[]>(`v1/chat/${chatId}/messages`, {
+    params: { cursor, limit },
+  });
+}
+
+export async function getChatChanges({
+  signal,
+  chatId,
+  since,
+}: {
+  signal: AbortSignal;
+  chatId: string;
+  since: number;
+}) {
+  return await apiClient.get<APIChatChanges>(`v1/chat/${chatId}/changes`, {
+    signal,
+    params: { since },
+  });
 }
@@ -1,15 +1,21 @@
 import {
   APIChat,
+  APIChatChanges,
   APIChatWithMessages,
+  ChatHistory,
   ChatListItem,
   MessageHistoryResponse,
   MessageResponse,
 } from './types';
 import { ContentPart, isToolInvocationPart, ToolInvocationUIPart } from '@/types/message.ts';
 
-export function selectChats(res: { data: APIChat[] }): ChatListItem[] {
-  return [...res.data]
-    .map(chat => ({
+/**
+ * Flatten the loaded pages of chats, keeping the server order (most recently active first) so
+ * that later pages are appended below the ones already shown
+ */
+export function selectChats(pages: { data: APIChat[] }[]): ChatListItem[] {
+  return pages.flatMap(page =>
+    page.data.map(chat => ({
       id: chat.thread_id,
       name: chat.name,
       userId: chat.user_id,
@@ -18,7 +24,14 @@ export function selectChats(res: { data: APIChat[] }): ChatListItem[] {
       metadata: chat.metadata,
       initialised: true,
     }))
-    .sort((fChat, sChat) => (sChat.createdAt < fChat.createdAt ? -1 : 1));
+  );
+}
+
+export function selectHistory(history: ChatHistory): {
+  messages: MessageResponse[];
+  hasOlderMessages: boolean;
+} {
+  return { messages: selectMessages(history), hasOlderMessages: !!history.nextCursor };
 }
 
 export function selectMessages(res: { data: APIChatWithMessages }): MessageResponse[] {
@@ -48,6 +61,32 @@ export function selectMessages(res: { data: APIChatWithMessages }): MessageRespo
 
   return uiMessages;
 }
+/**
+ * Apply the messages changed since the history was fetched: changed ones are replaced in place,
+ * new ones appended
+ */
+export function mergeChatChanges(
+  chat: APIChatWithMessages,
+  changes: APIChatChanges
+): APIChatWithMessages {
+  const changed = new Map(changes.messages.map(m => [m.id, m]));
+  const messages = chat.messages.map(m => changed.get(m.id) ?? m);
+  const known = new Set(chat.messages.map(m => m.id));
+  messages.push(...changes.messages.filter(m => !known.has(m.id)));
+  return { ...chat, messages, version: changes.version };
+}
+
+/**
+ * Add a page of older messages before the loaded ones, skipping any already loaded
+ */
+export function prependChatMessages(
+  chat: APIChatWithMessages,
+  older: MessageHistoryResponse[]
+): APIChatWithMessages {
+  const known = new Set(chat.messages.map(m => m.id));
+  return { ...chat, messages: [...older.filter(m => !known.has(m.id)), ...chat.messages] };
+}
+
 // helper methods
 
 function getToolPart(m: MessageResponse, toolCallId: string): ToolInvocationUIPart | undefined {
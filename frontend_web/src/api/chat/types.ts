@@ -58,4 +58,19 @@ export type MessageHistoryResponse = {
 
 export type APIChatWithMessages = APIChat & {
   messages: MessageHistoryResponse[];
+  version?: number;
+};
+
+/**
+ * Loaded part of a chat history: the latest messages, extended with older pages on demand, and
+ * the cursor of the page before them, if any
+ */
+export type ChatHistory = {
+  data: APIChatWithMessages;
+  nextCursor?: string;
+};
+
+export type APIChatChanges = {
+  messages: MessageHistoryResponse[];
+  version: number;
 };
@@ -19,6 +19,9 @@ export function Chat({ initialMessages, children }: ChatProps) {
     progress,
     deleteProgress,
     isLoadingHistory,
+    hasOlderMessages,
+    isLoadingOlderMessages,
+    loadOlderMessages,
     setInitialMessages,
     isAgentRunning,
   } = useChatContext();
@@ -32,7 +35,14 @@ export function Chat({ initialMessages, children }: ChatProps) {
     <div className="main-section">
       {children || (
         <>
-          <ChatMessages isLoading={isLoadingHistory} messages={combinedEvents} chatId={chatId} />
+          <ChatMessages
+            isLoading={isLoadingHistory}
+            messages={combinedEvents}
+            chatId={chatId}
+            hasOlderMessages={hasOlderMessages}
+            isLoadingOlderMessages={isLoadingOlderMessages}
+            onLoadOlderMessages={loadOlderMessages}
+          />
           <ChatProgress progress={progress || {}} deleteProgress={deleteProgress} />
           <ChatTextInput
             userInput={userInput}
@@ -1,4 +1,4 @@
-import { type PropsWithChildren, useEffect, useRef } from 'react';
+import { type PropsWithChildren, useEffect, useLayoutEffect, useRef } from 'react';
 import { Skeleton } from '@/components/ui/skeleton';
 import { ChatMessagesMemo } from '@/components/ChatMessage';
 import { ChatError } from '@/components/ChatError';
@@ -16,14 +16,39 @@ export type ChatMessageProps = {
   isLoading: boolean;
   chatId: string;
   messages?: ChatStateEvent[];
+  /**
+   * Older messages are loaded when scrolling to the top while there are any
+   */
+  hasOlderMessages?: boolean;
+  isLoadingOlderMessages?: boolean;
+  onLoadOlderMessages?: () => void;
 } & PropsWithChildren;
 
 const THRESHOLD = 50;
 
-export function ChatMessages({ children, messages, isLoading, chatId }: ChatMessageProps) {
+export function ChatMessages({
+  children,
+  messages,
+  isLoading,
+  chatId,
+  hasOlderMessages = false,
+  isLoadingOlderMessages = false,
+  onLoadOlderMessages,
+}: ChatMessageProps) {
   const scrollContainerRef = useRef<HTMLDivElement>(null);
   const shouldAutoscrollRef = useRef<boolean>(true);
   const prevScrollRef = useRef<number>(0);
+  // Scroll height before older messages were requested, to keep the view in place once added
+  const prevScrollHeightRef = useRef<number | null>(null);
+
+  const loadOlderMessages = () => {
+    const container = scrollContainerRef.current;
+    if (!container || !hasOlderMessages || isLoadingOlderMessages || !onLoadOlderMessages) {
+      return;
+    }
+    prevScrollHeightRef.current = container.scrollHeight;
+    onLoadOlderMessages();
+  };
 
   const onChatScroll = () => {
     if (!scrollContainerRef.current) {
@@ -35,6 +60,9 @@ export function ChatMessages({ children, messages, isLoading, chatId }: ChatMess
       shouldAutoscrollRef.current = true;
     }
     prevScrollRef.current = scrollContainerRef.current.scrollTop;
+    if (scrollContainerRef.current.scrollTop < THRESHOLD) {
+      loadOlderMessages();
+    }
   };
 
   useEffect(() => {
@@ -49,6 +77,24 @@ export function ChatMessages({ children, messages, isLoading, chatId }: ChatMess
     }
   }, [messages]);
 
+  useLayoutEffect(() => {
+    const container = scrollContainerRef.current;
+    if (!container || prevScrollHeightRef.current === null || isLoadingOlderMessages) {
+      return;
+    }
+    // Older messages were added above, keep the ones in view where they were
+    container.scrollTop += container.scrollHeight - prevScrollHeightRef.current;
+    prevScrollHeightRef.current = null;
+  }, [messages, isLoadingOlderMessages]);
+
+  useEffect(() => {
+    // Nothing to scroll yet, so load older messages until there is
+    const container = scrollContainerRef.current;
+    if (container && !isLoading && container.scrollHeight <= container.clientHeight) {
+      loadOlderMessages();
+    }
+  }, [messages, isLoading, hasOlderMessages, isLoadingOlderMessages]);
+
   return (
     <div className="messages gap-2" ref={scrollContainerRef} onScroll={onChatScroll}>
       {isLoading ? (
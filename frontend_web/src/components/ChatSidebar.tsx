@@ -36,12 +36,18 @@ export interface ChatSidebarProps {
   onChatSelect: (threadId: string) => any;
   onChatDelete: (threadId: string, callbackFn: () => void) => any;
   chats?: ChatListItem[];
+  hasMoreChats?: boolean;
+  isLoadingMoreChats?: boolean;
+  onLoadMoreChats?: () => any;
   isLoadingDeleteChat: boolean;
 }
 
 export function ChatSidebar({
   isLoading,
   chats,
+  hasMoreChats = false,
+  isLoadingMoreChats = false,
+  onLoadMoreChats,
   chatId,
   onChatSelect,
   onChatCreate,
@@ -134,6 +140,25 @@ export function ChatSidebar({
                   </SidebarMenuItem>
                 ))
               )}
+              {!isLoading && hasMoreChats && (
+                <SidebarMenuItem key="load-more-chats">
+                  <SidebarMenuButton
+                    disabled={isLoadingMoreChats}
+                    asChild
+                    onClick={onLoadMoreChats}
+                    testId="load-more-chats-btn"
+                  >
+                    <div>
+                      {isLoadingMoreChats ? (
+                        <LoaderCircle className="animate-spin" />
+                      ) : (
+                        <MoreHorizontal />
+                      )}
+                      <span>Load more chats</span>
+                    </div>
+                  </SidebarMenuButton>
+                </SidebarMenuItem>
+              )}
             </SidebarMenu>
           </SidebarGroupContent>
         </SidebarGroup>
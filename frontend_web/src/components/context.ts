@@ -39,4 +39,7 @@ export const ChatContext = createContext<AgUiChatReturn>({
   useFetchHistory: (() => ({})) as unknown as AgUiChatReturn['useFetchHistory'],
   isLoadingHistory: false,
   refetchHistory: (() => Promise.resolve(undefined)) as unknown as AgUiChatReturn['refetchHistory'],
+  hasOlderMessages: false,
+  isLoadingOlderMessages: false,
+  loadOlderMessages: () => {},
 });
@@ -54,6 +54,9 @@ export function ChatPage({
     isNewChat,
     chats,
     isLoadingChats,
+    hasMoreChats,
+    isLoadingMoreChats,
+    loadMoreChats,
     addChatHandler,
     deleteChatHandler,
     isLoadingDeleteChat,
@@ -69,6 +72,9 @@ export function ChatPage({
         isLoading={isLoadingChats}
         chatId={chatId}
         chats={chats}
+        hasMoreChats={hasMoreChats}
+        isLoadingMoreChats={isLoadingMoreChats}
+        onLoadMoreChats={loadMoreChats}
         onChatCreate={addChatHandler}
         onChatSelect={setChatId}
         onChatDelete={deleteChatHandler}
@@ -111,6 +117,9 @@ export function ChatImplementation({ chatId }: { chatId: string }) {
     progress,
     deleteProgress,
     isLoadingHistory,
+    hasOlderMessages,
+    isLoadingOlderMessages,
+    loadOlderMessages,
     isAgentRunning,
   } = useChatContext();
 
@@ -145,7 +154,14 @@ export function ChatImplementation({ chatId }: { chatId: string }) {
 
   return (
     <Chat initialMessages={initialMessages}>
-      <ChatMessages isLoading={isLoadingHistory} messages={combinedEvents} chatId={chatId}>
+      <ChatMessages
+        isLoading={isLoadingHistory}
+        messages={combinedEvents}
+        chatId={chatId}
+        hasOlderMessages={hasOlderMessages}
+        isLoadingOlderMessages={isLoadingOlderMessages}
+        onLoadOlderMessages={loadOlderMessages}
+      >
         {combinedEvents &&
           combinedEvents.map(m => {
             if (isErrorStateEvent(m)) {
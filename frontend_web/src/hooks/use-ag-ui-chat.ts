@@ -22,7 +22,7 @@ import {
   messageToStateEvent,
 } from '@/lib/mappers';
 import { MessageResponse } from '@/api/chat/types.ts';
-import { useFetchHistory } from '@/api/chat';
+import { useFetchHistory, useFetchOlderMessages } from '@/api/chat';
 import type { Tool, ToolSerialized } from '@/types/tools';
 import {
   isProgressDone,
@@ -77,8 +77,12 @@ export function useAgUiChat({
     isLoading: isLoadingHistory,
     refetch: refetchHistory,
   } = useFetchHistory({ chatId, enabled: !isAgentRunning && !isNewChat });
+  const { mutate: loadOlderMessages, isPending: isLoadingOlderMessages } = useFetchOlderMessages({
+    chatId,
+  });
 
-  const history = isNewChat ? [] : data;
+  const history = isNewChat ? [] : data?.messages;
+  const hasOlderMessages = !isNewChat && !!data?.hasOlderMessages;
 
   const agentRef = useRef(agent);
   const toolsRef = useRef(tools);
@@ -379,5 +383,8 @@ export function useAgUiChat({
     useFetchHistory,
     isLoadingHistory,
     refetchHistory,
+    hasOlderMessages,
+    isLoadingOlderMessages,
+    loadOlderMessages: () => loadOlderMessages(),
   };
 }
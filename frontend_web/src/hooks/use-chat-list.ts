@@ -20,7 +20,14 @@ export function useChatList({ chatId, setChatId, showStartChat = false }: UseCha
 
   const addChatToState = useAddChat();
   const { mutateAsync: deleteChatMutation, isPending: isLoadingDeleteChat } = useDeleteChat();
-  const { data: chats, isLoading: isLoadingChats, refetch } = useFetchChats();
+  const {
+    data: chats,
+    isLoading: isLoadingChats,
+    refetch,
+    hasNextPage: hasMoreChats,
+    fetchNextPage,
+    isFetchingNextPage: isLoadingMoreChats,
+  } = useFetchChats();
 
   useEffect(() => {
     if (chats?.some(chat => chat.id === newChat?.id)) {
@@ -68,6 +75,10 @@ export function useChatList({ chatId, setChatId, showStartChat = false }: UseCha
     return newChatID;
   };
 
+  const loadMoreChats = () => {
+    fetchNextPage().catch(error => console.error(error));
+  };
+
   const deleteChat = (chatId: string) => {
     return deleteChatMutation({ chatId }).then(() => refetch());
   };
@@ -106,6 +117,9 @@ export function useChatList({ chatId, setChatId, showStartChat = false }: UseCha
     newChat,
     setNewChat,
     isLoadingChats,
+    hasMoreChats,
+    isLoadingMoreChats,
+    loadMoreChats,
     refetchChats,
     deleteChat,
     isLoadingDeleteChat,